@@ -1,18 +1,140 @@
+import hashlib
+import logging
+
 import streamlit as st
 import pandas as pd
-import folium
-from folium.plugins import HeatMap
 from streamlit_folium import st_folium
 from clean_uploaded_csv import clean_uploaded_csv
-from distance_mapping import find_optimal_field_for_data
+from zip_centroids import PRECISION_COLUMN
+from distance_mapping import find_optimal_field_for_data, optimal_fields_by_group, TRAVEL_TIME
+from travel_time import load_osm_graph, ROAD_GRAPH_PATH
+from spatial_index import get_field_index
+from field_assignment import solve_field_assignment
+from site_finder import suggest_field_sites
+from what_if import WhatIfEngine, compare_field_loads, compare_scenarios
+import instrumentation
+from instrumentation import span
+from maps import create_heatmap, create_pin_map, heatmap_bins
+from filters import RaceIndex, FilterEngine, EXACT, LOWER, NUMERIC
+from data_access import (
+    CachedTable, PLAYER_COLUMNS, FIELD_COLUMNS, PLAYER_DTYPES, FIELD_DTYPES, SchemaError, bulk_insert, BulkInsertError,
+    get_all, table_has_column,
+)
+from async_data import DataClient, SessionAuth
+from snapshot_store import SnapshotStore
+from repository import SupabaseRepository, OPTION_COLUMNS, program_counts_from_frame
 from supabase import create_client, Client
-import ast
+
+logger = logging.getLogger(__name__)
 
 supabase_url = st.secrets["supabase"]["url"]
 supabase_key = st.secrets["supabase"]["api_key"]
 
 supabase: Client = create_client(supabase_url, supabase_key)
 
+@st.cache_resource
+def get_data_client():
+    """ Pooled async client for all table reads and writes, one per process """
+    return DataClient(supabase_url, supabase_key)
+
+repository = SupabaseRepository(get_data_client())
+
+# How long cached table rows are served before checking Supabase for new rows
+DATA_TTL_SECONDS = 300
+
+@st.cache_resource
+def get_table_cache(table_name):
+    columns = PLAYER_COLUMNS if table_name == "Players" else FIELD_COLUMNS
+    dtypes = PLAYER_DTYPES if table_name == "Players" else FIELD_DTYPES
+    # Starts from the local snapshot (if any) and syncs from Supabase in the background.
+    # One compact copy per process: every session reads the same frame
+    return CachedTable(get_data_client(), table_name, columns=columns, ttl=DATA_TTL_SECONDS, snapshot=SnapshotStore(),
+                       dtypes=dtypes)
+
+@st.cache_data(ttl=DATA_TTL_SECONDS)
+def players_have_column(column):
+    """ Whether Players has 'column' yet (columns added by the migrations in sql/) """
+    return table_has_column(get_data_client(), "Players", column)
+
+@st.cache_resource
+def get_road_graph():
+    """ Road network for travel-time ranking, loaded once per process """
+    return load_osm_graph(ROAD_GRAPH_PATH)
+
+def selections_key(selections):
+    """ Hashable, order-independent form of a filter selection dict """
+    return tuple(sorted(
+        (column, tuple(sorted(map(str, value))) if isinstance(value, list) else value)
+        for column, value in selections.items()
+    ))
+
+def view_key(*parts):
+    """ Short stable hash of data versions and filter selections, for keying cached views """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+# Rendered views are cached per view_key; the least recently used entries
+# are dropped past these sizes, and data changes clear them (invalidate_table)
+MAP_CACHE_ENTRIES = 8
+RESULT_CACHE_ENTRIES = 64
+
+@st.cache_data(max_entries=32)
+def cached_heatmap_bins(version, player_key, _players):
+    """ Heat map grid bins per Players data version and player filter combination """
+    return heatmap_bins(_players)
+
+@st.cache_resource(max_entries=MAP_CACHE_ENTRIES)
+def cached_heatmap(key, _players, _bins):
+    """ Heat map per view_key(players version, player filters) """
+    return create_heatmap(_players, bins=_bins)
+
+@st.cache_resource(max_entries=MAP_CACHE_ENTRIES)
+def cached_pin_map(key, _players, _fields):
+    """ Pin map per view_key(data versions, player and field filters) """
+    return create_pin_map(_players, _fields)
+
+@st.cache_data(max_entries=RESULT_CACHE_ENTRIES)
+def cached_optimal_field(key, metric, _players, _fields):
+    """ (best field, average) per view_key(data versions, filters) and metric """
+    if metric == TRAVEL_TIME:
+        return find_optimal_field_for_data(_players, _fields, method=TRAVEL_TIME, road_graph=get_road_graph())
+    return find_optimal_field_for_data(_players, _fields)
+
+@st.cache_resource(max_entries=MAP_CACHE_ENTRIES)
+def cached_what_if_engine(key, _players, _fields):
+    """ WhatIfEngine per view_key(data versions, player filters), over every field """
+    return WhatIfEngine(_players, _fields)
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, max_entries=8)
+def fetch_aggregate(name, version):
+    """
+    Database aggregate per data version: a table's sidebar options ('name'
+    "Players" / "Fields") or "program_counts". None when the views in
+    sql/filter_option_views.sql are missing or Supabase is unreachable;
+    None is cached like any result, so a missing view is asked for once
+    per version and TTL rather than on every rerun.
+    """
+    try:
+        if name == "program_counts":
+            return repository.program_counts()
+        return repository.filter_options(name)
+    except Exception:
+        logger.warning("Aggregate view for %s unavailable; using the loaded rows", name, exc_info=True)
+        return None
+
+def aggregate(name, version, local):
+    """ fetch_aggregate, or local() computed from the loaded rows when the views are unavailable """
+    with span("aggregates", name=name) as timing:
+        result = fetch_aggregate(name, version)
+        timing.set(source="view" if result is not None else "local")
+        return local() if result is None else result
+
+def invalidate_table(table_name):
+    """ Reloads 'table_name' on next access and drops every view derived from it """
+    get_table_cache(table_name).invalidate()
+    for cached in (cached_heatmap_bins, cached_heatmap, cached_pin_map, cached_optimal_field, cached_what_if_engine,
+                   fetch_aggregate):
+        cached.clear()
+
 if "view" not in st.session_state:
     st.session_state.view = "home"
 
@@ -35,6 +157,8 @@ if st.session_state.user is None:
             response = supabase.auth.sign_in_with_password({"email": email, "password": password})
             if response.user:
                 st.session_state.user = response.user
+                # Kept per browser session: the shared DataClient never holds a user's token
+                st.session_state.auth = SessionAuth(supabase.auth, response.session) if response.session else None
                 st.success(f"Logged in as: {response.user.email}")
                 st.rerun()
             else:
@@ -45,6 +169,12 @@ if st.session_state.user is None:
     st.stop()
 
 
+def session_client():
+    """ The shared DataClient acting as the signed-in user, for writes under row level security """
+    auth = st.session_state.get("auth")
+    return get_data_client().for_session(auth) if auth is not None else get_data_client()
+
+
 # Title and header
 st.title("Welcome to DC Soccer Club Maps")
 
@@ -146,6 +276,10 @@ st.sidebar.image("./DC_Soccer_Logo.png", use_container_width=True)
 if st.sidebar.button("Manage Programs"):
     st.session_state.view = "manage"
 
+# Timing of this rerun, shown at the bottom of the sidebar (always on with DCSOCCER_PROFILE=1)
+show_profile = st.sidebar.checkbox("Show profiling")
+profile_run = instrumentation.start_run() if show_profile or instrumentation.LOG_ENABLED else None
+
 # Manage Programs View
 if st.session_state.view == "manage":
     st.title("Manage Programs")
@@ -169,202 +303,161 @@ if st.session_state.view == "manage":
         st.subheader("Add Players via CSV")
         new_program = st.text_input("Enter the program name for this new data")
         uploaded_file = st.file_uploader("Upload CSV", type=["csv"])
+        zip_only = st.checkbox("Locate players by ZIP code only (fast, approximate)")
         if uploaded_file and new_program:
             if st.button("Add to Supabase"):
                 try:
                     df_new = pd.read_csv(uploaded_file)
-                    cleaned_df = clean_uploaded_csv(df_new, new_program)
+                    with span("upload.clean", rows=len(df_new)):
+                        cleaned_df = clean_uploaded_csv(df_new, new_program, geocode_mode="zip" if zip_only else "address")
+                    if not players_have_column(PRECISION_COLUMN):
+                        # sql/players_geocode_precision.sql not applied yet: upload without it
+                        cleaned_df = cleaned_df.drop(columns=[PRECISION_COLUMN])
                     data = cleaned_df.to_dict(orient="records")
-                    for row in data:
-                        supabase.table("Players").insert(row).execute()
+                    progress = st.progress(0.0, text="Uploading players...")
+                    with span("upload.insert", rows=len(data)):
+                        bulk_insert(
+                            session_client(), "Players", data,
+                            on_progress=lambda done, total: progress.progress(done / total, text=f"Uploaded {done} of {total} players"),
+                        )
+                    invalidate_table("Players")
                     st.success("Data successfully cleaned and added to Supabase!")
+                except BulkInsertError as e:
+                    invalidate_table("Players")
+                    if not e.rolled_back:
+                        st.error(f"Add failed and could not be fully rolled back; check the program's players: {str(e)}")
+                    else:
+                        st.error(f"Add failed, upload was rolled back: {str(e)}")
                 except Exception as e:
                     st.error(f"Add failed: {str(e)}")
 
     elif st.session_state.manage_mode == "delete":
         st.subheader("Delete Players by Program")
-        all_players = []
-        start = 0
-        while True:
-            response = supabase.table("Players").select("Program").range(start, start + 999).execute()
-            if not response.data:
-                break
-            all_players.extend(response.data)
-            start += 1000
-
-        program_df = pd.DataFrame(all_players)
-        unique_programs = sorted(program_df["Program"].dropna().unique())
-
-        selected_program = st.selectbox("Select a program to delete:", unique_programs)
+        # One row per program from the database, not one per player
+        program_counts = aggregate(
+            "program_counts", None, lambda: program_counts_from_frame(get_table_cache("Players").get(copy=False)[0]),
+        )
+
+        selected_program = st.selectbox(
+            "Select a program to delete:", list(program_counts.index),
+            format_func=lambda program: f"{program} ({program_counts[program]} players)",
+        )
         if st.button("Confirm Delete"):
             try:
-                supabase.table("Players").delete().ilike("Program", selected_program).execute()
+                SupabaseRepository(session_client()).delete_program(selected_program)
+                invalidate_table("Players")
                 st.success(f"Deleted all players in: {selected_program}")
                 st.rerun()
             except Exception as e:
                 st.error(f"Delete failed: {str(e)}")
 
-def fetch_data(table_name):
-    all_data = []
-    page_size = 1000
-    start = 0
-
-    while True:
-        response = supabase.table(table_name).select("*").range(start, start + page_size - 1).execute()
-        data = response.data
-
-        if not data:
-            break  # No more rows to fetch
-
-        all_data.extend(data)
-        start += page_size
-
-    return pd.DataFrame(all_data)
-
-
-df_fields = fetch_data("Fields")
-df_players = fetch_data("Players")
+# Both tables load at once over the shared connection pool. These are the
+# process-wide cached frames, not copies: read them, never modify them
+with span("data.load"):
+    try:
+        (df_fields, fields_version), (df_players, players_version) = get_all(
+            [get_table_cache("Fields"), get_table_cache("Players")], copy=False,
+        )
+    except SchemaError as e:
+        st.error(f"The database schema does not match what the app expects: {e}")
+        st.stop()
+
+PLAYER_FILTER_COLUMNS = {
+    "Program": EXACT, "Age": NUMERIC, "Gender": LOWER, "Grade": LOWER, "School": LOWER,
+}
+FIELD_FILTER_COLUMNS = {
+    "Capacity": NUMERIC, "Surface": LOWER, "Size": LOWER, "Game Size": LOWER,
+    "Lights": LOWER, "Permanent Lines": LOWER, "Goals": LOWER,
+}
+
+@st.cache_resource(max_entries=2)
+def build_player_filters(version, _df):
+    """ Player filter engine (with the parsed Race List) per Players data version """
+    with span("filters.build", table="Players", rows=len(_df)):
+        return FilterEngine(_df, PLAYER_FILTER_COLUMNS, race_index=RaceIndex(_df["Race List"]))
+
+@st.cache_resource(max_entries=2)
+def build_field_filters(version, _df):
+    """ Field filter engine per Fields data version """
+    with span("filters.build", table="Fields", rows=len(_df)):
+        return FilterEngine(_df, FIELD_FILTER_COLUMNS)
+
+player_filters = build_player_filters(players_version, df_players)
+field_filters = build_field_filters(fields_version, df_fields)
+
+def filter_options(table_name, version, engine):
+    return aggregate(
+        table_name, version, lambda: {column: engine.options(column) for column in OPTION_COLUMNS[table_name]},
+    )
 
+def show_map(name, map_obj, **kwargs):
+    """ st_folium, timed; the payload size is measured only while profiling """
+    with span(f"render.{name}") as timing:
+        if instrumentation.enabled():
+            timing.set(payload_bytes=len(map_obj.get_root().render().encode()))
+        # Nothing is read back from the maps, so panning and zooming need not rerun the script
+        st_folium(map_obj, width=700, height=500, key=name, returned_objects=[], **kwargs)
 
+player_options = filter_options("Players", players_version, player_filters)
+field_options = filter_options("Fields", fields_version, field_filters)
 
-def create_heatmap(df):
-    map_obj = folium.Map(location=[38.893859, -77.0971477], zoom_start=12)
-    heatmap_data = df[["Latitude", "Longitude"]].dropna().values.tolist()
-    if heatmap_data:
-        HeatMap(heatmap_data).add_to(map_obj)
-    return map_obj
 
-def create_pin_map(player_df, field_df):
-    map_obj = folium.Map(location=[38.95, -77.0369], zoom_start=12)
-    
-    # Limit player markers to 500
-    for _, row in player_df.head(500).iterrows():
-        folium.Marker(
-            location=[row["Latitude"], row["Longitude"]],
-            popup=f"{row.get('Program', 'N/A')} - {row.get('School', 'N/A')}, Zip: {row.get('Zip Code', 'N/A')}",
-            icon=folium.Icon(color="red")
-        ).add_to(map_obj)
-    
-    for _, row in field_df.iterrows():
-        folium.Marker(
-            location=[row["Latitude"], row["Longitude"]],
-            popup=f"{row.get('Name', 'N/A')}, {row.get('Capacity', 'N/A')}, {row.get('Surface', 'N/A')}",
-            icon=folium.Icon(color="blue")
-        ).add_to(map_obj)
-    
-    return map_obj
 
 # Sidebar filters
 st.sidebar.header("Player Filters")
 
-def get_unique_options(column):
-    """ Get sorted unique options """
-    return sorted(df_players[column].unique())
-
-def get_lowercase_unique_options(column):
-    """ Get sorted unique lowercase options """
-    return sorted(df_players[column].dropna().astype(str).str.lower().unique())
-
-def get_numeric_sorted_options(column):
-    """ Get sorted unique numeric options """
-    return sorted(df_players[column].dropna().astype(int).unique())
-
-def get_unique_race_options():
-    """ Get unique race options from Race List column """
-    unique_races = set()
-
-    # Go through each race_list_str, convert to list, add to set
-    df_players["Race List"].dropna().apply(
-        lambda race_list_str: unique_races.update(ast.literal_eval(race_list_str))
-    )
-
-    return sorted(race.strip() for race in unique_races)  # Remove extra spaces just in case
-
-
-selected_programs = st.sidebar.multiselect("Select Program", get_unique_options("Program"))
-selected_ages = st.sidebar.multiselect("Select Age", get_numeric_sorted_options("Age"))
-selected_gender = st.sidebar.selectbox("Select Gender", [""] + get_lowercase_unique_options("Gender"))
-selected_grade = st.sidebar.multiselect("Select Grade", get_lowercase_unique_options("Grade"))
-selected_race = st.sidebar.multiselect("Select Race", get_unique_race_options())
-selected_school = st.sidebar.multiselect("Select School", get_lowercase_unique_options("School"))
+player_selections = {
+    "Program": st.sidebar.multiselect("Select Program", player_options["Program"]),
+    "Age": st.sidebar.multiselect("Select Age", player_options["Age"]),
+    "Gender": st.sidebar.selectbox("Select Gender", [""] + player_options["Gender"]),
+    "Grade": st.sidebar.multiselect("Select Grade", player_options["Grade"]),
+    "Race List": st.sidebar.multiselect("Select Race", player_options["Race List"]),
+    "School": st.sidebar.multiselect("Select School", player_options["School"]),
+}
 
 # Field Filters
 st.sidebar.header("Field Filters")
 
-def get_field_lowercase_options(column):
-    """ Get sorted unique lowercase options for fields """
-    return sorted(df_fields[column].dropna().astype(str).str.lower().unique())
-
-def get_field_numeric_options(column):
-    """ Get sorted unique numeric options for fields """
-    return sorted(df_fields[column].dropna().astype(int).unique())
-
-selected_capacity = st.sidebar.multiselect("Select Capacity", get_field_numeric_options("Capacity"))
-selected_surface = st.sidebar.multiselect("Select Surface", get_field_lowercase_options("Surface"))
-selected_size = st.sidebar.multiselect("Select Size", get_field_lowercase_options("Size"))
-selected_game_size = st.sidebar.multiselect("Select Game Size", get_field_lowercase_options("Game Size"))
-selected_lights = st.sidebar.selectbox("Select Lights", [""] + get_field_lowercase_options("Lights"))
-selected_permanent_lines = st.sidebar.multiselect("Select Permanent Lines", get_field_lowercase_options("Permanent Lines"))
-selected_goals = st.sidebar.selectbox("Select Goals", [""] + get_field_lowercase_options("Goals"))
-
-df_players["Grade"] = df_players["Grade"].astype(str).str.strip().str.lower()
-
-# Apply Player Filters
-filtered_players = df_players.copy()
-
-if selected_grade:
-    filtered_players = filtered_players[filtered_players["Grade"].isin([g.lower().strip() for g in selected_grade])]
-
-if any([selected_programs, selected_ages, selected_gender, selected_grade, selected_race, selected_school]):
-    if selected_programs:
-        filtered_players = filtered_players[filtered_players["Program"].isin(selected_programs)]
-    if selected_ages:
-        filtered_players = filtered_players[filtered_players["Age"].isin(selected_ages)]
-    if selected_gender:
-        filtered_players = filtered_players[filtered_players["Gender"].str.lower().isin([selected_gender])]
-    if selected_grade:
-        filtered_players = filtered_players[filtered_players["Grade"].isin(selected_grade)]
-    if selected_race:
-        filtered_players = filtered_players[
-            filtered_players["Race List"].apply(
-                lambda race_list_str: any(
-                    race in ast.literal_eval(race_list_str) for race in selected_race
-                ) if pd.notnull(race_list_str) else False
-            )
-        ]
-    if selected_school:
-        filtered_players = filtered_players[filtered_players["School"].str.lower().isin(selected_school)]
+field_selections = {
+    "Capacity": st.sidebar.multiselect("Select Capacity", field_options["Capacity"]),
+    "Surface": st.sidebar.multiselect("Select Surface", field_options["Surface"]),
+    "Size": st.sidebar.multiselect("Select Size", field_options["Size"]),
+    "Game Size": st.sidebar.multiselect("Select Game Size", field_options["Game Size"]),
+    "Lights": st.sidebar.selectbox("Select Lights", [""] + field_options["Lights"]),
+    "Permanent Lines": st.sidebar.multiselect("Select Permanent Lines", field_options["Permanent Lines"]),
+    "Goals": st.sidebar.selectbox("Select Goals", [""] + field_options["Goals"]),
+}
+
+# Apply Player Filters (nothing is shown until at least one filter is set)
+if player_filters.any_selected(player_selections):
+    filtered_players = player_filters.filter(df_players, player_selections)
 else:
     filtered_players = pd.DataFrame(columns=df_players.columns)
 
 # Apply Field Filters
-filtered_fields = df_fields.copy()
-
-if any([selected_capacity, selected_surface, selected_size, selected_game_size, selected_lights, selected_permanent_lines, selected_goals]):
-    if selected_capacity:
-        filtered_fields = filtered_fields[filtered_fields["Capacity"].isin(selected_capacity)]
-    if selected_surface:
-        filtered_fields = filtered_fields[filtered_fields["Surface"].str.lower().isin(selected_surface)]
-    if selected_size:
-        filtered_fields = filtered_fields[filtered_fields["Size"].str.lower().isin(selected_size)]
-    if selected_game_size:
-        filtered_fields = filtered_fields[filtered_fields["Game Size"].str.lower().isin(selected_game_size)]
-    if selected_lights:
-        filtered_fields = filtered_fields[filtered_fields["Lights"].str.lower() == selected_lights]
-    if selected_permanent_lines:
-        filtered_fields = filtered_fields[filtered_fields["Permanent Lines"].str.lower().isin(selected_permanent_lines)]
-    if selected_goals:
-        filtered_fields = filtered_fields[filtered_fields["Goals"].str.lower() == selected_goals]
+if field_filters.any_selected(field_selections):
+    filtered_fields = field_filters.filter(df_fields, field_selections)
 else:
     filtered_fields = pd.DataFrame(columns=df_fields.columns)
 
 # Display updated maps
 if st.session_state.view == "home":
     st.header("Heat Map")
-    st_folium(create_heatmap(filtered_players), width=700, height=500)
+    player_key = view_key(players_version, selections_key(player_selections))
+    state_key = view_key(players_version, fields_version, selections_key(player_selections), selections_key(field_selections))
+    heat_bins = cached_heatmap_bins(players_version, selections_key(player_selections), filtered_players)
+    show_map("heatmap", cached_heatmap(player_key, filtered_players, heat_bins))
 
     st.header("Pin Map")
-    st_folium(create_pin_map(filtered_players, filtered_fields), width=700, height=500)
+    show_map("pin_map", cached_pin_map(state_key, filtered_players, filtered_fields))
+
+    st.header("Field Catchment")
+    catchment_radius = st.slider("Catchment radius (miles)", 1, 20, 5)
+    if not filtered_players.empty and not filtered_fields.empty:
+        field_index = get_field_index(filtered_fields)
+        st.dataframe(field_index.catchment_counts(filtered_players, miles=catchment_radius))
+    else:
+        st.write("Select players and fields to see catchment counts.")
 
 
 
@@ -372,12 +465,105 @@ if st.session_state.view == "home":
     #DISTANCING
     st.header("Optimal Distance in Streamlit")
     #selected_option = st.selectbox("Choose a Program",df_players["Program"].unique())
+    # Travel times need a real OSM extract of the area (ROAD_GRAPH_PATH)
+    metrics = ["Straight-line distance"] + (["Road travel time"] if ROAD_GRAPH_PATH else [])
+    metric = st.radio("Rank fields by", metrics, horizontal=True)
     if st.button("Submit"):
-        print(filtered_players)
-        best_field, avg_dist = find_optimal_field_for_data(filtered_players, filtered_fields)
+        if metric == "Road travel time":
+            best_field, avg_dist = cached_optimal_field(state_key, TRAVEL_TIME, filtered_players, filtered_fields)
+            unit = "minutes"
+        else:
+            best_field, avg_dist = cached_optimal_field(state_key, "haversine", filtered_players, filtered_fields)
+            unit = "miles"
         if best_field is not None:
-            st.write(f"The optimal field is {best_field}, with average distance {avg_dist:.2f} miles.")
+            st.write(f"The optimal field is {best_field}, with average distance {avg_dist:.2f} {unit}.")
         else:
             st.write("No best field found (no players or no fields).")
     else:
-        st.write("Please select an option and click Submit.")
\ No newline at end of file
+        st.write("Please select an option and click Submit.")
+
+    st.subheader("Optimal Field by Group")
+    group_by = st.selectbox("Group players by", ["Age", "Grade", "Program"])
+    if st.button("Find Best Field for Each Group"):
+        # One process: worker pools are not worth starting from inside the server
+        group_results = optimal_fields_by_group(filtered_players, filtered_fields, group_by, n_jobs=1)
+        if group_results.empty:
+            st.write("No best field found (no players or no fields).")
+        else:
+            st.dataframe(group_results, hide_index=True)
+    # MULTI-FIELD PLAN
+    st.header("Split Across Multiple Fields")
+    num_fields = st.number_input("Number of fields to use", min_value=1, max_value=max(len(filtered_fields), 1), value=1)
+    players_per_capacity = st.number_input("Players per unit of field Capacity", min_value=1, value=20)
+    if st.button("Plan Fields"):
+        try:
+            plan = solve_field_assignment(
+                filtered_players, filtered_fields, int(num_fields),
+                players_per_capacity=players_per_capacity,
+            )
+            st.write(f"Average distance {plan.mean_distance:.2f} miles across {len(plan.fields)} fields.")
+            st.dataframe(plan.summary)
+        except ValueError as e:
+            st.write(f"No plan found: {e}")
+
+    # WHAT-IF SCENARIOS
+    st.header("What If Fields Open or Close")
+    # The engine takes a full distance pass over the players, so it is only
+    # built once the planner asks for scenarios, not on every filter change
+    if st.checkbox("Compare field scenarios", key="what_if_open"):
+        if filtered_players.empty or df_fields.empty:
+            st.write("Select players to compare field scenarios.")
+        else:
+            # Built once per player filter; field filters and closures only re-rank
+            engine = cached_what_if_engine(
+                view_key(players_version, fields_version, selections_key(player_selections)), filtered_players, df_fields,
+            )
+            current_fields = filtered_fields if field_filters.any_selected(field_selections) else None
+            # Picked by index label: two fields may share a name
+            names = df_fields["Name"].fillna("(unnamed)")
+            repeated = names.duplicated(keep=False)
+            labels = names.where(~repeated, names + " (#" + df_fields["id"].astype(str) + ")")
+            closed = st.multiselect("Close these fields", list(labels.sort_values(kind="stable").index),
+                                    format_func=labels.get)
+            scenarios = [engine.scenario("All fields")]
+            if current_fields is not None:
+                scenarios.append(engine.scenario("Filtered fields", fields=current_fields))
+            if closed:
+                open_fields = (current_fields if current_fields is not None else df_fields).index.difference(closed)
+                scenarios.append(engine.scenario("With closures", fields=open_fields))
+
+            baseline = scenarios[0].mean_nearest_distance
+            for column, scenario in zip(st.columns(len(scenarios)), scenarios):
+                column.subheader(scenario.name)
+                column.write(f"Best field: {scenario.best_field or 'none'}")
+                nearest = scenario.mean_nearest_distance
+                if nearest is not None:
+                    column.metric("Avg distance to nearest field", f"{nearest:.2f} mi",
+                                  delta=f"{nearest - baseline:+.2f} mi", delta_color="inverse")
+            st.dataframe(compare_scenarios(scenarios))
+            st.dataframe(compare_field_loads(scenarios))
+
+    # NEW SITE SUGGESTIONS
+    st.header("Suggest a New Field Site")
+    num_sites = st.number_input("Sites to suggest", min_value=1, max_value=20, value=5)
+    parcels_file = st.file_uploader("Candidate parcels (optional CSV with Latitude, Longitude and Name)", type=["csv"])
+    if st.button("Suggest Sites"):
+        try:
+            parcels = pd.read_csv(parcels_file) if parcels_file else None
+            sites = suggest_field_sites(filtered_players, filtered_fields, parcels_df=parcels, top_n=int(num_sites))
+            if sites.best_field is not None:
+                st.write(f"Current best field: {sites.best_field} ({sites.best_field_distance:.2f} miles on average).")
+            st.dataframe(sites.candidates, hide_index=True)
+        except (ValueError, KeyError) as e:
+            st.write(f"No sites found: {e}")
+
+# PROFILING PANEL
+if profile_run is not None:
+    instrumentation.finish_run()
+    if show_profile:
+        with st.sidebar.expander("Profiling", expanded=True):
+            st.write(f"Rerun took {profile_run.total_seconds() * 1000:.0f} ms")
+            st.dataframe(profile_run.summary())
+            if profile_run.counters:
+                st.json(profile_run.counters)
+            st.dataframe(profile_run.spans_frame(), hide_index=True)
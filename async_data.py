@@ -0,0 +1,341 @@
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import pandas as pd
+
+from data_access import PAGE_SIZE, UNDEFINED_COLUMN, TableBackend, select_clause
+from instrumentation import SUPABASE_REQUESTS, count, current, recording
+
+# Per-request timeout (seconds) and how many requests may be in flight at once
+DEFAULT_TIMEOUT = 10.0
+MAX_CONNECTIONS = 10
+
+# Retries for timeouts, dropped connections and these statuses, with
+# exponential backoff plus jitter
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 0.5
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# A user's access token is refreshed once it is this close (seconds) to expiring
+REFRESH_MARGIN_SECONDS = 60
+
+
+def _content_range_total(header, default):
+    """ Total from a PostgREST Content-Range header ("0-999/2500", "*/0") """
+    if header and "/" in header:
+        total = header.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    return default
+
+
+def _in_list(values):
+    """ PostgREST in.(...) operand; strings are quoted """
+    items = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            items.append(str(value))
+        else:
+            items.append('"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"')
+    return f"({','.join(items)})"
+
+
+def _raise_for_status(response):
+    """ raise_for_status with PostgREST's error message (e.g. a missing column) in the exception text """
+    if response.is_success:
+        return
+    try:
+        detail = response.json().get("message")
+    except (ValueError, AttributeError):
+        detail = None
+    if not detail:
+        response.raise_for_status()
+    raise httpx.HTTPStatusError(
+        f"{response.status_code} from {response.request.url.path}: {detail}", request=response.request, response=response,
+    )
+
+
+class AsyncDataClient:
+    """
+    Supabase table access over PostgREST with one pooled httpx client.
+
+    Every request has a timeout and is retried with backoff on transient
+    failures (inserts only when the request never reached the server, so
+    rows are not written twice). Paged reads ask for the first page with
+    an exact count and then fetch every other page concurrently, and
+    fetch_tables loads several tables at once, so a full load costs about
+    as long as its slowest request.
+
+    The client holds no user state: requests carry the project API key,
+    or the signed-in user's JWT when a method is given 'access_token'
+    (row level security then applies to that user).
+    """
+
+    def __init__(self, url, api_key, timeout=DEFAULT_TIMEOUT,
+                 max_connections=MAX_CONNECTIONS, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, transport=None):
+        self.rest_url = url.rstrip("/") + "/rest/v1/"
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self._client = None
+        self._slots = None
+
+    def _http(self):
+        # Created lazily so the pool and semaphore belong to the running loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.rest_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+            )
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    def _headers(self, extra=None, access_token=None):
+        headers = {"apikey": self.api_key, "Authorization": f"Bearer {access_token or self.api_key}"}
+        headers.update(extra or {})
+        return headers
+
+    async def _request(self, method, table_name, params=None, headers=None, json=None, idempotent=True,
+                       access_token=None):
+        client = self._http()
+        headers = self._headers(headers, access_token)
+        for attempt in range(self.retries + 1):
+            try:
+                count(SUPABASE_REQUESTS)
+                async with self._slots:
+                    response = await client.request(method, table_name, params=params, headers=headers, json=json)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    _raise_for_status(response)
+                    return response
+                if not idempotent and response.status_code not in (429, 503):
+                    _raise_for_status(response)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                # Never reached the server: always safe to retry
+                if attempt == self.retries:
+                    raise
+            except httpx.TransportError:
+                if not idempotent or attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    async def _fetch_pages(self, table_name, params, page_size, access_token=None):
+        first = await self._request(
+            "GET", table_name, params={**params, "offset": 0, "limit": page_size},
+            headers={"Prefer": "count=exact"}, access_token=access_token,
+        )
+        rows = first.json()
+        total = _content_range_total(first.headers.get("content-range"), len(rows))
+        pages = await asyncio.gather(*(
+            self._request("GET", table_name, params={**params, "offset": start, "limit": page_size},
+                          access_token=access_token)
+            for start in range(page_size, total, page_size)
+        ))
+        for page in pages:
+            rows.extend(page.json())
+        return rows
+
+    async def fetch_table(self, table_name, columns=None, page_size=PAGE_SIZE, order_by="id", access_token=None):
+        """ Every row of 'table_name' as a DataFrame (see data_access.fetch_table) """
+        params = {"select": select_clause(columns)}
+        if order_by:
+            params["order"] = order_by
+        rows = await self._fetch_pages(table_name, params, page_size, access_token)
+        return pd.DataFrame(rows, columns=columns or None)
+
+    async def fetch_rows_after(self, table_name, column, value, columns=None, page_size=PAGE_SIZE,
+                               access_token=None):
+        """ Rows whose 'column' is strictly greater than 'value', as a DataFrame """
+        params = {"select": select_clause(columns), "order": column, column: f"gt.{value}"}
+        rows = await self._fetch_pages(table_name, params, page_size, access_token)
+        return pd.DataFrame(rows, columns=columns or None)
+
+    async def fetch_tables(self, requests, access_token=None):
+        """ {name: DataFrame} for {name: fetch_table keyword arguments}, all loaded at once """
+        names = list(requests)
+        frames = await asyncio.gather(*(
+            self.fetch_table(name, **requests[name], access_token=access_token) for name in names
+        ))
+        return dict(zip(names, frames))
+
+    async def has_column(self, table_name, column, access_token=None):
+        """ True if 'table_name' has 'column' (see data_access.table_has_column) """
+        try:
+            await self._request("GET", table_name, params={"select": select_clause([column]), "limit": 1},
+                                access_token=access_token)
+        except httpx.HTTPStatusError as e:
+            try:
+                code = e.response.json().get("code")
+            except (ValueError, AttributeError):
+                code = None
+            if code == UNDEFINED_COLUMN:
+                return False
+            raise
+        return True
+
+    async def insert_rows(self, table_name, rows, on_conflict=None, access_token=None):
+        """ Inserts (or upserts on 'on_conflict') 'rows'; returns the written rows """
+        prefer = "return=representation"
+        params = None
+        if on_conflict:
+            prefer += ",resolution=merge-duplicates"
+            params = {"on_conflict": on_conflict}
+        response = await self._request(
+            "POST", table_name, params=params, headers={"Prefer": prefer}, json=rows, idempotent=False,
+            access_token=access_token,
+        )
+        return response.json()
+
+    async def delete_rows(self, table_name, column, operator, value, access_token=None):
+        """ Deletes rows matching one PostgREST filter, e.g. ("Program", "imatch", pattern) or ("id", "in", ids) """
+        operand = _in_list(value) if operator == "in" else value
+        await self._request("DELETE", table_name, params={column: f"{operator}.{operand}"}, access_token=access_token)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class SessionAuth:
+    """
+    One signed-in user's Supabase session, kept per Streamlit session.
+    access_token() refreshes the session through 'auth' (a supabase
+    client's .auth) when it is within 'margin' seconds of expiring;
+    refresh() forces that, e.g. after a 401.
+    """
+
+    def __init__(self, auth, session, margin=REFRESH_MARGIN_SECONDS):
+        self.auth = auth
+        self.session = session
+        self.margin = margin
+        self._lock = threading.Lock()
+
+    def access_token(self):
+        with self._lock:
+            expires_at = getattr(self.session, "expires_at", None)
+            if expires_at is not None and expires_at - time.time() < self.margin:
+                self._refresh()
+            return self.session.access_token
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        try:
+            response = self.auth.refresh_session(self.session.refresh_token)
+        except Exception as e:
+            raise SessionExpired("Your session has expired; please sign in again") from e
+        if response is None or response.session is None:
+            raise SessionExpired("Your session has expired; please sign in again")
+        self.session = response.session
+
+
+class SessionExpired(Exception):
+    """ Raised when a user's session can no longer be refreshed """
+
+
+async def _recorded(recorder, coroutine):
+    # The loop thread has its own context: carry the caller's run over to it
+    with recording(recorder):
+        return await coroutine
+
+
+class DataClient(TableBackend):
+    """
+    Blocking facade over AsyncDataClient for Streamlit's script thread.
+
+    The async client lives on its own event loop in a daemon thread, so
+    its connection pool survives across reruns; each method submits a
+    coroutine to that loop and waits for the result. Calls from several
+    threads at once run concurrently on the loop.
+
+    One DataClient is shared by the whole process and sends the project
+    API key. for_session() gives a per-user view of it that sends that
+    user's token instead.
+    """
+
+    def __init__(self, url, api_key, **kwargs):
+        self.async_client = AsyncDataClient(url, api_key, **kwargs)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="data-client", daemon=True).start()
+
+    def run(self, coroutine):
+        """ Runs 'coroutine' on the client's loop and returns its result """
+        return asyncio.run_coroutine_threadsafe(_recorded(current(), coroutine), self._loop).result()
+
+    def for_session(self, auth):
+        """ SessionDataClient sending the user of 'auth' (a SessionAuth) over this client's pool """
+        return SessionDataClient(self, auth)
+
+    def fetch_table(self, table_name, columns=None, page_size=PAGE_SIZE, order_by="id", access_token=None):
+        return self.run(self.async_client.fetch_table(table_name, columns, page_size, order_by, access_token))
+
+    def fetch_rows_after(self, table_name, column, value, columns=None, page_size=PAGE_SIZE, access_token=None):
+        return self.run(self.async_client.fetch_rows_after(table_name, column, value, columns, page_size,
+                                                           access_token))
+
+    def fetch_tables(self, requests, access_token=None):
+        return self.run(self.async_client.fetch_tables(requests, access_token))
+
+    def has_column(self, table_name, column, access_token=None):
+        return self.run(self.async_client.has_column(table_name, column, access_token))
+
+    def insert_rows(self, table_name, rows, on_conflict=None, access_token=None):
+        return self.run(self.async_client.insert_rows(table_name, rows, on_conflict, access_token))
+
+    def delete_rows(self, table_name, column, operator, value, access_token=None):
+        return self.run(self.async_client.delete_rows(table_name, column, operator, value, access_token))
+
+    def close(self):
+        self.run(self.async_client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class SessionDataClient(TableBackend):
+    """
+    A DataClient as one signed-in user: every request carries the token
+    from 'auth', refreshed before it expires and once more if the server
+    still answers 401 (rejected requests wrote nothing, so retrying them
+    is safe).
+    """
+
+    def __init__(self, data_client, auth):
+        self.data_client = data_client
+        self.auth = auth
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return method(*args, access_token=self.auth.access_token(), **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 401:
+                raise
+            self.auth.refresh()
+            return method(*args, access_token=self.auth.access_token(), **kwargs)
+
+    def fetch_table(self, table_name, columns=None, page_size=PAGE_SIZE, order_by="id"):
+        return self._call(self.data_client.fetch_table, table_name, columns, page_size, order_by)
+
+    def fetch_rows_after(self, table_name, column, value, columns=None, page_size=PAGE_SIZE):
+        return self._call(self.data_client.fetch_rows_after, table_name, column, value, columns, page_size)
+
+    def fetch_tables(self, requests):
+        return self._call(self.data_client.fetch_tables, requests)
+
+    def has_column(self, table_name, column):
+        return self._call(self.data_client.has_column, table_name, column)
+
+    def insert_rows(self, table_name, rows, on_conflict=None):
+        return self._call(self.data_client.insert_rows, table_name, rows, on_conflict)
+
+    def delete_rows(self, table_name, column, operator, value):
+        return self._call(self.data_client.delete_rows, table_name, column, operator, value)
@@ -0,0 +1,213 @@
+# Times the app's hot paths on synthetic DC-area data and records the
+# results as JSON, so two versions can be compared:
+#
+#   python benchmarks/run_benchmarks.py --players 1000 100000 --fields 10 100
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from clean_uploaded_csv import clean_uploaded_csv
+from distance_mapping import calculate_distances, find_optimal_field_for_data
+from filters import EXACT, LOWER, NUMERIC, FilterEngine, RaceIndex
+from maps import create_heatmap, create_pin_map, heatmap_bins
+from synthetic import make_fields, make_players, make_upload, stub_geocoder
+from what_if import WhatIfEngine
+
+DEFAULT_PLAYERS = [1_000, 10_000, 100_000]
+DEFAULT_FIELDS = [10, 100]
+DEFAULT_REPEAT = 3
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Larger cases are skipped (and recorded as such) rather than run out of
+# memory or take minutes: calculate_distances builds the whole matrix, and
+# cleaning / pin maps are per-upload and per-view paths
+MAX_MATRIX_CELLS = 20_000_000
+MAX_CLEAN_ROWS = 100_000
+MAX_PIN_MAP_PLAYERS = 100_000
+
+# Same filter columns as the app's sidebar, and a typical selection
+PLAYER_FILTER_COLUMNS = {"Program": EXACT, "Age": NUMERIC, "Gender": LOWER, "Grade": LOWER, "School": LOWER}
+PLAYER_SELECTIONS = {
+    "Program": ["Travel", "Academy"], "Age": [9, 10, 11], "Gender": "female",
+    "Grade": [], "Race List": ["black", "hispanic"], "School": [],
+}
+
+
+def _time(func, repeat):
+    """ (min, median) wall seconds of 'repeat' calls to func() """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def _filter_pipeline(players):
+    engine = FilterEngine(players, PLAYER_FILTER_COLUMNS, race_index=RaceIndex(players["Race List"]))
+    return engine.filter(players, PLAYER_SELECTIONS)
+
+
+def _what_if_toggle(engine):
+    # A planner closing the current best field after the engine is built
+    best = engine.scenario("All fields").best_field
+    return engine.scenario("Closed", closed=[best])
+
+
+def _render(map_obj):
+    # What st_folium does with the map: serialize it to HTML
+    return map_obj.get_root().render()
+
+
+def _clean_case(n):
+    upload = make_upload(min(n, MAX_CLEAN_ROWS))
+    return lambda: clean_uploaded_csv(upload.copy(), "Benchmark", geocoder=stub_geocoder())
+
+
+def _what_if_toggle_case(players, fields):
+    engine = WhatIfEngine(players, fields)
+    return lambda: _what_if_toggle(engine)
+
+
+def benchmark_cases(players, fields):
+    """
+    (name, skip reason or None, setup) for one players x fields size.
+    setup() builds whatever the case needs and returns the callable to
+    time, so inputs are only made for cases that run and never timed.
+    """
+    n, m = len(players), len(fields)
+    # calculate_distances reads the legacy lowercase coordinate columns
+    legacy_players = players.rename(columns={"Latitude": "latitude", "Longitude": "longitude"})
+    legacy_fields = fields.rename(columns={"Latitude": "latitude", "Longitude": "longitude"})
+
+    return [
+        ("calculate_distances",
+         f"matrix over {MAX_MATRIX_CELLS} cells" if n * m > MAX_MATRIX_CELLS else None,
+         lambda: lambda: calculate_distances(legacy_players, legacy_fields)),
+        ("find_optimal_field_for_data", None,
+         lambda: lambda: find_optimal_field_for_data(players, fields)),
+        ("clean_uploaded_csv",
+         f"over {MAX_CLEAN_ROWS} rows" if n > MAX_CLEAN_ROWS else None,
+         lambda: _clean_case(n)),
+        ("what_if_build", None,
+         lambda: lambda: WhatIfEngine(players, fields)),
+        ("what_if_toggle", None,
+         lambda: _what_if_toggle_case(players, fields)),
+        ("filter_pipeline", None,
+         lambda: lambda: _filter_pipeline(players)),
+        ("heatmap", None,
+         lambda: lambda: _render(create_heatmap(players, bins=heatmap_bins(players)))),
+        ("pin_map",
+         f"over {MAX_PIN_MAP_PLAYERS} players" if n > MAX_PIN_MAP_PLAYERS else None,
+         lambda: lambda: _render(create_pin_map(players, fields))),
+    ]
+
+
+def run(player_sizes, field_sizes, repeat, only=None):
+    results = []
+    for n in player_sizes:
+        players = make_players(n)
+        for m in field_sizes:
+            fields = make_fields(m)
+            for name, skip, setup in benchmark_cases(players, fields):
+                if only and name not in only:
+                    continue
+                entry = {"name": name, "players": n, "fields": m}
+                if skip:
+                    entry["skipped"] = skip
+                else:
+                    entry["seconds_min"], entry["seconds_median"] = _time(setup(), repeat)
+                    entry["repeat"] = repeat
+                results.append(entry)
+                print(_format_entry(entry), flush=True)
+    return results
+
+
+def _format_entry(entry):
+    label = f"{entry['name']:<28} {entry['players']:>9,} players {entry['fields']:>5} fields"
+    if "skipped" in entry:
+        return f"{label}  skipped ({entry['skipped']})"
+    return f"{label}  {entry['seconds_min'] * 1000:10.1f} ms (median {entry['seconds_median'] * 1000:.1f})"
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    return {
+        "revision": _git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(old_results, new_results):
+    """ Prints old vs new min times for every case both runs measured """
+    def key(entry):
+        return entry["name"], entry["players"], entry["fields"]
+
+    old = {key(e): e for e in old_results if "seconds_min" in e}
+    print(f"\n{'case':<58} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for entry in new_results:
+        before = old.get(key(entry))
+        if before is None or "seconds_min" not in entry:
+            continue
+        ratio = entry["seconds_min"] / before["seconds_min"] if before["seconds_min"] else float("nan")
+        label = f"{entry['name']} {entry['players']}x{entry['fields']}"
+        print(f"{label:<58} {before['seconds_min'] * 1000:10.1f} {entry['seconds_min'] * 1000:10.1f} {ratio:7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DC Soccer Club hot paths on synthetic data.")
+    parser.add_argument("--players", type=int, nargs="+", default=DEFAULT_PLAYERS,
+                        help="player counts to run (e.g. 1000 100000 1000000)")
+    parser.add_argument("--fields", type=int, nargs="+", default=DEFAULT_FIELDS,
+                        help="field counts to run (e.g. 10 100 1000)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per case")
+    parser.add_argument("--only", nargs="+", help="run just these benchmarks by name")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<revision>-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    meta = metadata()
+    results = run(args.players, args.fields, args.repeat, only=args.only)
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{meta['revision'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f)["results"], results)
+
+
+if __name__ == "__main__":
+    main()
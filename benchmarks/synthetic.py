@@ -0,0 +1,135 @@
+# Synthetic DC-area players, fields and raw program uploads for benchmarks.
+# Players cluster around neighbourhood centres inside the DC bounding box,
+# fields are spread uniformly over it, and every generator is seeded so a
+# given size always produces the same data.
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from geocoding import BatchGeocoder, GeocodeCache, normalize_address
+
+# (south, north, west, east) around the District and the inner suburbs
+DC_BOUNDS = (38.79, 39.00, -77.12, -76.91)
+
+# Neighbourhood centres players cluster around, and their spread in degrees
+PLAYER_CENTRES = [
+    (38.9296, -77.0326), (38.9097, -76.9929), (38.8663, -76.9860), (38.9559, -77.0710),
+    (38.8816, -77.1080), (38.9807, -77.0261), (38.8462, -77.0014), (38.9072, -77.0369),
+]
+CENTRE_SPREAD = 0.02
+
+# Share of players left without coordinates (failed geocodes)
+MISSING_COORDS = 0.01
+
+PROGRAMS = ["Travel", "Recreational", "Academy", "Summer Camp", "Futsal", "TOPSoccer"]
+GENDERS = ["Male", "Female", "male", "female", "Non-binary"]
+GRADES = ["K", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12"]
+SCHOOLS = [f"School {i}" for i in range(150)]
+RACES = ["white", "black", "asian", "hispanic", "native american", "pacific islander", "other"]
+SURFACES = ["Grass", "Turf", "grass", "turf "]
+SIZES = ["Full", "Half", "Small"]
+GAME_SIZES = ["11v11", "9v9", "7v7", "4v4"]
+YES_NO = ["Yes", "No"]
+STREETS = ["Connecticut Ave NW", "Georgia Ave NW", "H St NE", "Benning Rd NE", "Wisconsin Ave NW",
+           "Pennsylvania Ave SE", "MLK Jr Ave SE", "16th St NW", "Rhode Island Ave NE", "M St SE"]
+ZIPS = ["20001", "20002", "20003", "20007", "20008", "20009", "20010", "20011", "20016", "20019",
+        "20020", "20032", "22201", "20910"]
+
+
+def _player_coordinates(rng, n):
+    south, north, west, east = DC_BOUNDS
+    centres = np.asarray(PLAYER_CENTRES)[rng.integers(len(PLAYER_CENTRES), size=n)]
+    coords = centres + rng.normal(scale=CENTRE_SPREAD, size=(n, 2))
+    coords[:, 0] = coords[:, 0].clip(south, north)
+    coords[:, 1] = coords[:, 1].clip(west, east)
+    coords[rng.random(n) < MISSING_COORDS] = np.nan
+    return coords
+
+
+def _race_lists(rng, n):
+    """ Stringified lists, the way Race List comes back from Supabase """
+    first = np.asarray(RACES)[rng.integers(len(RACES), size=n)]
+    second = np.asarray(RACES)[rng.integers(len(RACES), size=n)]
+    mixed = rng.random(n) < 0.15
+    return [f"['{a}', '{b}']" if m and a != b else f"['{a}']" for a, b, m in zip(first, second, mixed)]
+
+
+def _birth_dates(rng, n):
+    days = rng.integers(365 * 4, 365 * 18, size=n)
+    return (pd.Timestamp("2026-09-01") - pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+
+
+def make_players(n, seed=0):
+    """ 'n' rows in the Players table layout (data_access.PLAYER_COLUMNS) """
+    rng = np.random.default_rng(seed)
+    coords = _player_coordinates(rng, n)
+    birth_dates = _birth_dates(rng, n)
+    ages = 2026 - pd.to_datetime(birth_dates).year
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "Program": rng.choice(PROGRAMS, size=n),
+        "Age": ages,
+        "Gender": rng.choice(GENDERS, size=n),
+        "Grade": rng.choice(GRADES, size=n),
+        "School": rng.choice(SCHOOLS, size=n),
+        "Race List": _race_lists(rng, n),
+        "birth_date": birth_dates,
+        "Zip Code": rng.choice(ZIPS, size=n),
+        "Latitude": coords[:, 0],
+        "Longitude": coords[:, 1],
+    })
+
+
+def make_fields(n, seed=0):
+    """ 'n' rows in the Fields table layout (data_access.FIELD_COLUMNS) """
+    rng = np.random.default_rng(seed + 1)
+    south, north, west, east = DC_BOUNDS
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "Name": [f"Field {i}" for i in range(1, n + 1)],
+        "Capacity": rng.integers(1, 9, size=n),
+        "Surface": rng.choice(SURFACES, size=n),
+        "Size": rng.choice(SIZES, size=n),
+        "Game Size": rng.choice(GAME_SIZES, size=n),
+        "Lights": rng.choice(YES_NO, size=n),
+        "Permanent Lines": rng.choice(YES_NO, size=n),
+        "Goals": rng.choice(YES_NO, size=n),
+        "Latitude": rng.uniform(south, north, size=n),
+        "Longitude": rng.uniform(west, east, size=n),
+    })
+
+
+def make_upload(n, seed=0):
+    """ 'n' rows shaped like a raw program CSV, as clean_uploaded_csv expects """
+    rng = np.random.default_rng(seed + 2)
+    numbers = rng.integers(100, 5000, size=n)
+    streets = rng.choice(STREETS, size=n)
+    races = np.asarray(["White", "Black", "Asian", "Hispanic", "Black, White", "Asian, White", ""])
+    return pd.DataFrame({
+        "first_name": [f"Player{i}" for i in range(n)],
+        "address": [f"{num} {street}" for num, street in zip(numbers, streets)],
+        "city": "Washington",
+        "state": "DC",
+        "zip": rng.choice(ZIPS, size=n),
+        "birth_date": _birth_dates(rng, n),
+        "Race": races[rng.integers(len(races), size=n)],
+    })
+
+
+class StubGeocoderBackend:
+    """
+    Offline geocoder: every address maps to a fixed point inside DC_BOUNDS
+    derived from its hash, so results are stable and no network is used.
+    """
+
+    def geocode(self, address):
+        digest = hashlib.blake2b(normalize_address(address).encode(), digest_size=8).digest()
+        a, b = int.from_bytes(digest[:4], "big") / 2 ** 32, int.from_bytes(digest[4:], "big") / 2 ** 32
+        south, north, west, east = DC_BOUNDS
+        return south + a * (north - south), west + b * (east - west)
+
+
+def stub_geocoder():
+    """ BatchGeocoder over StubGeocoderBackend with a throwaway cache and no rate limit """
+    return BatchGeocoder(backend=StubGeocoderBackend(), cache=GeocodeCache(":memory:"), rate_limit=None)
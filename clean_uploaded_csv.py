@@ -1,20 +1,26 @@
 import pandas as pd
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
-import time
 from datetime import datetime
+from geocoding import default_geocoder
+from zip_centroids import lookup_zip_centroids, PRECISION_ADDRESS, PRECISION_COLUMN, PRECISION_ZIP
+from instrumentation import span
+
+# Rows per chunk when streaming large CSVs through clean_csv_in_chunks
+DEFAULT_CHUNKSIZE = 50_000
 
 def get_lat_lon(address):
-    geolocator = Nominatim(user_agent="http")
-    try:
-        location = geolocator.geocode(address, timeout=10)
-        if location:
-            return location.latitude, location.longitude
-        return None, None
-    except GeocoderTimedOut:
-        return None, None
-
-def clean_uploaded_csv(df, program_name):
+    return default_geocoder().geocode(address)
+
+def clean_uploaded_csv(df, program_name, geocoder=None, geocode_mode="address"):
+    """
+    Cleans an uploaded program CSV into the Players table layout.
+
+    'geocode_mode' is "address" to geocode street addresses and fall back to
+    the ZIP centroid where that fails, or "zip" to use ZIP centroids only
+    (no network calls). 'Geocode Precision' records which one was used.
+    """
+    if geocode_mode not in (PRECISION_ADDRESS, PRECISION_ZIP):
+        raise ValueError(f"Unknown geocode_mode: {geocode_mode}")
+
     required_columns = ["address", "city", "state", "zip", "birth_date", "Race"]
 
     missing = [col for col in required_columns if col not in df.columns]
@@ -28,37 +34,67 @@ def clean_uploaded_csv(df, program_name):
         # Rename zip to Zip Code
         df.rename(columns={"zip": "Zip Code"}, inplace=True)
 
-        # Age        
-        df["birth_date"] = pd.to_datetime(df["birth_date"], errors="coerce")
+        # Age, in whole years as of today
+        birth_dates = pd.to_datetime(df["birth_date"], errors="coerce")
         today = datetime.today()
-        df["Age"] = df["birth_date"].apply(
-            lambda d: today.year - d.year - ((today.month, today.day) < (d.month, d.day)) if pd.notnull(d) else None
+        before_birthday = (birth_dates.dt.month > today.month) | (
+            (birth_dates.dt.month == today.month) & (birth_dates.dt.day > today.day)
         )
+        df["Age"] = (today.year - birth_dates.dt.year - before_birthday.astype(int)).astype("Int64")
 
-        df["birth_date"] = df["birth_date"].dt.strftime("%Y-%m-%d")
+        df["birth_date"] = birth_dates.dt.strftime("%Y-%m-%d")
         
-        # Race List
-        df["Race List"] = df["Race"].astype(str).apply(
-            lambda x: [race.strip().lower() for race in x.split(",") if race.strip()] if pd.notnull(x) else []
-        )
+        # Race List: uploads repeat a handful of Race strings, so split and
+        # tidy each distinct value once (str.split/explode) and map it back
+        codes, uniques = pd.factorize(df["Race"].astype("string").str.lower())
+        races = pd.Series(uniques, dtype="string").str.split(",").explode().str.strip()
+        races = races[races.notna() & (races != "")]
+        parsed = races.groupby(level=0).agg(list)
+        # Code -1 (missing Race) lands on the trailing empty list
+        lookup = [parsed.get(i, []) for i in range(len(uniques))] + [[]]
+        df["Race List"] = [list(lookup[code]) for code in codes]
 
         df.drop(columns=["address", "city", "state", "Race"], inplace=True, errors="ignore")
 
-        # Latitude and Longitude from Address
-        latitudes = []
-        longitudes = []
-        for addr in df["Address"]:
-            lat, lon = get_lat_lon(addr)
-            latitudes.append(lat)
-            longitudes.append(lon)
-        df["Latitude"] = latitudes
-        df["Longitude"] = longitudes
+        # Latitude and Longitude from Address (cached, deduplicated, batched)
+        df["Latitude"] = float("nan")
+        df["Longitude"] = float("nan")
+        df[PRECISION_COLUMN] = None
+        if geocode_mode == PRECISION_ADDRESS:
+            geocoder = geocoder or default_geocoder()
+            with span("clean.geocode", rows=len(df)):
+                coords = geocoder.geocode_many(df["Address"])
+            df["Latitude"] = pd.to_numeric(pd.Series([lat for lat, _ in coords], index=df.index), errors="coerce")
+            df["Longitude"] = pd.to_numeric(pd.Series([lon for _, lon in coords], index=df.index), errors="coerce")
+            df.loc[df["Latitude"].notna(), PRECISION_COLUMN] = PRECISION_ADDRESS
+
+        # ZIP centroid for everything the address geocoder couldn't place
+        unresolved = df["Latitude"].isna()
+        with span("clean.zip_fallback", rows=int(unresolved.sum())):
+            zip_lat, zip_lon = lookup_zip_centroids(df.loc[unresolved, "Zip Code"])
+        df.loc[unresolved, "Latitude"] = zip_lat
+        df.loc[unresolved, "Longitude"] = zip_lon
+        df.loc[unresolved & df["Latitude"].notna(), PRECISION_COLUMN] = PRECISION_ZIP
 
         # Final cleaning
         df["Program"] = program_name
-        df = df.where(pd.notnull(df), None)
+        df = df.astype(object).where(pd.notnull(df), None)
 
         return df
 
     except Exception as e:
         raise ValueError(f"Failed to clean CSV: {str(e)}")
+
+
+def clean_csv_in_chunks(source, program_name, chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+    """
+    Streams a CSV (path or file-like) through clean_uploaded_csv
+    'chunksize' rows at a time, yielding one cleaned DataFrame per chunk so
+    large historical imports never sit in memory all at once. Extra
+    keyword arguments are passed on to clean_uploaded_csv; the geocode
+    cache dedupes repeated addresses across chunks. ZIPs are read as text:
+    inferred per chunk, a chunk of numeric ZIPs with a gap would come out
+    as floats ("20001.0") while its neighbours keep "20001".
+    """
+    for chunk in pd.read_csv(source, chunksize=chunksize, dtype={"zip": str}):
+        yield clean_uploaded_csv(chunk, program_name, **kwargs)
@@ -0,0 +1,588 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from instrumentation import ROWS_FETCHED, SUPABASE_REQUESTS, bind, count, span
+
+logger = logging.getLogger(__name__)
+
+# Columns the app actually reads; selecting only these keeps every page small
+PLAYER_COLUMNS = [
+    "id", "Program", "Age", "Gender", "Grade", "School", "Race List",
+    "birth_date", "Zip Code", "Latitude", "Longitude",
+]
+FIELD_COLUMNS = [
+    "id", "Name", "Capacity", "Surface", "Size", "Game Size", "Lights",
+    "Permanent Lines", "Goals", "Latitude", "Longitude",
+]
+
+# Compact in-memory types: float32 coordinates (~0.5 m), small nullable
+# ints, and categoricals for repeated strings. Columns not listed keep
+# whatever type they arrive with.
+PLAYER_DTYPES = {
+    "id": "Int32", "Age": "Int8", "Latitude": "float32", "Longitude": "float32",
+    "Program": "category", "Gender": "category", "Grade": "category", "School": "category",
+    "Race List": "category", "birth_date": "category", "Zip Code": "category",
+}
+FIELD_DTYPES = {
+    "id": "Int32", "Capacity": "Int16", "Latitude": "float32", "Longitude": "float32",
+    "Surface": "category", "Size": "category", "Game Size": "category", "Lights": "category",
+    "Permanent Lines": "category", "Goals": "category",
+}
+
+PAGE_SIZE = 1000
+MAX_WORKERS = 4
+
+# Rows per insert request for bulk uploads
+INSERT_BATCH_SIZE = 500
+
+# Postgres error code for a column that does not exist
+UNDEFINED_COLUMN = "42703"
+
+# Seconds between full reloads of a CachedTable. Deltas only see new rows,
+# so edits and deletes made elsewhere (another instance, the Supabase
+# console) show up after at most this long
+FULL_RELOAD_SECONDS = 3600
+
+
+class SchemaError(Exception):
+    """ Raised when a table lacks columns the app (or CachedTable's key / high-water mark) relies on """
+
+
+def select_clause(columns=None):
+    """ PostgREST select string; names with spaces etc. are double-quoted """
+    if not columns:
+        return "*"
+    return ",".join(c if c.isidentifier() else f'"{c}"' for c in columns)
+
+
+def _page_query(client, table_name, columns, order_by, count=None):
+    query = client.table(table_name).select(select_clause(columns), count=count)
+    if order_by:
+        query = query.order(order_by)
+    return query
+
+
+def compact_frame(df, dtypes):
+    """
+    'df' with the columns named in 'dtypes' converted to those compact
+    types. Numbers are coerced (unparseable values become missing);
+    categorical columns hold each distinct string once. An integer column
+    with values outside its compact type is widened to Int64 rather than
+    failing the load.
+    """
+    out = {}
+    for column in df.columns:
+        dtype = dtypes.get(column)
+        values = df[column]
+        if dtype is None or values.dtype == dtype:
+            out[column] = values
+        elif dtype == "category":
+            # Lists (e.g. a freshly uploaded Race List) are not hashable; store them as text
+            if values.dtype == object:
+                values = values.map(lambda v: str(v) if isinstance(v, (list, tuple)) else v)
+            out[column] = values.astype("category")
+        elif dtype.startswith("Int"):
+            out[column] = _compact_ints(values, dtype)
+        else:
+            out[column] = pd.to_numeric(values, errors="coerce").astype(dtype)
+    return pd.DataFrame(out, index=df.index)
+
+
+def _compact_ints(values, dtype):
+    """ 'values' as nullable 'dtype', or Int64 if they don't fit; non-finite and huge values become missing """
+    numbers = pd.to_numeric(values, errors="coerce").astype("float64").round()
+    numbers = numbers.where(numbers.abs() < 2.0 ** 63)
+    limits = np.iinfo(pd.api.types.pandas_dtype(dtype).numpy_dtype)
+    if numbers.notna().any() and (numbers.min() < limits.min or numbers.max() > limits.max):
+        dtype = "Int64"
+    return numbers.astype(dtype)
+
+
+class TableBackend(ABC):
+    """
+    The table operations the app needs from Supabase, one method each.
+    SupabaseBackend adapts a supabase client; async_data.DataClient
+    implements them over a pooled httpx client. Helpers in this module
+    take either (see as_backend). Every method is abstract, so a backend
+    missing one fails when it is created rather than mid-request.
+    """
+
+    @abstractmethod
+    def fetch_table(self, table_name, columns=None, page_size=PAGE_SIZE, order_by="id"):
+        """ Every row of 'table_name' as a DataFrame """
+
+    @abstractmethod
+    def fetch_rows_after(self, table_name, column, value, columns=None, page_size=PAGE_SIZE):
+        """ Rows whose 'column' is strictly greater than 'value', as a DataFrame """
+
+    @abstractmethod
+    def has_column(self, table_name, column):
+        """ True if 'table_name' has 'column' """
+
+    @abstractmethod
+    def insert_rows(self, table_name, rows, on_conflict=None):
+        """ Inserts (or upserts on 'on_conflict') 'rows'; returns the written rows """
+
+    @abstractmethod
+    def delete_rows(self, table_name, column, operator, value):
+        """ Deletes rows matching one PostgREST filter, e.g. ("Program", "imatch", pattern) or ("id", "in", ids) """
+
+
+class SupabaseBackend(TableBackend):
+    """
+    TableBackend over a supabase-py client. Paged reads ask for the first
+    page together with an exact row count and then fetch the remaining
+    pages from 'max_workers' threads, so N pages cost about two round trips.
+    """
+
+    def __init__(self, client, max_workers=MAX_WORKERS):
+        self.client = client
+        self.max_workers = max_workers
+
+    def fetch_table(self, table_name, columns=None, page_size=PAGE_SIZE, order_by="id"):
+        client = self.client
+        first = _page_query(client, table_name, columns, order_by, count="exact").range(0, page_size - 1).execute()
+        rows = list(first.data or [])
+        total = first.count if first.count is not None else len(rows)
+
+        starts = range(page_size, total, page_size)
+        count(SUPABASE_REQUESTS, 1 + len(starts))
+        if starts:
+            def fetch_page(start):
+                return _page_query(client, table_name, columns, order_by).range(start, start + page_size - 1).execute().data
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for page in pool.map(bind(fetch_page), starts):
+                    rows.extend(page or [])
+
+        return pd.DataFrame(rows, columns=columns or None)
+
+    def fetch_rows_after(self, table_name, column, value, columns=None, page_size=PAGE_SIZE):
+        rows = []
+        start = 0
+        while True:
+            page = (
+                _page_query(self.client, table_name, columns, column)
+                .gt(column, value)
+                .range(start, start + page_size - 1)
+                .execute()
+                .data
+            )
+            count(SUPABASE_REQUESTS)
+            rows.extend(page or [])
+            if not page or len(page) < page_size:
+                break
+            start += page_size
+        return pd.DataFrame(rows, columns=columns or None)
+
+    def has_column(self, table_name, column):
+        try:
+            self.client.table(table_name).select(select_clause([column])).limit(1).execute()
+        except Exception as e:
+            if getattr(e, "code", None) == UNDEFINED_COLUMN:
+                return False
+            raise
+        finally:
+            count(SUPABASE_REQUESTS)
+        return True
+
+    def insert_rows(self, table_name, rows, on_conflict=None):
+        query = self.client.table(table_name)
+        if on_conflict:
+            query = query.upsert(rows, on_conflict=on_conflict)
+        else:
+            query = query.insert(rows)
+        count(SUPABASE_REQUESTS)
+        return query.execute().data or []
+
+    def delete_rows(self, table_name, column, operator, value):
+        query = self.client.table(table_name).delete()
+        if operator == "in":
+            query = query.in_(column, list(value))
+        else:
+            query = query.filter(column, operator, value)
+        query.execute()
+        count(SUPABASE_REQUESTS)
+
+
+def as_backend(client, max_workers=MAX_WORKERS):
+    """ 'client' itself if it is a TableBackend, else a SupabaseBackend around the supabase client """
+    return client if isinstance(client, TableBackend) else SupabaseBackend(client, max_workers=max_workers)
+
+
+def fetch_table(client, table_name, columns=None, page_size=PAGE_SIZE, max_workers=MAX_WORKERS, order_by="id"):
+    """
+    Fetches every row of 'table_name' as a DataFrame, from a TableBackend
+    or a supabase client (see as_backend).
+    """
+    with span("supabase.fetch_table", table=table_name) as s:
+        df = as_backend(client, max_workers).fetch_table(table_name, columns, page_size=page_size, order_by=order_by)
+        s.set(rows=len(df))
+        count(ROWS_FETCHED, len(df))
+        return df
+
+
+def fetch_rows_after(client, table_name, column, value, columns=None, page_size=PAGE_SIZE):
+    """ Rows whose 'column' is strictly greater than 'value', as a DataFrame """
+    with span("supabase.fetch_rows_after", table=table_name) as s:
+        df = as_backend(client).fetch_rows_after(table_name, column, value, columns, page_size=page_size)
+        s.set(rows=len(df))
+        count(ROWS_FETCHED, len(df))
+        return df
+
+
+def table_has_column(client, table_name, column):
+    """
+    True if 'table_name' has 'column'. Writes use this for columns added
+    by a migration in sql/ that may not have been applied yet.
+    """
+    return as_backend(client).has_column(table_name, column)
+
+
+class CachedTable:
+    """
+    In-memory copy of a Supabase table.
+
+    - get() serves the cached rows while they are younger than 'ttl'
+      seconds, together with their version.
+    - Once stale, a single delta query fetches rows whose high-water-mark
+      column ('hwm_column', e.g. id or updated_at) is past the largest value
+      seen so far, and merges them in by 'key_column'.
+    - invalidate() forces a full reload on the next get(); call it after
+      anything (like a delete) that a high-water mark cannot see.
+    - Every 'full_ttl' seconds the refresh is a full reload instead of a
+      delta, which catches edits and deletes made by other processes.
+    - With a 'snapshot' (a snapshot_store.SnapshotStore), the first get()
+      serves the local Parquet copy straight away and reloads the whole
+      table from Supabase on a background thread (the snapshot may be
+      missing edits and deletes made since it was saved); later syncs
+      run there too and re-save the snapshot. If Supabase is unreachable
+      the snapshot keeps serving.
+
+    'version' goes up every time the cached rows change, so anything
+    derived from the table can be cached against it. Key such caches on
+    the version get() returns with the rows, not on the attribute, which
+    a concurrent refresh may already have moved on.
+
+    'dtypes' (e.g. PLAYER_DTYPES) compacts the rows after every load and
+    merge, and get(copy=False) hands out the one shared frame instead of
+    a copy, so any number of sessions cost a single copy per version.
+
+    The first load raises SchemaError if the table lacks 'columns',
+    'key_column' or 'hwm_column'; a snapshot missing any of them is
+    ignored in favour of a full load.
+    """
+
+    def __init__(self, client, table_name, columns=None, key_column="id", hwm_column="id", ttl=300,
+                 snapshot=None, dtypes=None, full_ttl=FULL_RELOAD_SECONDS):
+        self.client = as_backend(client)
+        self.table_name = table_name
+        self.columns = columns
+        self.key_column = key_column
+        self.hwm_column = hwm_column
+        self.ttl = ttl
+        self.full_ttl = full_ttl
+        self.snapshot = snapshot
+        self.dtypes = dtypes
+        self._df = None
+        self._hwm = None
+        self._fetched_at = 0.0
+        # When the rows were last checked against the whole table (None: never)
+        self._full_at = None
+        self._lock = threading.Lock()
+        self._syncing = False
+        self._generation = 0
+        self.version = 0
+
+    def get(self, copy=True):
+        """
+        Returns (DataFrame, version) for the table, refreshing it first if
+        needed; both are read under the lock, so the version is that of
+        these rows. With copy=False the cached frame itself is returned;
+        it is replaced, never modified, on refresh, so it is safe to read
+        but must not be written to.
+        """
+        with self._lock:
+            if self._df is None:
+                if not self._load_snapshot():
+                    self._full_load()
+            elif time.monotonic() - self._fetched_at > self.ttl:
+                if self.snapshot is not None:
+                    self._start_background_sync()
+                else:
+                    self._merge(self._fetch_delta(self._sync_from()))
+            return (self._df.copy() if copy else self._df), self.version
+
+    def invalidate(self):
+        """ Drops the cached rows so the next get() reloads the whole table """
+        with self._lock:
+            self._df = None
+            self._hwm = None
+            self._generation += 1
+            if self.snapshot is not None:
+                self.snapshot.delete(self.table_name)
+
+    def _missing_columns(self, df):
+        if df.empty and not self.columns:
+            # select * of an empty table has no columns to check
+            return []
+        required = list(self.columns or []) + [self.key_column, self.hwm_column]
+        return sorted({c for c in required if c not in df.columns})
+
+    def _compact(self, df):
+        return compact_frame(df, self.dtypes) if self.dtypes else df
+
+    def _load_snapshot(self):
+        if self.snapshot is None:
+            return False
+        df, stamp = self.snapshot.load(self.table_name, self.columns)
+        if df is None:
+            return False
+        missing = self._missing_columns(df)
+        if missing:
+            logger.warning("Ignoring %s snapshot without column(s) %s", self.table_name, missing)
+            return False
+        self._df = self._compact(df)
+        self._hwm = stamp.get("hwm")
+        self._update_hwm(df)
+        self._full_at = None
+        self.version += 1
+        # Serve the snapshot now and reload from Supabase in the background
+        self._start_background_sync()
+        return True
+
+    def _save_snapshot(self):
+        if self.snapshot is not None:
+            try:
+                self.snapshot.save(self.table_name, self._df, hwm=self._hwm, version=self.version)
+            except Exception:
+                logger.exception("Could not save %s snapshot", self.table_name)
+
+    def _full_load(self):
+        df = fetch_table(self.client, self.table_name, self.columns, order_by=self.key_column)
+        missing = self._missing_columns(df)
+        if missing:
+            raise SchemaError(
+                f"{self.table_name} has no column(s) {', '.join(map(repr, missing))}; the cache needs "
+                f"'{self.key_column}' as its key and '{self.hwm_column}' for incremental refresh"
+            )
+        self._df = self._compact(df)
+        self._hwm = None
+        self._update_hwm(self._df)
+        self._fetched_at = self._full_at = time.monotonic()
+        self.version += 1
+        self._save_snapshot()
+
+    def _sync_from(self):
+        """ High-water mark for the next refresh; None when a full reload is due """
+        if self._full_at is None or time.monotonic() - self._full_at > self.full_ttl:
+            return None
+        return self._hwm
+
+    def _fetch_delta(self, hwm):
+        """ Rows added since 'hwm' (the whole table if there is none yet); no lock needed """
+        if hwm is None:
+            return fetch_table(self.client, self.table_name, self.columns, order_by=self.key_column), True
+        return fetch_rows_after(self.client, self.table_name, self.hwm_column, hwm, self.columns), False
+
+    def _merge(self, fetched):
+        """ Folds a _fetch_delta result into the cached rows (caller holds the lock) """
+        delta, complete = fetched
+        if complete:
+            reloaded = self._compact(delta)
+            self._hwm = None
+            self._update_hwm(delta)
+            self._full_at = time.monotonic()
+            # Unchanged rows keep their version, so nothing derived is rebuilt
+            if not reloaded.equals(self._df):
+                self._df = reloaded
+                self.version += 1
+                self._save_snapshot()
+        elif not delta.empty:
+            merged = pd.concat([self._df, delta], ignore_index=True)
+            if self.key_column in merged.columns:
+                merged = merged.drop_duplicates(subset=[self.key_column], keep="last", ignore_index=True)
+            self._df = self._compact(merged)
+            self._update_hwm(delta)
+            self.version += 1
+            self._save_snapshot()
+        self._fetched_at = time.monotonic()
+
+    def _start_background_sync(self):
+        if self._syncing:
+            return
+        self._syncing = True
+        threading.Thread(target=self._background_sync, args=(self._sync_from(), self._generation),
+                         daemon=True).start()
+
+    def _background_sync(self, hwm, generation):
+        try:
+            fetched = self._fetch_delta(hwm)
+            with self._lock:
+                # Skip if the table was invalidated while we were fetching
+                if generation == self._generation and self._df is not None:
+                    self._merge(fetched)
+        except Exception:
+            logger.warning("Background sync of %s failed; serving cached rows", self.table_name, exc_info=True)
+            with self._lock:
+                self._fetched_at = time.monotonic()
+        finally:
+            self._syncing = False
+
+    def _update_hwm(self, df):
+        if self.hwm_column in df.columns and not df[self.hwm_column].dropna().empty:
+            latest = df[self.hwm_column].dropna().max()
+            self._hwm = latest if self._hwm is None else max(self._hwm, latest)
+
+
+def get_all(tables, max_workers=MAX_WORKERS, copy=True):
+    """
+    get() on several CachedTables at once, returning their
+    (DataFrame, version) pairs in order. With a pooled client their loads
+    overlap, so the wait is about that of the slowest table.
+    """
+    tables = list(tables)
+    if len(tables) <= 1:
+        return [table.get(copy=copy) for table in tables]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tables))) as pool:
+        return list(pool.map(bind(lambda table: table.get(copy=copy)), tables))
+
+
+class BulkInsertError(Exception):
+    """
+    Raised by bulk_insert when a batch fails. 'inserted' is how many rows
+    are still in the table afterwards (0 after a rollback) and 'remaining'
+    holds the records that did not make it in, so the upload can be
+    resumed by passing them back to bulk_insert. If the rollback itself
+    failed, 'rollback_error' is that exception and some written rows may
+    or may not have been deleted. 'unconfirmed' holds the records of
+    batches whose request failed after reaching the server (e.g. a read
+    timeout): those rows may have been written, and a rollback cannot
+    find them.
+    """
+
+    def __init__(self, message, inserted=0, remaining=None, rollback_error=None, unconfirmed=None):
+        super().__init__(message)
+        self.inserted = inserted
+        self.remaining = remaining or []
+        self.rollback_error = rollback_error
+        self.unconfirmed = unconfirmed or []
+
+    @property
+    def rolled_back(self):
+        """ True if every row this upload wrote is known to be gone again """
+        return self.inserted == 0 and self.rollback_error is None and not self.unconfirmed
+
+
+# Insert failures that happened before the request reached the server
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _outcome_unknown(error):
+    """
+    Whether an insert that raised 'error' may still have been committed:
+    the request was sent but no answer came back (timeouts, dropped
+    connections), or a gateway answered 5xx. Errors the database itself
+    returned mean the batch was rejected as a whole.
+    """
+    if isinstance(error, _NOT_SENT_ERRORS):
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def _chunks(records, size):
+    return [records[i:i + size] for i in range(0, len(records), size)]
+
+
+def delete_ids(client, table_name, ids, key_column="id", batch_size=INSERT_BATCH_SIZE):
+    """ Deletes rows by primary key, 'batch_size' keys per request """
+    backend = as_backend(client)
+    for chunk in _chunks(list(ids), batch_size):
+        backend.delete_rows(table_name, key_column, "in", chunk)
+
+
+def bulk_insert(client, table_name, records, batch_size=INSERT_BATCH_SIZE, max_workers=MAX_WORKERS,
+                on_conflict=None, rollback=True, on_progress=None, key_column="id"):
+    """
+    Inserts 'records' (a list of row dicts) in batches of 'batch_size' rows,
+    running at most 'max_workers' batches at once.
+
+    - 'on_conflict' switches to an upsert on that natural key (a
+      comma-separated column list backed by a unique constraint), which
+      makes re-running a partially failed upload safe.
+    - 'on_progress(done_rows, total_rows)' is called after every batch.
+    - If any batch fails, no further batches are started. With 'rollback'
+      the rows already written are deleted again (by 'key_column');
+      either way a BulkInsertError is raised. Upserts are never rolled
+      back: their returned rows include existing rows that were only
+      updated, and deleting those would lose data. Re-run them instead.
+    - A batch that failed after reaching the server may have been written
+      without returning its ids; it is reported in 'unconfirmed' and the
+      rollback is not complete (see BulkInsertError.rolled_back).
+
+    Returns the number of rows written.
+    """
+    batches = _chunks(list(records), batch_size)
+    total = sum(len(b) for b in batches)
+    done = 0
+    inserted_ids = []
+    failed = []
+    errors = []
+    unconfirmed = []
+
+    backend = as_backend(client)
+
+    def send(batch):
+        return backend.insert_rows(table_name, batch, on_conflict=on_conflict) or []
+
+    send = bind(send)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(send, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            batch = futures[future]
+            try:
+                written = future.result()
+            except Exception as e:
+                failed.append(batch)
+                errors.append(e)
+                if _outcome_unknown(e):
+                    unconfirmed.extend(batch)
+                # Batches already running finish; queued ones are dropped
+                for other in futures:
+                    if other.cancel():
+                        failed.append(futures[other])
+                continue
+            inserted_ids.extend(row[key_column] for row in written if key_column in row)
+            done += len(batch)
+            if on_progress:
+                on_progress(done, total)
+
+    if not errors:
+        return done
+
+    message = f"{len(failed)} of {len(batches)} batches failed inserting into {table_name}: {errors[0]}"
+    if unconfirmed:
+        message += f"; {len(unconfirmed)} rows may have been written without confirmation"
+    remaining = [row for batch in failed for row in batch]
+    if rollback and not on_conflict:
+        try:
+            delete_ids(client, table_name, inserted_ids, key_column=key_column)
+        except Exception as e:
+            raise BulkInsertError(
+                f"{message}; rolling back the {done} written rows also failed: {e}",
+                inserted=done, remaining=remaining, rollback_error=e, unconfirmed=unconfirmed,
+            ) from e
+        remaining = list(records)
+        done = 0
+    raise BulkInsertError(message, inserted=done, remaining=remaining, unconfirmed=unconfirmed)
@@ -1,22 +1,173 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from geopy.distance import distance
+from geopy.distance import geodesic
+
+from instrumentation import span
+
+# Mean Earth radius in miles (IUGG), used by the haversine kernel
+EARTH_RADIUS_MILES = 3958.7613
+
+# WGS-84 ellipsoid, used by the exact (Vincenty) kernel
+WGS84_A_MILES = 6378137.0 / 1609.344
+WGS84_F = 1 / 298.257223563
+WGS84_B_MILES = WGS84_A_MILES * (1 - WGS84_F)
+
+# Number of player rows pushed through the kernel at once; keeps a chunk of
+# the intermediate arrays at roughly chunk_size * n_fields * 8 bytes each
+DEFAULT_CHUNK_SIZE = 2048
+
+DISTANCE_METHODS = ("haversine", "exact")
 
-def calculate_distances(players_df, fields_df):
+# find_optimal_field_for_data metric that ranks fields by road travel time
+# (minutes) through a travel_time.RoadGraph instead of miles
+TRAVEL_TIME = "travel_time"
+
+# Grouped searches over at least this many players fan out to a process
+# pool when n_jobs is not given
+PARALLEL_MIN_PLAYERS = 200_000
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
     """
-    Computes the distance in miles from each player to each field,
-    returning a DataFrame whose columns are field names and rows are players.
+    Great-circle distance in miles between points given in degrees.
+    Inputs are broadcast against each other, so passing a column of players
+    and a row of fields returns the full players x fields matrix.
     """
-    # Prepare an empty DataFrame with player indices vs. field Names
-    distances = pd.DataFrame(index=players_df.index, columns=fields_df['Name'])
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64))
+                              for a in (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
 
-    for player_idx, player in players_df.iterrows():
-        player_coords = (player['latitude'], player['longitude'])
-        for field_idx, field in fields_df.iterrows():
-            field_coords = (field['latitude'], field['longitude'])
-            # Use geopy.distance to compute miles
-            distances.at[player_idx, field['Name']] = distance(player_coords, field_coords).miles
 
-    return distances
+def vincenty_miles(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """
+    Ellipsoidal (WGS-84) distance in miles using Vincenty's inverse formula,
+    vectorized over broadcast inputs. Agrees with geopy's geodesic to well
+    under a millimetre; the rare nearly-antipodal pairs where the iteration
+    does not converge are handed to geopy directly.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (lat1, lon1, lat2, lon2))
+    )
+    f = WGS84_F
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    L = np.radians(lon2 - lon1)
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cosU2 * sin_lam) ** 2 +
+                                (cosU1 * sinU2 - sinU1 * cosU2 * cos_lam) ** 2)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0; the term vanishes there
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0,
+                                    cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = (np.abs(lam - lam_prev) <= tol) | ~np.isfinite(lam)
+            if converged.all():
+                break
+
+        a, b = WGS84_A_MILES, WGS84_B_MILES
+        u2 = cos2_alpha * (a ** 2 - b ** 2) / b ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+            B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        miles = b * A * (sigma - delta_sigma)
+
+    # Coincident points come out as NaN from the 0/0 above
+    miles = np.where(sin_sigma == 0, 0.0, miles)
+
+    stragglers = (~converged | ~np.isfinite(miles)) & np.isfinite(lat1) & np.isfinite(lat2) & np.isfinite(lon1) & np.isfinite(lon2)
+    if stragglers.any():
+        miles = miles.copy()
+        for idx in map(tuple, np.argwhere(stragglers)):
+            miles[idx] = geodesic((lat1[idx], lon1[idx]), (lat2[idx], lon2[idx])).miles
+    return miles
+
+
+def _distance_kernel(method):
+    if method == "haversine":
+        return haversine_miles
+    if method == "exact":
+        return vincenty_miles
+    raise ValueError(f"Unknown distance method '{method}'; expected one of {DISTANCE_METHODS}")
+
+
+def iter_distance_blocks(player_coords, field_coords, method="haversine", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields (start_row, block) pairs where 'block' is the float64 distance
+    matrix in miles for players[start_row:start_row + chunk_size] against
+    every field. Coordinates are (n, 2) arrays of (lat, lon) in degrees.
+    """
+    kernel = _distance_kernel(method)
+    player_coords = np.asarray(player_coords, dtype=np.float64).reshape(-1, 2)
+    field_coords = np.asarray(field_coords, dtype=np.float64).reshape(-1, 2)
+    field_lat = field_coords[:, 0][np.newaxis, :]
+    field_lon = field_coords[:, 1][np.newaxis, :]
+
+    for start in range(0, len(player_coords), max(int(chunk_size), 1)):
+        chunk = player_coords[start:start + chunk_size]
+        yield start, kernel(chunk[:, 0:1], chunk[:, 1:2], field_lat, field_lon)
+
+
+def distance_matrix(player_coords, field_coords, method="haversine", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Returns the full (n_players, n_fields) float64 matrix of distances in miles.
+    Players are processed in chunks of 'chunk_size' rows so the kernel's
+    temporaries stay bounded no matter how many players are passed.
+    """
+    player_coords = np.asarray(player_coords, dtype=np.float64).reshape(-1, 2)
+    field_coords = np.asarray(field_coords, dtype=np.float64).reshape(-1, 2)
+    out = np.empty((len(player_coords), len(field_coords)), dtype=np.float64)
+    for start, block in iter_distance_blocks(player_coords, field_coords, method, chunk_size):
+        out[start:start + len(block)] = block
+    return out
+
+
+def coordinate_array(df, lat_col="latitude", lon_col="longitude"):
+    """ Returns the (n, 2) float64 array of (lat, lon) for 'df' """
+    return np.column_stack([
+        pd.to_numeric(df[lat_col], errors="coerce").to_numpy(dtype=np.float64),
+        pd.to_numeric(df[lon_col], errors="coerce").to_numpy(dtype=np.float64),
+    ])
+
+
+def calculate_distances(players_df, fields_df, method="haversine", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Computes the distance in miles from each player to each field,
+    returning a DataFrame whose columns are field names and rows are players.
+
+    'method' is "haversine" (great-circle, the default) or "exact" for the
+    WGS-84 ellipsoidal distance that matches geopy's geodesic.
+    """
+    matrix = distance_matrix(
+        coordinate_array(players_df),
+        coordinate_array(fields_df),
+        method=method,
+        chunk_size=chunk_size,
+    )
+    return pd.DataFrame(matrix, index=players_df.index, columns=fields_df['Name'])
 
 def find_optimal_field(distance_df):
     """
@@ -27,7 +178,227 @@ def find_optimal_field(distance_df):
     avg_distances = distance_df.mean()
     return avg_distances, avg_distances.idxmin()
 
-def group_and_print_optimal_fields(players_df, fields_df, group_col, label_prefix=None):
+class DistanceSketch:
+    """
+    Fixed-size log-bucketed histogram of distances for many fields at once.
+    Quantiles read back from it are within 'relative_accuracy' of the true
+    value, and memory is O(n_fields * n_buckets) however many players pass
+    through it.
+    """
+
+    def __init__(self, n_fields, relative_accuracy=0.01, min_miles=0.01, max_miles=13000.0):
+        self.n_fields = n_fields
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.min_miles = min_miles
+        self.log_gamma = np.log(self.gamma)
+        # Bucket 0 collects everything under min_miles, the last one the overflow
+        self.n_buckets = int(np.ceil(np.log(max_miles / min_miles) / self.log_gamma)) + 2
+        self.counts = np.zeros((n_fields, self.n_buckets), dtype=np.int64)
+
+    def update(self, block):
+        """ Adds a (n_players, n_fields) block; NaN entries are ignored """
+        valid = np.isfinite(block)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            buckets = np.floor(np.log(block / self.min_miles) / self.log_gamma) + 1
+        buckets = np.clip(np.nan_to_num(buckets, nan=0.0, neginf=0.0), 0, self.n_buckets - 1).astype(np.int64)
+        flat = (np.arange(self.n_fields)[np.newaxis, :] * self.n_buckets + buckets)[valid]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def quantile(self, q):
+        """ Returns the per-field q-quantile (0 <= q <= 1), NaN for empty fields """
+        totals = self.counts.sum(axis=1)
+        cumulative = np.cumsum(self.counts, axis=1)
+        rank = np.ceil(q * totals).clip(min=1)
+        bucket = (cumulative < rank[:, np.newaxis]).sum(axis=1)
+        # Bucket b covers [min * gamma^(b-1), min * gamma^b); this estimate is
+        # within relative_accuracy of anything in that range
+        value = self.min_miles * self.gamma ** bucket * 2 / (1 + self.gamma)
+        value = np.where(bucket == 0, 0.0, value)
+        return np.where(totals > 0, value, np.nan)
+
+
+class FieldDistanceReducer:
+    """
+    Streams blocks of players through the distance kernel and keeps only
+    per-field running statistics (count, sum, min, max and a quantile
+    sketch), so summarizing any number of players needs O(fields) memory.
+
+    Example:
+        reducer = FieldDistanceReducer(fields_df)
+        for page in player_pages:
+            reducer.update(page)
+        summary = reducer.summary()
+    """
+
+    def __init__(self, fields_df, method="haversine", chunk_size=DEFAULT_CHUNK_SIZE,
+                 lat_col="Latitude", lon_col="Longitude", percentiles=(50, 90)):
+        field_coords = coordinate_array(fields_df, lat_col, lon_col)
+        field_ok = ~np.isnan(field_coords).any(axis=1)
+        self.field_coords = field_coords[field_ok]
+        self.field_names = fields_df["Name"].to_numpy()[field_ok]
+        self.method = method
+        self.chunk_size = chunk_size
+        self.lat_col = lat_col
+        self.lon_col = lon_col
+        self.percentiles = tuple(percentiles)
+
+        n = len(self.field_coords)
+        self.count = 0
+        self.sums = np.zeros(n, dtype=np.float64)
+        self.mins = np.full(n, np.inf)
+        self.maxs = np.full(n, -np.inf)
+        self.sketch = DistanceSketch(n) if self.percentiles else None
+
+    def update(self, players):
+        """
+        Folds a batch of players into the running statistics. 'players' may
+        be a DataFrame with the reducer's lat/lon columns or an (n, 2) array.
+        Players missing coordinates are skipped.
+        """
+        if isinstance(players, pd.DataFrame):
+            coords = coordinate_array(players, self.lat_col, self.lon_col)
+        else:
+            coords = np.asarray(players, dtype=np.float64).reshape(-1, 2)
+        coords = coords[~np.isnan(coords).any(axis=1)]
+        if len(coords) == 0 or len(self.field_coords) == 0:
+            return self
+
+        for _, block in iter_distance_blocks(coords, self.field_coords, self.method, self.chunk_size):
+            self.sums += block.sum(axis=0)
+            np.minimum(self.mins, block.min(axis=0), out=self.mins)
+            np.maximum(self.maxs, block.max(axis=0), out=self.maxs)
+            if self.sketch is not None:
+                self.sketch.update(block)
+        self.count += len(coords)
+        return self
+
+    def mean_distances(self):
+        """ Series of average distance per field name (NaN before any update) """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sums / self.count if self.count else np.full(len(self.sums), np.nan)
+        return pd.Series(means, index=pd.Index(self.field_names, name="Name"))
+
+    def summary(self):
+        """
+        DataFrame indexed by field name with columns count, mean, min, max
+        and one 'pNN' column per requested percentile (approximate, ~1%).
+        """
+        empty = self.count == 0
+        summary = pd.DataFrame({
+            "count": self.count,
+            "mean": self.mean_distances().to_numpy(),
+            "min": np.nan if empty else self.mins,
+            "max": np.nan if empty else self.maxs,
+        }, index=pd.Index(self.field_names, name="Name"))
+        for p in self.percentiles:
+            summary[f"p{p:g}"] = self.sketch.quantile(p / 100.0)
+        return summary
+
+    def best_field(self):
+        """ (best_field_name, avg_distance) or (None, None) with no data """
+        if self.count == 0 or len(self.sums) == 0:
+            return None, None
+        best = int(np.argmin(self.sums))
+        return self.field_names[best], float(self.sums[best] / self.count)
+
+
+def summarize_field_distances(players, fields_df, method="haversine", chunk_size=DEFAULT_CHUNK_SIZE,
+                              percentiles=(50, 90)):
+    """
+    Streams 'players' (a DataFrame or any iterable of DataFrame pages, e.g.
+    straight from Supabase paging) against 'fields_df' and returns the
+    per-field summary from FieldDistanceReducer without ever building the
+    full players x fields matrix.
+    """
+    reducer = FieldDistanceReducer(fields_df, method=method, chunk_size=chunk_size, percentiles=percentiles)
+    if isinstance(players, pd.DataFrame):
+        players = [players]
+    for page in players:
+        reducer.update(page)
+    return reducer.summary()
+
+def _group_distance_sums(player_coords, group_codes, n_groups, field_coords, method, chunk_size):
+    """
+    Per-group sums of player -> field distances for one slice of players,
+    as an (n_groups, n_fields) array. Top-level so process pools can use it.
+    """
+    sums = np.zeros((n_groups, len(field_coords)))
+    for start, block in iter_distance_blocks(player_coords, field_coords, method, chunk_size):
+        codes = group_codes[start:start + len(block)]
+        sums += pd.DataFrame(block).groupby(codes).sum().reindex(range(n_groups), fill_value=0.0).to_numpy()
+    return sums
+
+
+def optimal_fields_by_group(players_df, fields_df, group_col, method="haversine", runner_ups=2,
+                            n_jobs=None, chunk_size=DEFAULT_CHUNK_SIZE, lat_col="Latitude", lon_col="Longitude"):
+    """
+    Best field for every value of 'group_col' (age, grade, birth year, ...)
+    in one pass: player x field distances are computed once, block by
+    block, and summed per group, rather than rebuilding a distance matrix
+    for each group.
+
+    'n_jobs' > 1 splits the players across that many processes; by default
+    a pool is only used for PARALLEL_MIN_PLAYERS players or more. Workers
+    are spawned, not forked, so calling this from a threaded server (like
+    Streamlit's) cannot deadlock on locks copied into the children.
+
+    Returns a DataFrame with one row per group: group_col, 'Players',
+    'Best Field', 'Avg Distance', then 'Runner Up N' / 'Runner Up N Distance'
+    for the next 'runner_ups' fields. Players without coordinates or a
+    group value are left out.
+    """
+    columns = [group_col, "Players", "Best Field", "Avg Distance"]
+    for i in range(1, runner_ups + 1):
+        columns += [f"Runner Up {i}", f"Runner Up {i} Distance"]
+
+    player_coords = coordinate_array(players_df, lat_col, lon_col)
+    field_coords = coordinate_array(fields_df, lat_col, lon_col)
+    field_ok = ~np.isnan(field_coords).any(axis=1)
+    field_coords = field_coords[field_ok]
+    field_names = fields_df["Name"].to_numpy()[field_ok]
+
+    codes, groups = pd.factorize(players_df[group_col], sort=True)
+    keep = (codes >= 0) & ~np.isnan(player_coords).any(axis=1)
+    player_coords, codes = player_coords[keep], codes[keep]
+    if len(player_coords) == 0 or len(field_coords) == 0:
+        return pd.DataFrame(columns=columns)
+
+    if n_jobs is None:
+        n_jobs = (os.cpu_count() or 1) if len(player_coords) >= PARALLEL_MIN_PLAYERS else 1
+    if n_jobs > 1:
+        slices = np.array_split(np.arange(len(player_coords)), n_jobs)
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = pool.map(
+                _group_distance_sums,
+                [player_coords[s] for s in slices], [codes[s] for s in slices],
+                [len(groups)] * n_jobs, [field_coords] * n_jobs, [method] * n_jobs, [chunk_size] * n_jobs,
+            )
+            sums = sum(parts)
+    else:
+        sums = _group_distance_sums(player_coords, codes, len(groups), field_coords, method, chunk_size)
+
+    counts = np.bincount(codes, minlength=len(groups))
+    # Groups whose players all lacked coordinates have no players left; they are skipped below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / counts[:, np.newaxis]
+    ranked = np.argsort(means, axis=1)[:, :runner_ups + 1]
+
+    rows = []
+    for g, group_val in enumerate(groups):
+        if counts[g] == 0:
+            continue
+        row = [group_val, int(counts[g])]
+        for rank in range(runner_ups + 1):
+            if rank < ranked.shape[1]:
+                j = ranked[g, rank]
+                row += [field_names[j], float(means[g, j])]
+            else:
+                row += [None, None]
+        rows.append(row)
+    return pd.DataFrame(rows, columns=columns)
+
+
+def group_and_print_optimal_fields(players_df, fields_df, group_col, label_prefix=None, method="haversine"):
     """
     1. Groups 'players_df' by the column 'group_col'.
     2. For each distinct group value, calculates and prints the optimal field.
@@ -43,34 +414,33 @@ def group_and_print_optimal_fields(players_df, fields_df, group_col, label_prefi
     if group_col == 'birth_year' and 'birth_year' not in players_df.columns:
         players_df['birth_year'] = pd.to_datetime(players_df['birth_date']).dt.year
 
-    for group_val, subdf in players_df.groupby(group_col):
-        # Skip empty subgroups
-        if len(subdf) == 0:
-            continue
-        
-        # Calculate distances for this subset
-        distances = calculate_distances(subdf, fields_df)
-        avg_distances, best_field = find_optimal_field(distances)
-        
+    results = optimal_fields_by_group(
+        players_df, fields_df, group_col, method=method, runner_ups=0,
+        lat_col="latitude", lon_col="longitude",
+    )
+    for _, row in results.iterrows():
         # Build a label for printing
         if label_prefix:
             # e.g. "birth year 2018"
-            label = f"{label_prefix} {group_val}"
+            label = f"{label_prefix} {row[group_col]}"
         else:
             # e.g. "U10" or "Kindergarten"
-            label = str(group_val)
+            label = str(row[group_col])
         
-        print(f"{label} optimal field is {best_field} "
-              f"with avg distance of {avg_distances[best_field]:.2f}")
+        print(f"{label} optimal field is {row['Best Field']} "
+              f"with avg distance of {row['Avg Distance']:.2f}")
 
 
 #
 # NEW FUNCTION: easily called from your Streamlit front end to get the best field
 #
-def find_optimal_field_for_data(players_df, fields_df):
+def find_optimal_field_for_data(players_df, fields_df, method="haversine", road_graph=None):
     """
     Given already-filtered DataFrames of players and fields (with columns
     'Latitude'/'Longitude'), compute the single best field (lowest average distance).
+
+    method="travel_time" ranks by road travel time through 'road_graph'
+    (a travel_time.RoadGraph) instead, and the average is in minutes.
     
     Returns:
         (best_field_name, avg_distance_for_that_field)
@@ -80,27 +450,21 @@ def find_optimal_field_for_data(players_df, fields_df):
     # If either dataframe is empty, return no result
     if players_df.empty or fields_df.empty:
         return None, None
-    
-    # Copy so as not to mutate original
-    p_df = players_df.copy()
-    f_df = fields_df.copy()
-    
-    # Rename columns so the distance logic works
-    # (calculate_distances expects 'latitude' and 'longitude')
-    p_df.rename(columns={"Latitude": "latitude", "Longitude": "longitude"}, inplace=True)
-    f_df.rename(columns={"Latitude": "latitude", "Longitude": "longitude"}, inplace=True)
-    
-    # Drop any rows missing lat/long
-    p_df.dropna(subset=["latitude","longitude"], inplace=True)
-    f_df.dropna(subset=["latitude","longitude"], inplace=True)
-    
-    # If still empty after dropping NAs
-    if p_df.empty or f_df.empty:
-        return None, None
-    
-    distances = calculate_distances(p_df, f_df)
-    avg_distances, best_field = find_optimal_field(distances)
-    return best_field, avg_distances[best_field]
+
+    with span("distance.find_optimal_field", method=method, players=len(players_df), fields=len(fields_df)):
+        if method == TRAVEL_TIME:
+            if road_graph is None:
+                raise ValueError("method='travel_time' needs a road_graph")
+            return road_graph.find_optimal_field(players_df, fields_df)
+
+        # Only the per-field means are needed, so stream players through the
+        # reducer instead of building the whole players x fields matrix
+        reducer = FieldDistanceReducer(fields_df, method=method, percentiles=())
+        reducer.update(players_df)
+
+        # Players/fields without lat/long are skipped; this is (None, None) if
+        # nothing was left
+        return reducer.best_field()
 
 '''
 # ------------------------------------------------------------------------------
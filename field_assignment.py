@@ -0,0 +1,304 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+
+from distance_mapping import coordinate_array, distance_matrix
+
+# Exact (MILP) mode is only allowed up to this many player x field variables
+EXACT_MAX_VARIABLES = 50_000
+
+# Candidate swaps checked with a full capacitated assignment per iteration
+SWAP_CANDIDATES = 8
+
+
+class AssignmentResult:
+    """
+    Outcome of solve_field_assignment:
+      - fields: names of the chosen fields
+      - assignment: Series (indexed like the players) of assigned field
+        name, None for players without coordinates
+      - distances: Series of each player's distance to their field
+      - summary: DataFrame per chosen field (Players, Capacity,
+        Avg Distance, Max Distance)
+      - total_distance / mean_distance over assigned players
+    """
+
+    def __init__(self, fields, assignment, distances, summary):
+        self.fields = fields
+        self.assignment = assignment
+        self.distances = distances
+        self.summary = summary
+        self.total_distance = float(distances.sum())
+        self.mean_distance = float(distances.mean()) if distances.notna().any() else None
+
+    def __repr__(self):
+        return f"AssignmentResult(fields={self.fields}, mean_distance={self.mean_distance})"
+
+
+def field_capacities(fields_df, n_players, capacity_column="Capacity", players_per_capacity=1):
+    """
+    Player capacity per field: the capacity column times
+    'players_per_capacity', rounded down to whole players. Missing
+    capacity means unlimited (n_players).
+    """
+    if capacity_column not in fields_df.columns:
+        return np.full(len(fields_df), float(n_players))
+    caps = pd.to_numeric(fields_df[capacity_column], errors="coerce").to_numpy(dtype=np.float64)
+    caps = np.floor(caps * players_per_capacity)
+    return np.where(np.isnan(caps), float(n_players), np.minimum(caps, n_players))
+
+
+def assign_greedy(distances, capacities):
+    """
+    Capacitated assignment heuristic: players with the most to lose
+    (largest gap between their best and second-best field) pick first,
+    each taking their nearest field that still has room.
+    Returns the chosen column per player, or None if capacity runs out.
+    """
+    n, k = distances.shape
+    order = np.argsort(distances, axis=1)
+    if k > 1:
+        rows = np.arange(n)
+        regret = distances[rows, order[:, 1]] - distances[rows, order[:, 0]]
+    else:
+        regret = np.zeros(n)
+    remaining = np.floor(capacities).astype(np.int64)
+    choice = np.full(n, -1, dtype=np.int64)
+    for player in np.argsort(-regret, kind="stable"):
+        for col in order[player]:
+            if remaining[col] > 0:
+                remaining[col] -= 1
+                choice[player] = col
+                break
+        else:
+            return None
+    return choice
+
+
+def assign_optimal(distances, capacities):
+    """
+    Minimum-total-distance capacitated assignment for a fixed set of
+    fields, solved as a transportation LP (whose optimum is integral).
+    Returns the chosen column per player, or None if infeasible.
+    """
+    n, k = distances.shape
+    rows = np.repeat(np.arange(n), k)
+    cols = np.arange(n * k)
+    a_eq = sparse.csr_matrix((np.ones(n * k), (rows, cols)), shape=(n, n * k))
+    a_ub = sparse.csr_matrix((np.ones(n * k), (np.tile(np.arange(k), n), cols)), shape=(k, n * k))
+    result = linprog(
+        distances.ravel(), A_ub=a_ub, b_ub=np.floor(capacities), A_eq=a_eq, b_eq=np.ones(n),
+        bounds=(0, 1), method="highs",
+    )
+    if not result.success:
+        return None
+    return result.x.reshape(n, k).argmax(axis=1)
+
+
+def _assignment_cost(distances, choice):
+    return float(distances[np.arange(len(choice)), choice].sum())
+
+
+def _reachable_capacity(capacities, chosen, picks_left):
+    """
+    Per field j: capacity of the chosen fields plus j plus the largest
+    'picks_left' other unchosen fields, i.e. the most that opening j now
+    can still lead to
+    """
+    unchosen = np.setdiff1d(np.arange(len(capacities)), chosen)
+    order = unchosen[np.argsort(-capacities[unchosen], kind="stable")]
+    top = capacities[order[:picks_left]].sum()
+    # Fields among the top picks would be counted twice; use the next largest instead
+    rank = np.full(len(capacities), len(order))
+    rank[order] = np.arange(len(order))
+    next_cap = capacities[order[picks_left]] if picks_left < len(order) else 0.0
+    rest = np.where(rank < picks_left, top - capacities + next_cap, top)
+    return capacities[chosen].sum() + capacities + rest
+
+
+def _greedy_open(distances, capacities, k):
+    """ Greedy p-median: repeatedly open the field that cuts total distance most """
+    n, m = distances.shape
+    chosen = []
+    current = np.full(n, np.inf)
+    for step in range(k):
+        costs = np.minimum(current[:, np.newaxis], distances).sum(axis=0)
+        # Keep enough capacity reachable with the picks that are left
+        costs[_reachable_capacity(capacities, chosen, k - step - 1) < n] = np.inf
+        costs[chosen] = np.inf
+        if np.isfinite(costs).any():
+            best = int(np.argmin(costs))
+        else:
+            # Nothing keeps the plan feasible: fall back to the largest unchosen field
+            best = int(np.argmax(np.where(np.isin(np.arange(m), chosen), -np.inf, capacities)))
+        chosen.append(best)
+        current = np.minimum(current, distances[:, best])
+    return chosen
+
+
+def _local_search(distances, capacities, open_fields, max_iter):
+    """
+    Swap (interchange) improvement: every iteration ranks all
+    open/closed swaps by their uncapacitated cost in one vectorized pass,
+    then checks the SWAP_CANDIDATES best with a capacitated assignment and
+    takes the first that lowers total distance.
+    """
+    n, m = distances.shape
+    open_fields = list(open_fields)
+    choice = assign_greedy(distances[:, open_fields], capacities[open_fields])
+    if choice is None:
+        raise ValueError(f"The {len(open_fields)} fields picked cannot hold {n} players at the given capacities")
+    cost = _assignment_cost(distances[:, open_fields], choice)
+
+    for _ in range(max_iter):
+        sub = distances[:, open_fields]
+        order = np.argsort(sub, axis=1)
+        d1 = sub[np.arange(n), order[:, 0]]
+        d2 = sub[np.arange(n), order[:, 1]] if len(open_fields) > 1 else np.full(n, np.inf)
+        total_cap = capacities[open_fields].sum()
+
+        swaps = []
+        for pos, field in enumerate(open_fields):
+            # Each player's distance once 'field' closes, before adding anything
+            without = np.where(order[:, 0] == pos, d2, d1)
+            costs = np.minimum(without[:, np.newaxis], distances).sum(axis=0)
+            costs[open_fields] = np.inf
+            costs[total_cap - capacities[field] + capacities < n] = np.inf
+            for j in np.argsort(costs)[:SWAP_CANDIDATES]:
+                if np.isfinite(costs[j]):
+                    swaps.append((costs[j], pos, int(j)))
+
+        improved = False
+        for _, pos, j in sorted(swaps)[:SWAP_CANDIDATES]:
+            trial = open_fields[:pos] + [j] + open_fields[pos + 1:]
+            trial_choice = assign_greedy(distances[:, trial], capacities[trial])
+            if trial_choice is None:
+                continue
+            trial_cost = _assignment_cost(distances[:, trial], trial_choice)
+            if trial_cost < cost - 1e-9:
+                open_fields, choice, cost = trial, trial_choice, trial_cost
+                improved = True
+                break
+        if not improved:
+            break
+    return open_fields
+
+
+def _solve_exact(distances, capacities, k):
+    """ Capacitated p-median as a MILP (small instances only) """
+    n, m = distances.shape
+    n_vars = m + n * m
+    c = np.concatenate([np.zeros(m), distances.ravel()])
+
+    x_cols = m + np.arange(n * m)
+    player_of = np.repeat(np.arange(n), m)
+    field_of = np.tile(np.arange(m), n)
+
+    # Every player assigned exactly once
+    assign = sparse.csr_matrix((np.ones(n * m), (player_of, x_cols)), shape=(n, n_vars))
+    # Field load <= capacity * open
+    load = sparse.csr_matrix(
+        (np.concatenate([np.ones(n * m), -capacities]),
+         (np.concatenate([field_of, np.arange(m)]), np.concatenate([x_cols, np.arange(m)]))),
+        shape=(m, n_vars),
+    )
+    # x_ij <= y_j (tightens the relaxation considerably)
+    link = sparse.csr_matrix(
+        (np.concatenate([np.ones(n * m), -np.ones(n * m)]),
+         (np.concatenate([np.arange(n * m)] * 2), np.concatenate([x_cols, field_of]))),
+        shape=(n * m, n_vars),
+    )
+    count = sparse.csr_matrix((np.ones(m), (np.zeros(m), np.arange(m))), shape=(1, n_vars))
+
+    result = milp(
+        c,
+        constraints=[
+            LinearConstraint(assign, 1, 1),
+            LinearConstraint(load, -np.inf, 0),
+            LinearConstraint(link, -np.inf, 0),
+            LinearConstraint(count, k, k),
+        ],
+        integrality=np.concatenate([np.ones(m), np.zeros(n * m)]),
+        bounds=Bounds(0, 1),
+    )
+    if not result.success:
+        raise ValueError(f"Exact solver failed: {result.message}")
+    return [int(j) for j in np.flatnonzero(result.x[:m] > 0.5)]
+
+
+def solve_field_assignment(players_df, fields_df, k, method="haversine", capacity_column="Capacity",
+                           players_per_capacity=1, exact=False, max_iter=50, distances=None):
+    """
+    Chooses 'k' fields and assigns every player (with coordinates) to one
+    of them, without exceeding any field's capacity, to minimize total
+    travel distance.
+
+    - The default heuristic opens fields greedily, improves the set by
+      swapping open and closed fields, and finally solves the capacitated
+      assignment for the chosen fields exactly (transportation LP).
+    - exact=True solves the whole problem as a MILP; only for small
+      cases (players x fields <= EXACT_MAX_VARIABLES).
+    - 'distances' may be a precomputed players x fields matrix in miles,
+      aligned with the rows of both DataFrames.
+
+    Capacity is the 'capacity_column' value times 'players_per_capacity';
+    fields with no capacity are treated as unlimited.
+    """
+    if distances is None:
+        distances = distance_matrix(
+            coordinate_array(players_df, "Latitude", "Longitude"),
+            coordinate_array(fields_df, "Latitude", "Longitude"),
+            method=method,
+        )
+    distances = np.asarray(distances, dtype=np.float64)
+
+    # Players / fields without coordinates show up as all-NaN rows / columns
+    player_ok = ~np.isnan(distances).all(axis=1)
+    field_ok = ~np.isnan(distances[player_ok]).all(axis=0)
+    d = distances[np.ix_(player_ok, field_ok)]
+    field_names = fields_df["Name"].to_numpy()[field_ok]
+    n, m = d.shape
+
+    if n == 0 or m == 0:
+        raise ValueError("Need at least one player and one field with coordinates")
+    if not 1 <= k <= m:
+        raise ValueError(f"k must be between 1 and the number of fields ({m})")
+
+    capacities = field_capacities(fields_df[field_ok], n, capacity_column, players_per_capacity)
+    if np.sort(capacities)[::-1][:k].sum() < n:
+        raise ValueError(f"{k} fields cannot hold {n} players at the given capacities")
+
+    if exact:
+        if n * m > EXACT_MAX_VARIABLES:
+            raise ValueError(
+                f"Exact mode is limited to {EXACT_MAX_VARIABLES} player x field pairs (got {n * m})"
+            )
+        open_fields = _solve_exact(d, capacities, k)
+    else:
+        open_fields = _local_search(d, capacities, _greedy_open(d, capacities, k), max_iter)
+
+    sub = d[:, open_fields]
+    choice = assign_optimal(sub, capacities[open_fields])
+    if choice is None:
+        choice = assign_greedy(sub, capacities[open_fields])
+    if choice is None:
+        raise ValueError(f"{k} fields cannot hold {n} players at the given capacities")
+
+    chosen_names = field_names[open_fields]
+    assigned = np.full(len(distances), None, dtype=object)
+    assigned[player_ok] = chosen_names[choice]
+    player_distances = np.full(len(distances), np.nan)
+    player_distances[player_ok] = sub[np.arange(n), choice]
+
+    assignment = pd.Series(assigned, index=players_df.index, name="Assigned Field")
+    distance_series = pd.Series(player_distances, index=players_df.index, name="Distance")
+    summary = (
+        pd.DataFrame({"Field": chosen_names[choice], "Distance": sub[np.arange(n), choice]})
+        .groupby("Field")["Distance"]
+        .agg(Players="size", **{"Avg Distance": "mean", "Max Distance": "max"})
+        .reindex(chosen_names)
+    )
+    summary.insert(1, "Capacity", capacities[open_fields])
+    summary.index.name = "Name"
+    return AssignmentResult(list(chosen_names), assignment, distance_series, summary)
@@ -0,0 +1,180 @@
+import ast
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+
+
+def _parse_race_value(value):
+    """ One Race List cell -> list of lowercase race names """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        items = value
+    elif value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    else:
+        text = str(value).strip()
+        try:
+            items = ast.literal_eval(text) if text.startswith("[") else text.split(",")
+        except (ValueError, SyntaxError):
+            items = text.strip("[]").split(",")
+    return [str(item).strip().strip("'\"").strip().lower() for item in items if str(item).strip()]
+
+
+class RaceIndex:
+    """
+    Race List column parsed once into a boolean one-hot matrix
+    (rows x races) plus an inverted index of race -> row positions.
+
+    Cells may be real lists or the stringified lists stored in Supabase;
+    each distinct cell value is parsed only once.
+    """
+
+    def __init__(self, race_lists):
+        race_lists = pd.Series(race_lists, copy=False)
+        first = race_lists.first_valid_index()
+        keys = race_lists
+        if first is not None and not isinstance(race_lists[first], str):
+            # Lists aren't hashable; factorize them as tuples
+            keys = race_lists.map(lambda v: tuple(v) if isinstance(v, (list, tuple, np.ndarray)) else v)
+        codes, uniques = pd.factorize(keys)
+        parsed = [_parse_race_value(list(u) if isinstance(u, tuple) else u) for u in uniques]
+
+        self.races = sorted({race for races in parsed for race in races})
+        column_of = {race: i for i, race in enumerate(self.races)}
+
+        # One row per distinct cell value, then expanded to every row by code
+        distinct = np.zeros((len(parsed) + 1, len(self.races)), dtype=bool)
+        for row, races in enumerate(parsed):
+            distinct[row, [column_of[r] for r in races]] = True
+        # Code -1 (missing) picks the trailing all-False row
+        self.matrix = distinct[codes]
+        self.index = race_lists.index
+        self.column_of = column_of
+        self.rows_by_race = {race: np.flatnonzero(self.matrix[:, i]) for race, i in column_of.items()}
+
+    def options(self):
+        """ Sorted list of every race seen """
+        return list(self.races)
+
+    def mask_any(self, selected):
+        """ Boolean Series (aligned with the source rows): has any selected race """
+        cols = [self.column_of[r] for r in selected if r in self.column_of]
+        mask = self.matrix[:, cols].any(axis=1) if cols else np.zeros(len(self.index), dtype=bool)
+        return pd.Series(mask, index=self.index)
+
+    def counts(self):
+        """ Number of rows listing each race """
+        return pd.Series({race: len(rows) for race, rows in self.rows_by_race.items()}, dtype="int64")
+
+
+# How FilterEngine normalizes a column before building its categories
+EXACT = "exact"        # values compared as-is
+LOWER = "lower"        # stripped, lowercased strings
+NUMERIC = "numeric"    # whole numbers
+
+
+def _normalize_column(values, kind):
+    if kind == LOWER:
+        return values.astype("string").str.strip().str.lower()
+    if kind == NUMERIC:
+        return pd.to_numeric(values, errors="coerce").round().astype("Int64")
+    if kind == EXACT:
+        return values
+    raise ValueError(f"Unknown filter column kind: {kind}")
+
+
+class FilterEngine:
+    """
+    Sidebar filters over one table, precomputed once per data load.
+
+    Every filtered column is normalized (see EXACT / LOWER / NUMERIC) and
+    factorized into integer codes plus a sorted category list, which is
+    also the option list shown in the sidebar. Applying a set of
+    selections is then a lookup of each column's codes in a small boolean
+    table of selected categories, ANDed into one mask; no strings are
+    touched after construction.
+
+    'race_index' (a RaceIndex over the same rows) handles the
+    multi-valued column named by 'race_column'.
+    """
+
+    def __init__(self, df, columns, race_index=None, race_column="Race List"):
+        self.index = df.index
+        self.kinds = dict(columns)
+        self.codes = {}
+        self.categories = {}
+        for column, kind in self.kinds.items():
+            if column not in df.columns:
+                self.codes[column] = np.full(len(df), -1, dtype=np.int64)
+                self.categories[column] = []
+                continue
+            codes, uniques = pd.factorize(_normalize_column(df[column], kind), sort=True)
+            self.codes[column] = codes
+            self.categories[column] = [u.item() if hasattr(u, "item") else u for u in uniques]
+        self.race_index = race_index
+        self.race_column = race_column
+
+    def __len__(self):
+        return len(self.index)
+
+    def options(self, column):
+        """ Sorted, normalized distinct values of 'column' """
+        if column == self.race_column and self.race_index is not None:
+            return self.race_index.options()
+        return list(self.categories[column])
+
+    @staticmethod
+    def _as_list(selected):
+        if selected is None or (isinstance(selected, str) and selected == ""):
+            return []
+        if isinstance(selected, (list, tuple, set)):
+            return list(selected)
+        return [selected]
+
+    def any_selected(self, selections):
+        """ True if at least one filter in 'selections' has a value chosen """
+        return any(self._as_list(v) for v in selections.values())
+
+    def mask(self, selections):
+        """
+        Boolean ndarray over the rows matching every non-empty selection.
+        'selections' maps column -> list of values (multiselect) or a single
+        value (selectbox, "" meaning no filter).
+        """
+        with span("filters.mask", rows=len(self)) as timing:
+            mask = np.ones(len(self), dtype=bool)
+            for column, selected in selections.items():
+                selected = self._as_list(selected)
+                if not selected:
+                    continue
+                if column == self.race_column and self.race_index is not None:
+                    mask &= self.race_index.mask_any([str(s).strip().lower() for s in selected]).to_numpy()
+                    continue
+
+                kind = self.kinds[column]
+                if kind == LOWER:
+                    selected = {str(s).strip().lower() for s in selected}
+                elif kind == NUMERIC:
+                    selected = {int(s) for s in selected}
+                else:
+                    selected = set(selected)
+                # Trailing slot stays False for code -1 (missing value)
+                lookup = np.zeros(len(self.categories[column]) + 1, dtype=bool)
+                for i, value in enumerate(self.categories[column]):
+                    lookup[i] = value in selected
+                mask &= lookup[self.codes[column]]
+            timing.set(matched=int(mask.sum()))
+            return mask
+
+    def filter(self, df, selections):
+        """
+        Rows of 'df' (the frame the engine was built from) matching
+        'selections'. With nothing selected 'df' itself is returned rather
+        than a copy, so treat the result as read-only.
+        """
+        if len(df) != len(self):
+            raise ValueError(f"Filter engine was built for {len(self)} rows, got a frame of {len(df)}")
+        if not self.any_selected(selections):
+            return df
+        return df[self.mask(selections)]
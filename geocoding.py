@@ -0,0 +1,216 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+
+from instrumentation import GEOCODE_LOOKUPS, bind, count
+
+logger = logging.getLogger(__name__)
+
+# On-disk cache shared by every upload; override with GEOCODE_CACHE_PATH
+DEFAULT_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", "geocode_cache.sqlite")
+
+# Nominatim's usage policy allows at most one request per second
+DEFAULT_RATE_LIMIT = 1.0
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+
+RETRYABLE_ERRORS = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+
+# Longest wait (seconds) honoured from a rate-limit response's Retry-After
+MAX_RETRY_AFTER = 60.0
+
+
+def normalize_address(address):
+    """ Cache key for an address: lowercase, single spaces, tidy commas """
+    if address is None:
+        return ""
+    text = str(address).strip().lower()
+    text = re.sub(r"\s*,\s*", ", ", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(", ")
+
+
+class NominatimBackend:
+    """ Geocodes through OpenStreetMap's Nominatim, reusing one client """
+
+    def __init__(self, user_agent="http", timeout=10):
+        from geopy.geocoders import Nominatim
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.timeout = timeout
+
+    def geocode(self, address):
+        location = self.geolocator.geocode(address, timeout=self.timeout)
+        if location:
+            return location.latitude, location.longitude
+        return None, None
+
+
+class GazetteerBackend:
+    """
+    Offline stand-in backed by a dict of address -> (lat, lon). Keys are
+    normalized the same way as the cache, so lookups ignore case/spacing.
+    """
+
+    def __init__(self, entries):
+        self.entries = {normalize_address(k): v for k, v in entries.items()}
+
+    def geocode(self, address):
+        return self.entries.get(normalize_address(address), (None, None))
+
+
+class GeocodeCache:
+    """
+    SQLite table of normalized address -> (lat, lon). Misses are stored
+    too (as NULLs) so an address nobody can resolve is not retried on
+    every upload. Use ':memory:' for a throwaway cache.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            "address TEXT PRIMARY KEY, latitude REAL, longitude REAL, updated_at REAL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """ Dict of the cached entries among 'keys' """
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            # SQLite caps the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT address, latitude, longitude FROM geocodes "
+                    f"WHERE address IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update({address: (lat, lon) for address, lat, lon in rows})
+        return found
+
+    def put_many(self, entries):
+        """ Stores a dict of key -> (lat, lon) """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO geocodes (address, latitude, longitude, updated_at) VALUES (?, ?, ?, ?)",
+                [(k, lat, lon, now) for k, (lat, lon) in entries.items()],
+            )
+            self._conn.commit()
+
+
+class RateLimiter:
+    """ Spaces calls at least 1 / 'per_second' seconds apart across threads """
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        """ Holds every caller back for 'seconds' from now (e.g. after a 429) """
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+class BatchGeocoder:
+    """
+    Geocodes many addresses at once:
+      1. addresses are normalized and deduplicated,
+      2. anything already in the cache is served from it,
+      3. the rest go to the backend from 'max_workers' threads, no faster
+         than 'rate_limit' requests per second, retrying timeouts and
+         rate limits with exponential backoff (or the server's
+         Retry-After, which pauses every thread),
+      4. new results are written back to the cache, even if the batch is
+         interrupted. An address that still fails comes back as
+         (None, None) and is not cached, so the next upload retries it.
+    """
+
+    def __init__(self, backend=None, cache=None, max_workers=DEFAULT_MAX_WORKERS,
+                 rate_limit=DEFAULT_RATE_LIMIT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.backend = backend if backend is not None else NominatimBackend()
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.retries = retries
+        self.backoff = backoff
+
+    def _geocode_one(self, address):
+        """ (lat, lon), (None, None) for no match, or None if the lookup failed """
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            try:
+                return self.backend.geocode(address)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.retries:
+                    logger.warning("Geocoding %r failed after %d tries: %s", address, attempt + 1, e)
+                    return None
+                delay = self.backoff * 2 ** attempt
+                if isinstance(e, GeocoderRateLimited) and e.retry_after:
+                    delay = max(delay, min(float(e.retry_after), MAX_RETRY_AFTER))
+                    self.rate_limiter.pause(delay)
+                time.sleep(delay)
+            except Exception as e:
+                logger.warning("Geocoding %r failed: %s", address, e)
+                return None
+
+    def geocode_many(self, addresses):
+        """ List of (lat, lon) aligned with 'addresses'; (None, None) if unknown """
+        addresses = list(addresses)
+        keys = [normalize_address(a) for a in addresses]
+        unique = {}
+        for key, address in zip(keys, addresses):
+            if key:
+                unique.setdefault(key, address)
+
+        results = self.cache.get_many(unique)
+        todo = [k for k in unique if k not in results]
+        count(GEOCODE_LOOKUPS, len(todo))
+        if todo:
+            fresh = {}
+            lookup = bind(lambda k: self._geocode_one(unique[k]))
+            try:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    futures = {pool.submit(lookup, k): k for k in todo}
+                    for future in as_completed(futures):
+                        fresh[futures[future]] = future.result()
+            finally:
+                # Failures are not cached so the next upload tries them again
+                fresh = {k: v for k, v in fresh.items() if v is not None}
+                self.cache.put_many(fresh)
+            results.update(fresh)
+
+        return [results.get(k, (None, None)) if k else (None, None) for k in keys]
+
+    def geocode(self, address):
+        return self.geocode_many([address])[0]
+
+
+_default_geocoder = None
+
+
+def default_geocoder():
+    """ Process-wide Nominatim geocoder with the on-disk cache """
+    global _default_geocoder
+    if _default_geocoder is None:
+        _default_geocoder = BatchGeocoder()
+    return _default_geocoder
@@ -1,58 +1,187 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
-import folium
-from flask import Flask, request, render_template
-from folium import plugins
-from folium.plugins import HeatMap
-
-# Read in all datasets
-travel_df = pd.read_csv("new_cleaned_travel_data_base.csv")
-players_2017_df = pd.read_csv("new_cleaned_2017_Players_Data.csv")
-rec_fall_24_df = pd.read_csv("new_cleaned_rec_fall24.csv")
-fields_df = pd.read_csv("new_cleaned_fields_data.csv")
-pta_df = pd.read_csv("new_cleaned_PTA_fall.csv")
-adp_df = pd.read_csv("cleaned_ADPFallData.csv")
-
-# Drop NA values for latitude / longitude only
-travel_df = travel_df.dropna(subset=['latitude', 'longitude'])
-players_2017_df = players_2017_df.dropna(subset=['latitude', 'longitude'])
-rec_fall_24_df = rec_fall_24_df.dropna(subset=['latitude', 'longitude'])
-fields_df = fields_df.dropna(subset=['latitude', 'longitude'])
-pta_df = pta_df.dropna(subset=['latitude', 'longitude'])
-adp_df = adp_df.dropna(subset=['latitude', 'longitude'])
-
-# Combine all data into one large dataset
-combined_df = pd.concat([travel_df, players_2017_df, rec_fall_24_df, fields_df, pta_df, adp_df])
-
-# Convert latitude and longitude columns to float
-combined_df['latitude'] = combined_df['latitude'].astype(float)
-combined_df['longitude'] = combined_df['longitude'].astype(float)
-
-# Export combined_df to csv
-combined_df.to_csv('combined_dataset.csv', index=False)
-from google.colab import files
-files.download('combined_dataset.csv')
-
-### Begin Heat Mapping & Filtering
-app = Flask(__name__)
-
-@app.route('/map', methods=['GET', 'POST'])
-def generate_map():
-    # Load combined dataset
-    data = pd.read_csv('combined_dataset.csv')
-
-    # Filter data based on request parameters
-    filters = request.json.get('filters', [])
-    if filters:
-        data = data[data['category'].isin(filters)]
-
-    # Create map with starting point and zoom level
-    map = folium.Map(location=[38.893859, -77.0971477], zoom_start = 12)
-
-    # Heat mapping for combined_df
-    heatmap = [[row['latitude'], row['longitude']] for index, row in combined_df.iterrows()]
-
-    HeatMap(heatmap).add_to(map)
-
-    # Save map to HTML file
-    map.save('templates/map.html')
-    return {'success': True}
\ No newline at end of file
+from flask import Flask, Response, request
+
+from maps import DEFAULT_ZOOM, create_heatmap, heatmap_bins
+
+# Source datasets and the category each one's rows get when the file has no
+# 'category' column of its own
+DATASETS = {
+    "travel": "new_cleaned_travel_data_base.csv",
+    "players_2017": "new_cleaned_2017_Players_Data.csv",
+    "rec_fall_24": "new_cleaned_rec_fall24.csv",
+    "fields": "new_cleaned_fields_data.csv",
+    "pta": "new_cleaned_PTA_fall.csv",
+    "adp": "cleaned_ADPFallData.csv",
+}
+
+# Directory holding the CSVs; override with MAP_DATA_DIR
+DATA_DIR = os.environ.get("MAP_DATA_DIR", ".")
+
+# Distinct (filters, zoom, format) responses kept in memory
+RESPONSE_CACHE_SIZE = 256
+
+# Clients may reuse a response this long before revalidating with its ETag
+CACHE_MAX_AGE_SECONDS = 60
+
+FORMATS = ("json", "geojson", "html")
+MIN_ZOOM, MAX_ZOOM = 0, 20
+
+
+class MapDataStore:
+    """
+    Every dataset's coordinates loaded once into typed arrays:
+    float32 latitude / longitude plus an int16 category code per point.
+    Points are grouped by category at load time, so a filter is a
+    concatenation of precomputed slices rather than a scan of the rows.
+    'version' identifies the loaded data and is part of every ETag.
+    """
+
+    def __init__(self, latitude, longitude, categories):
+        codes, names = pd.factorize(pd.Series(categories, dtype="string"), sort=True)
+        ok = (codes >= 0) & np.isfinite(latitude) & np.isfinite(longitude)
+        self.latitude = np.asarray(latitude, dtype=np.float32)[ok]
+        self.longitude = np.asarray(longitude, dtype=np.float32)[ok]
+        self.codes = codes[ok].astype(np.int16)
+        self.categories = [str(name) for name in names]
+
+        # Row positions sorted by category, and where each category starts
+        self.order = np.argsort(self.codes, kind="stable")
+        counts = np.bincount(self.codes, minlength=len(self.categories))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.counts = dict(zip(self.categories, counts.tolist()))
+        self._position = {name: i for i, name in enumerate(self.categories)}
+
+        digest = hashlib.sha1()
+        for array in (self.latitude, self.longitude, self.codes):
+            digest.update(array.tobytes())
+        digest.update("\0".join(self.categories).encode())
+        self.version = digest.hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def normalize_filters(self, filters):
+        """ Known categories among 'filters', sorted and deduplicated (all categories if none) """
+        known = sorted({f for f in filters if f in self._position})
+        return tuple(known) if filters else tuple(self.categories)
+
+    def positions(self, categories):
+        """ Row positions of the points in 'categories' """
+        slices = [
+            self.order[self.offsets[self._position[c]]:self.offsets[self._position[c] + 1]]
+            for c in categories
+        ]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def points(self, categories):
+        """ DataFrame of Latitude / Longitude for the points in 'categories' """
+        rows = self.positions(categories)
+        return pd.DataFrame({
+            "Latitude": self.latitude[rows].astype(np.float64),
+            "Longitude": self.longitude[rows].astype(np.float64),
+        })
+
+
+def load_store(datasets=DATASETS, data_dir=DATA_DIR):
+    """ Reads every dataset's coordinates (and category) into one MapDataStore """
+    latitude, longitude, categories = [], [], []
+    for label, filename in datasets.items():
+        df = pd.read_csv(os.path.join(data_dir, filename))
+        lat = pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype=np.float64)
+        lon = pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype=np.float64)
+        if "category" in df.columns:
+            category = df["category"].astype("string").fillna(label).to_numpy(dtype=object)
+        else:
+            category = np.full(len(df), label, dtype=object)
+        latitude.append(lat)
+        longitude.append(lon)
+        categories.append(category)
+    return MapDataStore(np.concatenate(latitude), np.concatenate(longitude), np.concatenate(categories))
+
+
+def _geojson(bins):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]},
+             "properties": {"weight": weight}}
+            for lat, lon, weight in bins
+        ],
+    }
+
+
+def create_app(store):
+    """
+    Flask app serving heat map data from 'store'. Nothing is read from or
+    written to disk per request.
+
+    GET or POST /map with categories as a JSON body {"filters": [...]}
+    or repeated ?category= parameters (none means all), plus optional
+    ?zoom= (grid size of the weighted points, see maps.heatmap_bins) and
+    ?format=json (default), geojson or html (a ready-made folium map).
+    Responses carry an ETag derived from the data version and the
+    request, so unchanged views are answered with 304 Not Modified.
+    GET /categories lists the categories with their point counts.
+    """
+    app = Flask(__name__)
+
+    @lru_cache(maxsize=RESPONSE_CACHE_SIZE)
+    def render(categories, zoom, fmt):
+        points = store.points(categories)
+        bins = heatmap_bins(points, zoom=zoom)
+        if fmt == "html":
+            return create_heatmap(points, zoom=zoom, bins=bins).get_root().render(), "text/html"
+        if fmt == "geojson":
+            body = _geojson(bins)
+        else:
+            body = {"categories": list(categories), "zoom": zoom, "points": bins}
+        return json.dumps(body, separators=(",", ":")), "application/json"
+
+    @app.route("/map", methods=["GET", "POST"])
+    def generate_map():
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return {"error": "body must be a JSON object"}, 400
+        filters = payload.get("filters") or request.args.getlist("category")
+        if not isinstance(filters, list) or not all(isinstance(f, str) for f in filters):
+            return {"error": "filters must be a list of category names"}, 400
+        fmt = request.args.get("format", payload.get("format", "json"))
+        zoom = request.args.get("zoom", payload.get("zoom", DEFAULT_ZOOM))
+        try:
+            zoom = int(zoom)
+        except (TypeError, ValueError):
+            zoom = None
+        if zoom is None or not MIN_ZOOM <= zoom <= MAX_ZOOM:
+            return {"error": f"zoom must be an integer from {MIN_ZOOM} to {MAX_ZOOM}"}, 400
+        if fmt not in FORMATS:
+            return {"error": f"format must be one of {', '.join(FORMATS)}"}, 400
+
+        categories = store.normalize_filters(filters)
+        etag = hashlib.sha1(repr((store.version, categories, zoom, fmt)).encode()).hexdigest()
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            body, mimetype = render(categories, zoom, fmt)
+            response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = CACHE_MAX_AGE_SECONDS
+        return response
+
+    @app.route("/categories")
+    def list_categories():
+        response = Response(json.dumps(store.counts), mimetype="application/json")
+        response.set_etag(store.version)
+        return response.make_conditional(request)
+
+    return app
+
+
+if __name__ == "__main__":
+    create_app(load_store()).run(threaded=True)
@@ -0,0 +1,198 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger("dcsoccer.perf")
+
+# Set DCSOCCER_PROFILE=1 to record every rerun and log its spans as JSON lines
+PROFILE_ENV = "DCSOCCER_PROFILE"
+LOG_ENABLED = os.environ.get(PROFILE_ENV, "").lower() not in ("", "0", "false", "no")
+
+# Counter names used across modules
+SUPABASE_REQUESTS = "supabase_requests"
+ROWS_FETCHED = "rows_fetched"
+GEOCODE_LOOKUPS = "geocode_lookups"
+
+
+class _NoopSpan:
+    """ What span() hands out while nothing is recording; costs one call """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    One timed section. Extra fields (rows, payload bytes, ...) can be
+    passed to span() or added with set() while it is open.
+    """
+
+    def __init__(self, recorder, name, fields):
+        self.recorder = recorder
+        self.name = name
+        self.fields = fields
+        self.start = None
+        self.seconds = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.recorder.add_span(self)
+        return False
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+
+class Recorder:
+    """ Spans and counters collected during one app rerun """
+
+    def __init__(self, log=LOG_ENABLED):
+        self.log = log
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+        if self.log:
+            logger.info(json.dumps({
+                "event": "span", "name": span.name, "ms": round(span.seconds * 1000, 3), **span.fields,
+            }, default=str))
+
+    def add_count(self, name, n):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def spans_frame(self):
+        """ DataFrame of spans in the order they started """
+        rows = [
+            {"span": s.name, "start ms": (s.start - self.started) * 1000, "ms": s.seconds * 1000, **s.fields}
+            for s in sorted(self.spans, key=lambda s: s.start)
+        ]
+        return pd.DataFrame(rows)
+
+    def summary(self):
+        """ Calls, total and max milliseconds per span name, slowest first """
+        frame = self.spans_frame()
+        if frame.empty:
+            return pd.DataFrame(columns=["calls", "total ms", "max ms"])
+        return (
+            frame.groupby("span")["ms"]
+            .agg(calls="size", **{"total ms": "sum", "max ms": "max"})
+            .sort_values("total ms", ascending=False)
+        )
+
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+
+# The recording run of the current context. Streamlit runs each session's
+# script in its own thread, so sessions rerunning at once never share one
+_recorder = contextvars.ContextVar("dcsoccer_recorder", default=None)
+
+
+def enabled():
+    """ True while a rerun is being recorded """
+    return _recorder.get() is not None
+
+
+def start_run(log=LOG_ENABLED):
+    """
+    Starts recording spans and counters for the calling context (replacing
+    any earlier run there) and returns the Recorder. Other sessions and
+    shared background work are not recorded; worker threads are once their
+    functions are wrapped with bind().
+    """
+    recorder = Recorder(log=log)
+    _recorder.set(recorder)
+    return recorder
+
+
+def finish_run():
+    """ Stops recording; logs the run's totals and counters. Returns the Recorder (or None) """
+    recorder = _recorder.get()
+    _recorder.set(None)
+    if recorder is not None and recorder.log:
+        logger.info(json.dumps({
+            "event": "run", "ms": round(recorder.total_seconds() * 1000, 3), "counters": recorder.counters,
+        }))
+    return recorder
+
+
+def current():
+    """ The Recorder of the calling context, or None """
+    return _recorder.get()
+
+
+@contextlib.contextmanager
+def recording(recorder):
+    """ Records into 'recorder' (may be None) for the duration of the block """
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def bind(fn):
+    """
+    'fn' wrapped to record into the caller's run when it is called from
+    another thread (thread pools do not inherit the caller's context).
+    Returns 'fn' itself while nothing is recording.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return fn
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        with recording(recorder):
+            return fn(*args, **kwargs)
+    return bound
+
+
+def span(name, **fields):
+    """
+    Context manager timing a section while a run is recorded:
+
+        with span("filters.apply", rows=len(df)) as s:
+            ...
+            s.set(matched=int(mask.sum()))
+
+    Outside a recorded run it is a shared no-op.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NOOP_SPAN
+    return Span(recorder, name, fields)
+
+
+def count(name, n=1):
+    """ Adds 'n' to counter 'name' while a run is recorded """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.add_count(name, n)
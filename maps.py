@@ -0,0 +1,145 @@
+import json
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster, HeatMap
+
+from instrumentation import span
+
+HEATMAP_CENTER = [38.893859, -77.0971477]
+PIN_MAP_CENTER = [38.95, -77.0369]
+DEFAULT_ZOOM = 12
+
+# Heat map points are pre-aggregated into grid cells about this many screen
+# pixels wide at the map's zoom, and never more than MAX_HEAT_BINS cells
+HEAT_BIN_PIXELS = 4
+MAX_HEAT_BINS = 20000
+
+# Decimal places kept for marker coordinates (~1 m), to keep the payload small
+COORD_DECIMALS = 5
+
+# Built in the browser once per player point; row = [lat, lon, popup number].
+# Distinct popup texts are shipped once in POPUPS rather than per player.
+PLAYER_MARKER_CALLBACK = """
+(function () {
+    var POPUPS = %s;
+    var icon = L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: 'red', prefix: 'glyphicon'});
+    return function (row) {
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+        marker.bindPopup(POPUPS[row[2]]);
+        return marker;
+    };
+})()
+"""
+
+
+def _text_column(df, column):
+    """ Column as strings, 'N/A' where missing or absent """
+    if column not in df.columns:
+        return pd.Series("N/A", index=df.index)
+    return df[column].astype("string").fillna("N/A")
+
+
+def heat_bin_size(zoom=DEFAULT_ZOOM, pixels=HEAT_BIN_PIXELS):
+    """ Grid cell width in degrees of longitude covering 'pixels' at 'zoom' """
+    return 360.0 / (256 * 2 ** zoom) * pixels
+
+
+def heatmap_bins(df, zoom=DEFAULT_ZOOM, pixels=HEAT_BIN_PIXELS, max_bins=MAX_HEAT_BINS):
+    """
+    Aggregates player coordinates into a lat/lon grid sized for 'zoom' and
+    returns [[lat, lon, weight], ...], one entry per occupied cell, placed
+    at the mean position of its players and weighted by how many there
+    are. If that would exceed 'max_bins' cells the grid is coarsened, so
+    the payload stays bounded however many players are selected.
+    """
+    coords = df[["Latitude", "Longitude"]].apply(pd.to_numeric, errors="coerce").dropna().to_numpy()
+    if len(coords) == 0:
+        return []
+    lat, lon = coords[:, 0], coords[:, 1]
+    # Square cells on the ground: shrink the latitude step by cos(latitude)
+    cos_lat = max(np.cos(np.radians(np.mean(lat))), 0.01)
+
+    size = heat_bin_size(zoom, pixels)
+    while True:
+        iy = np.floor(lat / (size * cos_lat)).astype(np.int64)
+        ix = np.floor(lon / size).astype(np.int64)
+        keys, cells = np.unique(iy * 2 ** 32 + ix, return_inverse=True)
+        if len(keys) <= max_bins:
+            break
+        size *= 2
+
+    weights = np.bincount(cells)
+    mean_lat = np.bincount(cells, weights=lat) / weights
+    mean_lon = np.bincount(cells, weights=lon) / weights
+    return np.column_stack([mean_lat.round(COORD_DECIMALS), mean_lon.round(COORD_DECIMALS), weights]).tolist()
+
+
+def create_heatmap(df, zoom=DEFAULT_ZOOM, bins=None):
+    """
+    Heat map of players. 'bins' may be passed in (e.g. from a cache);
+    otherwise they are computed with heatmap_bins at 'zoom'.
+    """
+    with span("maps.create_heatmap", rows=len(df)) as timing:
+        map_obj = folium.Map(location=HEATMAP_CENTER, zoom_start=zoom)
+        heatmap_data = bins if bins is not None else heatmap_bins(df, zoom=zoom)
+        if heatmap_data:
+            HeatMap(heatmap_data).add_to(map_obj)
+        timing.set(points=len(heatmap_data))
+        return map_obj
+
+
+def player_marker_data(player_df):
+    """
+    Returns (rows, popups): rows is [[lat, lon, popup_number], ...] for
+    every player with coordinates and popups the list of distinct popup
+    texts, all built from whole columns rather than row by row.
+    """
+    coords = player_df[["Latitude", "Longitude"]].apply(pd.to_numeric, errors="coerce")
+    ok = coords.notna().all(axis=1).to_numpy()
+    popups = (
+        _text_column(player_df, "Program") + " - " + _text_column(player_df, "School")
+        + ", Zip: " + _text_column(player_df, "Zip Code")
+    )
+    # Popups are inserted as HTML in the browser, so escape the markup characters
+    popups = popups.str.replace("&", "&amp;").str.replace("<", "&lt;").str.replace(">", "&gt;")
+    codes, uniques = pd.factorize(popups[ok])
+    # Coordinates may be stored as float32; rounding those would still print
+    # every float32 digit in the JSON, so widen to float64 first
+    latlon = coords.to_numpy(dtype=np.float64)[ok].round(COORD_DECIMALS)
+    rows = [list(row) for row in zip(latlon[:, 0].tolist(), latlon[:, 1].tolist(), codes.tolist())]
+    return rows, list(uniques)
+
+
+def create_pin_map(player_df, field_df):
+    """
+    Pin map of every player plus the fields. Players go out as one
+    clustered layer whose markers are created in the browser from a
+    compact array, so page size stays small even with thousands of them.
+    """
+    with span("maps.create_pin_map", rows=len(player_df), fields=len(field_df)) as timing:
+        map_obj = folium.Map(location=PIN_MAP_CENTER, zoom_start=DEFAULT_ZOOM)
+
+        player_rows, popups = player_marker_data(player_df)
+        if player_rows:
+            callback = PLAYER_MARKER_CALLBACK % json.dumps(popups)
+            FastMarkerCluster(player_rows, callback=callback, name="Players").add_to(map_obj)
+
+        field_popups = (
+            _text_column(field_df, "Name") + ", " + _text_column(field_df, "Capacity")
+            + ", " + _text_column(field_df, "Surface")
+        )
+        field_coords = field_df[["Latitude", "Longitude"]].apply(pd.to_numeric, errors="coerce")
+        field_coords = field_coords.to_numpy(dtype=np.float64).round(COORD_DECIMALS).tolist()
+        for (lat, lon), popup in zip(field_coords, field_popups):
+            if pd.isna(lat) or pd.isna(lon):
+                continue
+            folium.Marker(
+                location=[lat, lon],
+                popup=popup,
+                icon=folium.Icon(color="blue")
+            ).add_to(map_obj)
+
+        timing.set(markers=len(player_rows), popups=len(popups))
+        return map_obj
@@ -0,0 +1,169 @@
+import re
+import sqlite3
+
+import pandas as pd
+
+from data_access import as_backend, fetch_table
+from filters import EXACT, LOWER, NUMERIC
+
+# Aggregate views defined in sql/filter_option_views.sql, per table
+OPTION_VIEWS = {"Players": "player_filter_options", "Fields": "field_filter_options"}
+PROGRAM_COUNTS_VIEW = "player_program_counts"
+
+# What each option view reports, and how (see filters.EXACT / LOWER / NUMERIC)
+OPTION_COLUMNS = {
+    "Players": {
+        "Program": EXACT, "Age": NUMERIC, "Gender": LOWER, "Grade": LOWER, "School": LOWER,
+        "Race List": LOWER,
+    },
+    "Fields": {
+        "Capacity": NUMERIC, "Surface": LOWER, "Size": LOWER, "Game Size": LOWER,
+        "Lights": LOWER, "Permanent Lines": LOWER, "Goals": LOWER,
+    },
+}
+
+# Multi-valued column: each listed value counts as its own option
+RACE_COLUMN = "Race List"
+
+
+def exact_imatch(value):
+    """
+    PostgREST 'imatch' (~*) pattern matching 'value' exactly, ignoring
+    case. ilike cannot do this: '%' and '_' are wildcards, and PostgREST
+    turns '*' into '%' with no way to escape it. Punctuation is escaped
+    for the regex; letters, digits and spaces are literal already.
+    """
+    return "^" + re.sub(r"([^\w\s])", r"\\\1", str(value)) + "$"
+
+
+def _options_from_rows(rows, table_name):
+    """ Aggregate rows (column_name, value, value_count) -> {column: sorted values} """
+    kinds = OPTION_COLUMNS[table_name]
+    options = {column: [] for column in kinds}
+    for row in rows:
+        column, value = row["column_name"], row["value"]
+        if column not in kinds or value is None:
+            continue
+        options[column].append(int(float(value)) if kinds[column] == NUMERIC else value)
+    return {column: sorted(set(values)) for column, values in options.items()}
+
+
+def _program_counts_from_rows(rows):
+    counts = pd.Series({row["program"]: int(row["value_count"]) for row in rows}, dtype="int64")
+    counts.index.name = "Program"
+    return counts.sort_index()
+
+
+def program_counts_from_frame(players_df):
+    """ program_counts() computed from already loaded Players rows, for when the views are unavailable """
+    counts = players_df["Program"].dropna().astype(str).value_counts()
+    return _program_counts_from_rows({"program": p, "value_count": c} for p, c in counts.items())
+
+
+class SupabaseRepository:
+    """
+    Aggregate reads served by the database: distinct filter values and
+    per-program player counts come from the views in
+    sql/filter_option_views.sql, so the app transfers one row per distinct
+    value instead of one per player.
+    """
+
+    def __init__(self, client):
+        self.client = as_backend(client)
+
+    def filter_options(self, table_name):
+        """ {column: sorted distinct normalized values} for 'table_name' """
+        rows = fetch_table(self.client, OPTION_VIEWS[table_name], order_by="option_key")
+        return _options_from_rows(rows.to_dict("records"), table_name)
+
+    def program_counts(self):
+        """ Series of player counts indexed by program name """
+        rows = fetch_table(self.client, PROGRAM_COUNTS_VIEW, order_by="program")
+        return _program_counts_from_rows(rows.to_dict("records"))
+
+    def delete_program(self, program):
+        """ Deletes every player in 'program' (case-insensitive, no wildcards) """
+        self.client.delete_rows("Players", "Program", "imatch", exact_imatch(program))
+
+
+def _sqlite_cell(value):
+    """ Python value as Supabase would return it through a text cast """
+    if isinstance(value, (list, tuple)):
+        return str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _sqlite_value(column, kind):
+    quoted = f'"{column}"'
+    if kind == NUMERIC:
+        return f"CAST(CAST(ROUND({quoted}) AS INTEGER) AS TEXT)"
+    if kind == LOWER:
+        return f"lower(trim({quoted}))"
+    return quoted
+
+
+class SQLiteRepository:
+    """
+    Local stand-in for SupabaseRepository: the same aggregates as plain
+    GROUP BY queries over SQLite copies of the tables. Useful offline and
+    for checking the views against known data.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+    def load_table(self, table_name, df):
+        """ Replaces 'table_name' with the rows of 'df' (lists and booleans as text, like Supabase) """
+        df = df.copy()
+        for column in df.columns:
+            if df[column].dtype == object or df[column].dtype == bool:
+                df[column] = df[column].astype(object).map(_sqlite_cell)
+        df.to_sql(table_name, self.connection, if_exists="replace", index=False)
+
+    def _columns(self, table_name):
+        return {row[1] for row in self.connection.execute(f'PRAGMA table_info("{table_name}")')}
+
+    def _query(self, sql, params=()):
+        cursor = self.connection.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def filter_options(self, table_name):
+        """ {column: sorted distinct normalized values} for 'table_name' """
+        present = self._columns(table_name)
+        parts = []
+        for column, kind in OPTION_COLUMNS[table_name].items():
+            if column not in present:
+                continue
+            if column == RACE_COLUMN:
+                # Stringified Python lists become JSON once the quotes are swapped
+                as_json = f"""replace("{column}", '''', '"')"""
+                parts.append(
+                    f"SELECT '{column}' AS column_name, lower(trim(item.value)) AS value, "
+                    f'COUNT(DISTINCT t.rowid) AS value_count FROM "{table_name}" AS t, '
+                    f"json_each(CASE WHEN json_valid({as_json}) THEN {as_json} ELSE '[]' END) AS item "
+                    f"WHERE trim(item.value) <> '' GROUP BY 2"
+                )
+                continue
+            value = _sqlite_value(column, kind)
+            parts.append(
+                f"SELECT '{column}' AS column_name, {value} AS value, COUNT(*) AS value_count "
+                f'FROM "{table_name}" WHERE "{column}" IS NOT NULL GROUP BY 2'
+            )
+        rows = self._query(" UNION ALL ".join(parts)) if parts else []
+        return _options_from_rows(rows, table_name)
+
+    def program_counts(self):
+        """ Series of player counts indexed by program name """
+        rows = self._query(
+            'SELECT "Program" AS program, COUNT(*) AS value_count FROM "Players" '
+            'WHERE "Program" IS NOT NULL GROUP BY "Program"'
+        )
+        return _program_counts_from_rows(rows)
+
+    def delete_program(self, program):
+        """ Deletes every player in 'program' (case-insensitive, no wildcards) """
+        with self.connection:
+            self.connection.execute('DELETE FROM "Players" WHERE lower("Program") = lower(?)', (program,))
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from distance_mapping import (
+    DEFAULT_CHUNK_SIZE, EARTH_RADIUS_MILES, FieldDistanceReducer, coordinate_array, haversine_miles,
+    iter_distance_blocks,
+)
+
+# Coarse grid (cells per side) over the players' bounding box used to seed
+# the continuous search
+DEFAULT_GRID_SIZE = 25
+
+# Best grid cells refined with Weiszfeld iterations
+DEFAULT_SEEDS = 5
+
+# Suggested sites closer together than this (miles) count as the same place
+MIN_SEPARATION_MILES = 0.5
+
+# Weiszfeld stops once no seed moves more than this many miles
+WEISZFELD_TOL_MILES = 1e-4
+WEISZFELD_MAX_ITER = 200
+
+_MILES_PER_DEGREE = EARTH_RADIUS_MILES * np.pi / 180.0
+
+
+class SiteSuggestions:
+    """
+    Outcome of suggest_field_sites:
+      - candidates: DataFrame of suggested sites, best first, with
+        Latitude, Longitude, Avg Distance, Improvement (miles saved on
+        average versus the current best field; NaN without fields) and
+        Source ("weiszfeld", "grid" or "parcel"; parcels keep their Name)
+      - best_field / best_field_distance: the current best existing field
+        and its average distance (None without fields)
+      - optimum: (lat, lon, avg_distance) of the unrestricted best point
+      - players: how many players with coordinates were used
+    """
+
+    def __init__(self, candidates, best_field, best_field_distance, optimum, players):
+        self.candidates = candidates
+        self.best_field = best_field
+        self.best_field_distance = best_field_distance
+        self.optimum = optimum
+        self.players = players
+
+    def __repr__(self):
+        return f"SiteSuggestions(optimum={self.optimum}, best_field={self.best_field!r})"
+
+
+def mean_distances(player_coords, points, method="haversine", chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Average distance (miles) from every player to each of 'points', in one batched pass """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    sums = np.zeros(len(points))
+    for _, block in iter_distance_blocks(player_coords, points, method, chunk_size):
+        sums += block.sum(axis=0)
+    return sums / max(len(player_coords), 1)
+
+
+def grid_points(player_coords, grid_size=DEFAULT_GRID_SIZE):
+    """ (grid_size ** 2, 2) lat/lon cell centres covering the players' bounding box """
+    lo, hi = player_coords.min(axis=0), player_coords.max(axis=0)
+    steps = (hi - lo) / grid_size
+    lat = lo[0] + steps[0] * (np.arange(grid_size) + 0.5)
+    lon = lo[1] + steps[1] * (np.arange(grid_size) + 0.5)
+    lat_grid, lon_grid = np.meshgrid(lat, lon, indexing="ij")
+    return np.column_stack([lat_grid.ravel(), lon_grid.ravel()])
+
+
+def weiszfeld(player_coords, seeds, max_iter=WEISZFELD_MAX_ITER, tol=WEISZFELD_TOL_MILES):
+    """
+    Geometric median (the point with the least total distance to the
+    players) by Weiszfeld's iteratively re-weighted mean, run from every
+    seed at once. Coordinates are projected to local miles around the
+    players' centre, which is accurate to well under 0.1% over a metro area.
+    Returns the refined (n_seeds, 2) lat/lon points.
+    """
+    origin = player_coords.mean(axis=0)
+    scale = np.array([_MILES_PER_DEGREE, _MILES_PER_DEGREE * np.cos(np.radians(origin[0]))])
+    players = (player_coords - origin) * scale
+    points = (np.asarray(seeds, dtype=np.float64).reshape(-1, 2) - origin) * scale
+
+    for _ in range(max_iter):
+        diff = players[:, np.newaxis, :] - points[np.newaxis, :, :]
+        # Players sitting on a point would get infinite weight; cap it
+        weights = 1.0 / np.maximum(np.hypot(diff[..., 0], diff[..., 1]), 1e-9)
+        moved = (weights.T @ players) / weights.sum(axis=0)[:, np.newaxis]
+        shift = np.hypot(*(moved - points).T).max()
+        points = moved
+        if shift < tol:
+            break
+    return points / scale + origin
+
+
+def _spread_out(order, points, min_separation, limit):
+    """ Positions in 'order' skipping points within 'min_separation' miles of one already kept """
+    kept = []
+    for i in order:
+        if len(kept) == limit:
+            break
+        if kept:
+            gaps = haversine_miles(points[i, 0], points[i, 1], points[kept, 0], points[kept, 1])
+            if gaps.min() < min_separation:
+                continue
+        kept.append(int(i))
+    return kept
+
+
+def suggest_field_sites(players_df, fields_df=None, parcels_df=None, top_n=5, method="haversine",
+                        grid_size=DEFAULT_GRID_SIZE, seeds=DEFAULT_SEEDS, min_separation=MIN_SEPARATION_MILES,
+                        lat_col="Latitude", lon_col="Longitude"):
+    """
+    Suggests where to acquire a new field: the locations with the lowest
+    average distance to the players.
+
+    - Without parcels the search is continuous: the average distance is
+      evaluated for a grid_size x grid_size grid over the players'
+      bounding box, the 'seeds' best cells are refined with Weiszfeld
+      iterations, and the refined optimum plus the best grid cells at
+      least 'min_separation' miles apart are returned.
+    - With 'parcels_df' (candidate sites with lat/lon and optionally Name)
+      the answer is restricted to those parcels, ranked by average
+      distance; the unrestricted optimum is still reported for reference.
+    - 'fields_df' gives the current best field to measure the improvement
+      against.
+    """
+    player_coords = coordinate_array(players_df, lat_col, lon_col)
+    player_coords = player_coords[~np.isnan(player_coords).any(axis=1)]
+    if len(player_coords) == 0:
+        raise ValueError("Need at least one player with coordinates")
+
+    best_field, best_distance = None, None
+    if fields_df is not None and not fields_df.empty:
+        reducer = FieldDistanceReducer(fields_df, method=method, lat_col=lat_col, lon_col=lon_col, percentiles=())
+        best_field, best_distance = reducer.update(player_coords).best_field()
+
+    grid = grid_points(player_coords, grid_size)
+    grid_means = mean_distances(player_coords, grid, method)
+    refined = weiszfeld(player_coords, grid[np.argsort(grid_means)[:seeds]])
+    refined_means = mean_distances(player_coords, refined, method)
+    best = int(np.argmin(refined_means))
+    optimum = (float(refined[best, 0]), float(refined[best, 1]), float(refined_means[best]))
+
+    if parcels_df is not None:
+        parcel_coords = coordinate_array(parcels_df, lat_col, lon_col)
+        ok = ~np.isnan(parcel_coords).any(axis=1)
+        parcel_means = mean_distances(player_coords, parcel_coords[ok], method)
+        order = np.argsort(parcel_means, kind="stable")[:top_n]
+        candidates = pd.DataFrame({
+            "Latitude": parcel_coords[ok][order, 0],
+            "Longitude": parcel_coords[ok][order, 1],
+            "Avg Distance": parcel_means[order],
+            "Source": "parcel",
+        })
+        if "Name" in parcels_df.columns:
+            candidates.insert(0, "Name", parcels_df["Name"].to_numpy()[ok][order])
+    else:
+        points = np.vstack([refined[best][np.newaxis, :], grid])
+        means = np.concatenate([[refined_means[best]], grid_means])
+        kept = _spread_out(np.argsort(means, kind="stable"), points, min_separation, top_n)
+        candidates = pd.DataFrame({
+            "Latitude": points[kept, 0],
+            "Longitude": points[kept, 1],
+            "Avg Distance": means[kept],
+            "Source": ["weiszfeld" if i == 0 else "grid" for i in kept],
+        })
+
+    candidates["Improvement"] = (best_distance - candidates["Avg Distance"]) if best_distance is not None else np.nan
+    return SiteSuggestions(candidates.reset_index(drop=True), best_field, best_distance, optimum, len(player_coords))
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Where table snapshots live; override with SNAPSHOT_DIR
+DEFAULT_SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+
+# Bumped whenever the on-disk layout changes; older snapshots are ignored
+SNAPSHOT_FORMAT = 1
+
+# Column types enforced before writing, so every snapshot has the same schema
+COLUMN_TYPES = {
+    "id": "Int64",
+    "Age": "Int64",
+    "Capacity": "Int64",
+    "Latitude": "float64",
+    "Longitude": "float64",
+}
+
+_METADATA_KEY = b"dcsoccer.snapshot"
+
+
+def _typed(df):
+    """ Copy of 'df' with known columns coerced and the rest as strings """
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    for column in df.columns:
+        values = df[column].reset_index(drop=True)
+        dtype = COLUMN_TYPES.get(column)
+        if dtype == "Int64":
+            out[column] = pd.to_numeric(values, errors="coerce").round().astype("Int64")
+        elif dtype == "float64":
+            out[column] = pd.to_numeric(values, errors="coerce").astype("float64")
+        elif values.dtype == object:
+            # Mixed Python objects (lists, numbers in text columns) as text
+            out[column] = values.map(lambda v: None if v is None or v != v else str(v)).astype("string")
+        else:
+            out[column] = values
+    return out
+
+
+class SnapshotStore:
+    """
+    Local columnar copies of Supabase tables, one Parquet file per table.
+    Each file carries a small metadata stamp (row count, high-water mark,
+    data version, save time) so a cached table can resume from it and
+    only ask Supabase for what changed since.
+    """
+
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR):
+        self.directory = directory
+
+    def path(self, table_name):
+        return os.path.join(self.directory, f"{table_name}.parquet")
+
+    def save(self, table_name, df, hwm=None, version=None):
+        """ Writes 'df' atomically (temp file + rename) with its stamp """
+        os.makedirs(self.directory, exist_ok=True)
+        table = pa.Table.from_pandas(_typed(df), preserve_index=False)
+        stamp = {
+            "format": SNAPSHOT_FORMAT,
+            "rows": len(df),
+            "hwm": hwm.item() if hasattr(hwm, "item") else hwm,
+            "version": version,
+            "saved_at": time.time(),
+        }
+        metadata = dict(table.schema.metadata or {})
+        metadata[_METADATA_KEY] = json.dumps(stamp).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        tmp = self.path(table_name) + ".tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, self.path(table_name))
+        return stamp
+
+    def stamp(self, table_name):
+        """ Metadata stamp of a snapshot without reading its rows, or None """
+        path = self.path(table_name)
+        if not os.path.exists(path):
+            return None
+        metadata = pq.read_schema(path).metadata or {}
+        stamp = json.loads(metadata.get(_METADATA_KEY, b"{}"))
+        return stamp if stamp.get("format") == SNAPSHOT_FORMAT else None
+
+    def load(self, table_name, columns=None):
+        """
+        (DataFrame, stamp) from the snapshot, memory-mapping the file, or
+        (None, None) if there is no usable snapshot.
+        """
+        stamp = self.stamp(table_name)
+        if stamp is None:
+            return None, None
+        if columns is not None:
+            available = set(pq.read_schema(self.path(table_name)).names)
+            columns = [c for c in columns if c in available]
+        table = pq.read_table(self.path(table_name), columns=columns, memory_map=True)
+        df = table.to_pandas()
+        # Downstream code treats missing text as None, not pd.NA
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.StringDtype):
+                df[column] = df[column].astype(object).where(df[column].notna(), None)
+        return df, stamp
+
+    def delete(self, table_name):
+        """ Removes a table's snapshot (e.g. after rows were deleted upstream) """
+        try:
+            os.remove(self.path(table_name))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from distance_mapping import EARTH_RADIUS_MILES, coordinate_array
+
+
+def to_unit_sphere(coords):
+    """
+    Converts an (n, 2) array of (lat, lon) degrees to (n, 3) points on the
+    unit sphere. Straight-line (chord) distance between these points grows
+    monotonically with great-circle distance, so a KD-tree over them answers
+    nearest-neighbour and radius queries on the globe exactly.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_miles(chord):
+    """ Unit-sphere chord length -> great-circle miles """
+    return 2.0 * EARTH_RADIUS_MILES * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def miles_to_chord(miles):
+    """ Great-circle miles -> unit-sphere chord length """
+    angle = np.minimum(np.asarray(miles, dtype=np.float64) / EARTH_RADIUS_MILES, np.pi)
+    return 2.0 * np.sin(angle / 2.0)
+
+
+class SphereIndex:
+    """
+    KD-tree over lat/lon points projected onto the unit sphere. Rows with
+    missing coordinates are left out; 'labels' keeps the original index
+    label of every point that made it into the tree.
+    """
+
+    def __init__(self, df, lat_col="Latitude", lon_col="Longitude"):
+        coords = coordinate_array(df, lat_col, lon_col)
+        ok = ~np.isnan(coords).any(axis=1)
+        self.coords = coords[ok]
+        self.labels = df.index[ok]
+        self.tree = cKDTree(to_unit_sphere(self.coords)) if ok.any() else None
+
+    def __len__(self):
+        return len(self.coords)
+
+    def query(self, coords, k=1):
+        """
+        k nearest indexed points for each (lat, lon) in 'coords'.
+        Returns (miles, positions), both shaped (n, k); positions index into
+        self.coords / self.labels. Query rows with NaN coordinates, or k
+        larger than the index, come back as NaN miles and position -1.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        miles = np.full((len(coords), k), np.nan)
+        positions = np.full((len(coords), k), -1, dtype=np.int64)
+        ok = ~np.isnan(coords).any(axis=1)
+        if self.tree is None or not ok.any():
+            return miles, positions
+
+        chord, pos = self.tree.query(to_unit_sphere(coords[ok]), k=k)
+        chord = np.asarray(chord, dtype=np.float64).reshape(-1, k)
+        pos = np.asarray(pos).reshape(-1, k)
+        missing = pos >= len(self)
+        miles[ok] = np.where(missing, np.nan, chord_to_miles(chord))
+        positions[ok] = np.where(missing, -1, pos)
+        return miles, positions
+
+    def query_radius(self, coords, miles):
+        """ List (one entry per query point) of positions within 'miles' """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if self.tree is None:
+            return [np.empty(0, dtype=np.int64) for _ in range(len(coords))]
+        hits = self.tree.query_ball_point(to_unit_sphere(coords), r=float(miles_to_chord(miles)))
+        return [np.asarray(h, dtype=np.int64) for h in hits]
+
+    def count_within(self, coords, miles):
+        """ Number of indexed points within 'miles' of each query point """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if self.tree is None:
+            return np.zeros(len(coords), dtype=np.int64)
+        return np.asarray(self.tree.query_ball_point(
+            to_unit_sphere(coords), r=float(miles_to_chord(miles)), return_length=True
+        ), dtype=np.int64)
+
+
+class FieldIndex(SphereIndex):
+    """
+    Spatial index over the Fields table. Answers nearest-field lookups for
+    players and builds catchment reports without scanning every
+    player x field pair.
+    """
+
+    def __init__(self, fields_df, lat_col="Latitude", lon_col="Longitude"):
+        super().__init__(fields_df, lat_col, lon_col)
+        self.lat_col = lat_col
+        self.lon_col = lon_col
+        self.names = fields_df.loc[self.labels, "Name"].to_numpy()
+
+    def nearest_fields(self, players_df, k=1):
+        """
+        DataFrame indexed like 'players_df' with columns
+        'Field 1'..'Field k' and 'Miles 1'..'Miles k', nearest first.
+        """
+        k = max(1, min(int(k), len(self))) if len(self) else 1
+        miles, positions = self.query(coordinate_array(players_df, self.lat_col, self.lon_col), k=k)
+        names = np.full(positions.shape, None, dtype=object)
+        hit = positions >= 0
+        names[hit] = self.names[positions[hit]]
+        out = {}
+        for i in range(k):
+            out[f"Field {i + 1}"] = names[:, i]
+            out[f"Miles {i + 1}"] = miles[:, i]
+        return pd.DataFrame(out, index=players_df.index)
+
+    def assign_nearest_field(self, players_df):
+        """ Series of nearest field name per player (None without coordinates) """
+        return self.nearest_fields(players_df, k=1)["Field 1"].rename("Nearest Field")
+
+    def players_within(self, players_df, field_name, miles):
+        """ Rows of 'players_df' within 'miles' of the field called 'field_name' """
+        matches = np.flatnonzero(self.names == field_name)
+        if len(matches) == 0:
+            raise KeyError(f"Unknown field: {field_name}")
+        players = SphereIndex(players_df, self.lat_col, self.lon_col)
+        hits = players.query_radius(self.coords[matches[0]], miles)[0]
+        return players_df.loc[players.labels[np.sort(hits)]]
+
+    def catchment_counts(self, players_df, miles=None):
+        """
+        Per-field catchment report, indexed by field name:
+          - 'Nearest Players': players for whom this is the closest field
+          - 'Within N mi': players within 'miles' of the field (if given)
+        """
+        report = pd.DataFrame(index=pd.Index(self.names, name="Name"))
+        _, positions = self.query(coordinate_array(players_df, self.lat_col, self.lon_col), k=1)
+        assigned = positions[:, 0]
+        report["Nearest Players"] = np.bincount(assigned[assigned >= 0], minlength=len(self))
+
+        if miles is not None:
+            players = SphereIndex(players_df, self.lat_col, self.lon_col)
+            report[f"Within {miles:g} mi"] = players.count_within(self.coords, miles)
+        return report
+
+
+def fields_fingerprint(fields_df):
+    """ Stable hash of the field names and coordinates used by the index """
+    cols = [c for c in ("Name", "Latitude", "Longitude") if c in fields_df.columns]
+    return int(pd.util.hash_pandas_object(fields_df[cols], index=False).sum())
+
+
+_field_index_cache = {}
+
+
+def get_field_index(fields_df):
+    """
+    Returns a FieldIndex for 'fields_df', reusing the previously built one
+    unless the fields themselves (names or coordinates) have changed.
+    """
+    key = fields_fingerprint(fields_df)
+    index = _field_index_cache.get(key)
+    if index is None:
+        _field_index_cache.clear()
+        index = FieldIndex(fields_df)
+        _field_index_cache[key] = index
+    return index
@@ -0,0 +1,64 @@
+-- Aggregates served to the app instead of whole tables: one row per distinct
+-- (column, value) with how many rows have it. Values are normalized the way
+-- filters.FilterEngine normalizes them (trimmed/lowercased text, whole numbers);
+-- option_key is unique, so the option views can be paged in a stable order.
+
+CREATE OR REPLACE VIEW player_program_counts AS
+SELECT "Program" AS program, count(*) AS value_count
+FROM "Players"
+WHERE "Program" IS NOT NULL
+GROUP BY "Program";
+
+CREATE OR REPLACE VIEW player_filter_options AS
+SELECT column_name || ':' || value AS option_key, column_name, value, value_count
+FROM (
+SELECT 'Program' AS column_name, "Program"::text AS value, count(*) AS value_count
+FROM "Players" WHERE "Program" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Age', round("Age"::numeric)::text, count(*)
+FROM "Players" WHERE "Age" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Gender', lower(trim("Gender"::text)), count(*)
+FROM "Players" WHERE "Gender" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Grade', lower(trim("Grade"::text)), count(*)
+FROM "Players" WHERE "Grade" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'School', lower(trim("School"::text)), count(*)
+FROM "Players" WHERE "School" IS NOT NULL GROUP BY 2
+UNION ALL
+-- "Race List" is stored as a stringified list, e.g. ['white', 'asian']
+SELECT 'Race List', race, count(*)
+FROM "Players",
+     LATERAL (
+         SELECT DISTINCT lower(trim(BOTH ' ''"' FROM item)) AS race
+         FROM regexp_split_to_table(trim(BOTH '[]' FROM "Race List"), ',') AS item
+     ) AS races
+WHERE race <> ''
+GROUP BY 2
+) AS options;
+
+CREATE OR REPLACE VIEW field_filter_options AS
+SELECT column_name || ':' || value AS option_key, column_name, value, value_count
+FROM (
+SELECT 'Capacity' AS column_name, round("Capacity"::numeric)::text AS value, count(*) AS value_count
+FROM "Fields" WHERE "Capacity" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Surface', lower(trim("Surface"::text)), count(*)
+FROM "Fields" WHERE "Surface" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Size', lower(trim("Size"::text)), count(*)
+FROM "Fields" WHERE "Size" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Game Size', lower(trim("Game Size"::text)), count(*)
+FROM "Fields" WHERE "Game Size" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Lights', lower(trim("Lights"::text)), count(*)
+FROM "Fields" WHERE "Lights" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Permanent Lines', lower(trim("Permanent Lines"::text)), count(*)
+FROM "Fields" WHERE "Permanent Lines" IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'Goals', lower(trim("Goals"::text)), count(*)
+FROM "Fields" WHERE "Goals" IS NOT NULL GROUP BY 2
+) AS options;
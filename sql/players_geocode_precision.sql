@@ -0,0 +1,5 @@
+-- Records how each player's coordinates were obtained:
+-- 'address' (street geocode), 'zip' (ZIP centroid fallback) or NULL (unresolved).
+-- Optional: until this is applied the app uploads players without the column,
+-- so it can be run before or after deploying.
+ALTER TABLE "Players" ADD COLUMN IF NOT EXISTS "Geocode Precision" text;
@@ -0,0 +1,20 @@
+from data_access import TableBackend
+
+
+class UnusedBackend(TableBackend):
+    """ TableBackend whose methods fail the test; fakes override the ones a test expects """
+
+    def fetch_table(self, table_name, columns=None, page_size=None, order_by=None):
+        raise AssertionError(f"unexpected fetch_table({table_name!r})")
+
+    def fetch_rows_after(self, table_name, column, value, columns=None, page_size=None):
+        raise AssertionError(f"unexpected fetch_rows_after({table_name!r})")
+
+    def has_column(self, table_name, column):
+        raise AssertionError(f"unexpected has_column({table_name!r}, {column!r})")
+
+    def insert_rows(self, table_name, rows, on_conflict=None):
+        raise AssertionError(f"unexpected insert_rows({table_name!r})")
+
+    def delete_rows(self, table_name, column, operator, value):
+        raise AssertionError(f"unexpected delete_rows({table_name!r})")
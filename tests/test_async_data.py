@@ -0,0 +1,90 @@
+import time
+
+import httpx
+import pytest
+
+from async_data import DataClient, SessionAuth, SessionExpired
+
+
+class Session:
+    def __init__(self, access_token, refresh_token, expires_at):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+
+
+class Response:
+    def __init__(self, session):
+        self.session = session
+
+
+class FakeAuth:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.refreshed = 0
+
+    def refresh_session(self, refresh_token):
+        if self.fail:
+            raise RuntimeError("refresh token revoked")
+        self.refreshed += 1
+        return Response(Session(f"token-{self.refreshed}", refresh_token, time.time() + 3600))
+
+
+def mock_client(valid_tokens, seen):
+    """ DataClient whose server answers 401 unless the bearer token is in 'valid_tokens' """
+    def handler(request):
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        seen.append(token)
+        if token not in valid_tokens:
+            return httpx.Response(401, json={"message": "JWT expired"})
+        return httpx.Response(200, json=[{"id": 1}], headers={"content-range": "0-0/1"})
+
+    return DataClient("https://example.supabase.co", "anon-key", retries=0, transport=httpx.MockTransport(handler))
+
+
+def test_shared_client_sends_the_api_key_and_session_sends_its_token():
+    seen = []
+    client = mock_client({"anon-key", "user-token"}, seen)
+    auth = SessionAuth(FakeAuth(), Session("user-token", "refresh", time.time() + 3600))
+    try:
+        client.fetch_table("Players")
+        client.for_session(auth).fetch_table("Players")
+    finally:
+        client.close()
+    assert seen == ["anon-key", "user-token"]
+
+
+def test_session_refreshes_before_the_token_expires():
+    seen = []
+    client = mock_client({"token-1"}, seen)
+    fake_auth = FakeAuth()
+    auth = SessionAuth(fake_auth, Session("old-token", "refresh", time.time() + 10))
+    try:
+        frame = client.for_session(auth).fetch_table("Players")
+    finally:
+        client.close()
+    assert fake_auth.refreshed == 1
+    assert seen == ["token-1"]
+    assert list(frame["id"]) == [1]
+
+
+def test_session_refreshes_and_retries_once_on_401():
+    seen = []
+    client = mock_client({"token-1"}, seen)
+    fake_auth = FakeAuth()
+    auth = SessionAuth(fake_auth, Session("revoked-token", "refresh", time.time() + 3600))
+    try:
+        client.for_session(auth).delete_rows("Players", "id", "in", [1])
+    finally:
+        client.close()
+    assert seen == ["revoked-token", "token-1"]
+
+
+def test_failed_refresh_raises_session_expired():
+    client = mock_client(set(), [])
+    auth = SessionAuth(FakeAuth(fail=True), Session("old-token", "refresh", time.time() + 3600))
+    try:
+        with pytest.raises(SessionExpired):
+            client.for_session(auth).fetch_table("Players")
+    finally:
+        client.close()
@@ -0,0 +1,140 @@
+import threading
+
+import httpx
+import pytest
+
+from data_access import BulkInsertError, bulk_insert
+from fakes import UnusedBackend
+
+
+class FakeTable(UnusedBackend):
+    """ insert_rows / delete_rows over an in-memory table; 'fail_on' batches raise """
+
+    def __init__(self, rows=(), fail_on=(), fail_delete=False):
+        self.rows = {row["id"]: dict(row) for row in rows}
+        self.fail_on = set(fail_on)
+        self.fail_delete = fail_delete
+        self.next_id = max(self.rows, default=0) + 1
+        self.deleted = []
+        self._lock = threading.Lock()
+
+    def insert_rows(self, table_name, rows, on_conflict=None):
+        if rows[0]["Name"] in self.fail_on:
+            raise RuntimeError("insert failed")
+        written = []
+        with self._lock:
+            for row in rows:
+                row = dict(row)
+                if on_conflict:
+                    existing = [r for r in self.rows.values() if r[on_conflict] == row[on_conflict]]
+                    if existing:
+                        existing[0].update(row)
+                        written.append(dict(existing[0]))
+                        continue
+                row["id"] = self.next_id
+                self.next_id += 1
+                self.rows[row["id"]] = row
+                written.append(dict(row))
+        return written
+
+    def delete_rows(self, table_name, column, operator, value):
+        if self.fail_delete:
+            raise RuntimeError("delete failed")
+        assert (column, operator) == ("id", "in")
+        with self._lock:
+            for key in value:
+                self.deleted.append(key)
+                self.rows.pop(key, None)
+
+
+def _records(n):
+    return [{"Name": f"player {i}"} for i in range(n)]
+
+
+def test_inserts_every_batch_and_reports_progress():
+    table = FakeTable()
+    progress = []
+    written = bulk_insert(table, "Players", _records(25), batch_size=10,
+                          on_progress=lambda done, total: progress.append((done, total)))
+    assert written == 25
+    assert len(table.rows) == 25
+    assert sorted(progress)[-1] == (25, 25)
+
+
+def test_failed_batch_rolls_back_written_rows():
+    table = FakeTable(fail_on={"player 20"})
+    with pytest.raises(BulkInsertError) as info:
+        bulk_insert(table, "Players", _records(25), batch_size=10, max_workers=1)
+    assert table.rows == {}
+    assert info.value.inserted == 0
+    assert info.value.remaining == _records(25)
+
+
+def test_without_rollback_keeps_written_rows():
+    table = FakeTable(fail_on={"player 20"})
+    with pytest.raises(BulkInsertError) as info:
+        bulk_insert(table, "Players", _records(25), batch_size=10, max_workers=1, rollback=False)
+    assert len(table.rows) == 20
+    assert info.value.inserted == 20
+    assert info.value.remaining == _records(25)[20:]
+
+
+def test_failed_upsert_never_deletes_existing_rows():
+    existing = [{"id": 1, "Name": "player 0", "Age": 9}, {"id": 2, "Name": "player 1", "Age": 9}]
+    table = FakeTable(existing, fail_on={"player 10"})
+    with pytest.raises(BulkInsertError):
+        bulk_insert(table, "Players", _records(15), batch_size=10, max_workers=1, on_conflict="Name")
+    assert table.deleted == []
+    assert {1, 2} <= set(table.rows)
+
+
+def test_failed_rollback_is_a_bulk_insert_error():
+    table = FakeTable(fail_on={"player 10"}, fail_delete=True)
+    with pytest.raises(BulkInsertError) as info:
+        bulk_insert(table, "Players", _records(15), batch_size=10, max_workers=1)
+    assert isinstance(info.value.rollback_error, RuntimeError)
+    assert info.value.inserted == 10
+    assert info.value.remaining == _records(15)[10:]
+
+
+class TimeoutTable(FakeTable):
+    """ Commits the 'timeout_on' batch but loses the response, like a read timeout """
+
+    def __init__(self, timeout_on, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout_on = timeout_on
+
+    def insert_rows(self, table_name, rows, on_conflict=None):
+        written = super().insert_rows(table_name, rows, on_conflict)
+        if rows[0]["Name"] == self.timeout_on:
+            raise httpx.ReadTimeout("timed out")
+        return written
+
+
+def test_batch_with_unknown_outcome_makes_the_rollback_incomplete():
+    table = TimeoutTable("player 20")
+    with pytest.raises(BulkInsertError) as info:
+        bulk_insert(table, "Players", _records(25), batch_size=10, max_workers=1)
+    # The committed batch returned no ids, so the rollback could not reach it
+    assert len(table.rows) == 5
+    assert not info.value.rolled_back
+    assert info.value.unconfirmed == _records(25)[20:]
+    assert "without confirmation" in str(info.value)
+
+
+def test_rejected_batch_rolls_back_completely():
+    table = FakeTable(fail_on={"player 20"})
+    with pytest.raises(BulkInsertError) as info:
+        bulk_insert(table, "Players", _records(25), batch_size=10, max_workers=1)
+    assert info.value.rolled_back
+    assert info.value.unconfirmed == []
+
+
+def test_connect_errors_are_known_not_written():
+    class Unreachable(FakeTable):
+        def insert_rows(self, table_name, rows, on_conflict=None):
+            raise httpx.ConnectError("connection refused")
+
+    with pytest.raises(BulkInsertError) as info:
+        bulk_insert(Unreachable(), "Players", _records(5), batch_size=10)
+    assert info.value.rolled_back
@@ -0,0 +1,173 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_access import FIELD_DTYPES, PLAYER_DTYPES, CachedTable, SchemaError, TableBackend, compact_frame
+from fakes import UnusedBackend
+from snapshot_store import SnapshotStore
+
+
+class FakeSupabase(UnusedBackend):
+    """ fetch_table / fetch_rows_after over an in-memory table; offline=True makes every call fail """
+
+    def __init__(self, rows):
+        self.df = pd.DataFrame(rows)
+        self.offline = False
+        self.calls = []
+
+    def fetch_table(self, table_name, columns=None, page_size=None, order_by=None):
+        self._call("fetch_table")
+        return self.df[columns].copy() if columns else self.df.copy()
+
+    def fetch_rows_after(self, table_name, column, value, columns=None, page_size=None):
+        self._call("fetch_rows_after")
+        rows = self.df[self.df[column] > value]
+        return rows[columns].copy() if columns else rows.copy()
+
+    def _call(self, name):
+        if self.offline:
+            raise ConnectionError("offline")
+        self.calls.append(name)
+
+
+def _players(ids):
+    return [{"id": i, "Program": "Travel", "Latitude": 38.9, "Longitude": -77.0} for i in ids]
+
+
+def _wait_for_sync(table, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while table._syncing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not table._syncing
+
+
+def test_refresh_fetches_only_new_rows():
+    client = FakeSupabase(_players([1, 2, 3]))
+    table = CachedTable(client, "Players", ttl=0)
+    df, version = table.get()
+    assert df["id"].tolist() == [1, 2, 3]
+
+    client.df = pd.DataFrame(_players([1, 2, 3, 4]))
+    df, newer = table.get()
+    assert df["id"].tolist() == [1, 2, 3, 4]
+    assert newer == version + 1
+    assert client.calls == ["fetch_table", "fetch_rows_after"]
+
+
+def test_version_only_moves_when_rows_change():
+    client = FakeSupabase(_players([1, 2]))
+    table = CachedTable(client, "Players", ttl=0)
+    _, first = table.get()
+    _, second = table.get()
+    assert first == second
+
+
+def test_snapshot_serves_offline_and_syncs_in_background(tmp_path):
+    client = FakeSupabase(_players([1, 2, 3]))
+    CachedTable(client, "Players", snapshot=SnapshotStore(tmp_path)).get()
+
+    # A new process starts from the snapshot while Supabase is down
+    client.offline = True
+    restarted = CachedTable(client, "Players", snapshot=SnapshotStore(tmp_path))
+    df, _ = restarted.get()
+    assert df["id"].tolist() == [1, 2, 3]
+    _wait_for_sync(restarted)
+    assert restarted.get()[0]["id"].tolist() == [1, 2, 3]
+
+    # Back online: the snapshot is served, then replaced by a full reload
+    client.offline = False
+    client.df = pd.DataFrame(_players([1, 2, 3, 4, 5]))
+    client.calls.clear()
+    again = CachedTable(client, "Players", snapshot=SnapshotStore(tmp_path))
+    again.get()
+    _wait_for_sync(again)
+    assert client.calls == ["fetch_table"]
+    assert again.get()[0]["id"].tolist() == [1, 2, 3, 4, 5]
+    assert SnapshotStore(tmp_path).stamp("Players")["hwm"] == 5
+
+
+def test_restart_catches_rows_edited_or_deleted_elsewhere(tmp_path):
+    client = FakeSupabase(_players([1, 2, 3]))
+    CachedTable(client, "Players", snapshot=SnapshotStore(tmp_path)).get()
+
+    # Another instance deletes a row and edits one below the high-water mark
+    rows = _players([1, 3])
+    rows[1]["Program"] = "Academy"
+    client.df = pd.DataFrame(rows)
+
+    restarted = CachedTable(client, "Players", snapshot=SnapshotStore(tmp_path))
+    stale, stale_version = restarted.get()
+    assert stale["id"].tolist() == [1, 2, 3]
+    _wait_for_sync(restarted)
+
+    df, version = restarted.get()
+    assert df["id"].tolist() == [1, 3]
+    assert df["Program"].tolist() == ["Travel", "Academy"]
+    assert version > stale_version
+    assert SnapshotStore(tmp_path).load("Players")[0]["id"].tolist() == [1, 3]
+
+
+def test_full_reload_after_full_ttl():
+    client = FakeSupabase(_players([1, 2, 3]))
+    table = CachedTable(client, "Players", ttl=0, full_ttl=3600)
+    table.get()
+    client.df = pd.DataFrame(_players([1, 3]))
+    assert table.get()[0]["id"].tolist() == [1, 2, 3]
+
+    table.full_ttl = 0
+    df, version = table.get()
+    assert df["id"].tolist() == [1, 3]
+    assert client.calls == ["fetch_table", "fetch_rows_after", "fetch_table"]
+    # An unchanged full reload keeps the version
+    assert table.get()[1] == version
+
+
+def test_invalidate_reloads_and_drops_the_snapshot(tmp_path):
+    client = FakeSupabase(_players([1, 2, 3]))
+    store = SnapshotStore(tmp_path)
+    table = CachedTable(client, "Players", snapshot=store)
+    table.get()
+
+    client.df = pd.DataFrame(_players([1, 3]))
+    table.invalidate()
+    assert store.stamp("Players") is None
+    assert table.get()[0]["id"].tolist() == [1, 3]
+
+
+def test_missing_key_column_is_a_schema_error(tmp_path):
+    client = FakeSupabase([{"Program": "Travel"}])
+    with pytest.raises(SchemaError, match="'id'"):
+        CachedTable(client, "Players").get()
+
+    # A snapshot from before a schema change is ignored rather than served
+    SnapshotStore(tmp_path).save("Players", pd.DataFrame({"Program": ["Travel"]}))
+    client.df = pd.DataFrame(_players([7]))
+    table = CachedTable(client, "Players", snapshot=SnapshotStore(tmp_path))
+    assert table.get()[0]["id"].tolist() == [7]
+
+
+def test_incomplete_backends_fail_when_created():
+    class ReadOnly(TableBackend):
+        def fetch_table(self, table_name, columns=None, page_size=None, order_by=None):
+            return pd.DataFrame()
+
+    with pytest.raises(TypeError, match="abstract"):
+        ReadOnly()
+
+
+def test_compact_ints_widen_rather_than_fail():
+    players = pd.DataFrame({"id": [1, 2 ** 31, 3], "Age": [9, 200, None], "Zip Code": ["20009"] * 3})
+    fields = pd.DataFrame({"id": [1, 2, 3], "Capacity": ["40000", np.inf, "n/a"]})
+
+    compact_players = compact_frame(players, PLAYER_DTYPES)
+    compact_fields = compact_frame(fields, FIELD_DTYPES)
+
+    assert compact_players["id"].dtype == "Int64" and compact_players["id"].tolist() == [1, 2 ** 31, 3]
+    assert compact_players["Age"].dtype == "Int64" and compact_players["Age"].tolist()[:2] == [9, 200]
+    assert compact_fields["Capacity"].dtype == "Int64"
+    assert compact_fields["Capacity"].iloc[0] == 40000 and compact_fields["Capacity"].iloc[1:].isna().all()
+    # Values that fit keep the compact type
+    assert compact_fields["id"].dtype == "Int32"
+    assert compact_frame(players.iloc[[0, 2]], PLAYER_DTYPES)["Age"].dtype == "Int8"
@@ -0,0 +1,121 @@
+import io
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from clean_uploaded_csv import clean_csv_in_chunks, clean_uploaded_csv
+from geocoding import BatchGeocoder, GazetteerBackend, GeocodeCache
+from zip_centroids import PRECISION_ADDRESS, PRECISION_COLUMN, PRECISION_ZIP, lookup_zip_centroids
+
+# The malformed birth dates below make pandas fall back to parsing each one
+pytestmark = pytest.mark.filterwarnings("ignore:Could not infer format")
+
+
+def _upload():
+    return pd.DataFrame({
+        "address": ["1 Main St", "2 Oak St ", "3 Elm St", "4 Pine St", "5 Ash St", "6 Birch St", "7 Fir St"],
+        "city": ["Washington"] * 7,
+        "state": ["DC"] * 7,
+        "zip": [20001, "20002-1234", "20009.0", "99999", None, "20010", "20011"],
+        "birth_date": ["2015-03-04", "not a date", None, "2015-02-29", "2016-02-29", "", "2014-12-31"],
+        "Race": ["White, Asian", " BLACK ,, hispanic ", None, "white;asian", "", ",", "Asian,white , "],
+    })
+
+
+def _geocoder():
+    # Only the first two addresses geocode; the rest fall back to ZIP centroids
+    backend = GazetteerBackend({
+        "1 Main St, Washington, DC": (38.90, -77.03),
+        "2 Oak St, Washington, DC": (38.91, -77.02),
+    })
+    return BatchGeocoder(backend=backend, cache=GeocodeCache(":memory:"), rate_limit=None)
+
+
+def _row_wise_age(value):
+    """ The Age calculation before it was vectorized, one row at a time """
+    today = datetime.today()
+    d = pd.to_datetime(pd.Series([value]), errors="coerce").iloc[0]
+    return today.year - d.year - ((today.month, today.day) < (d.month, d.day)) if pd.notnull(d) else None
+
+
+def _row_wise_races(value):
+    """ The Race List parsing before it was vectorized (missing Race now gives [], not ['nan']) """
+    if pd.isnull(value):
+        return []
+    return [race.strip().lower() for race in str(value).split(",") if race.strip()]
+
+
+def test_age_matches_row_wise_calculation():
+    upload = _upload()
+    cleaned = clean_uploaded_csv(upload.copy(), "Travel", geocode_mode="zip")
+
+    # The whole column is parsed at once, as before, so parse the reference the same way
+    dates = pd.to_datetime(upload["birth_date"], errors="coerce")
+    expected = [_row_wise_age(d) if pd.notnull(d) else None for d in dates]
+    assert cleaned["Age"].tolist() == expected
+    assert cleaned["Age"].tolist()[1:4] == [None, None, None]
+    assert cleaned["birth_date"].tolist()[1:4] == [None, None, None]
+
+
+def test_race_list_matches_row_wise_parsing():
+    upload = _upload()
+    cleaned = clean_uploaded_csv(upload.copy(), "Travel", geocode_mode="zip")
+
+    assert cleaned["Race List"].tolist() == [_row_wise_races(r) for r in upload["Race"]]
+    assert cleaned["Race List"].tolist() == [
+        ["white", "asian"], ["black", "hispanic"], [], ["white;asian"], [], [], ["asian", "white"],
+    ]
+    # Rows with the same Race string get their own lists
+    first, last = cleaned["Race List"].iloc[0], cleaned["Race List"].iloc[4]
+    assert first is not last
+
+
+def test_zip_fallback_where_the_address_does_not_geocode():
+    cleaned = clean_uploaded_csv(_upload(), "Travel", geocoder=_geocoder())
+
+    assert cleaned["Latitude"].tolist()[:2] == [38.90, 38.91]
+    assert cleaned[PRECISION_COLUMN].tolist()[:2] == [PRECISION_ADDRESS] * 2
+
+    zip_lat, zip_lon = lookup_zip_centroids(pd.Series(["20009", "20010"]))
+    assert cleaned["Latitude"].iloc[2] == zip_lat.iloc[0]
+    assert cleaned["Longitude"].iloc[5] == zip_lon.iloc[1]
+    assert cleaned[PRECISION_COLUMN].iloc[2] == PRECISION_ZIP
+    # Unknown and missing ZIPs leave the player unplaced
+    assert cleaned.loc[[3, 4], ["Latitude", "Longitude", PRECISION_COLUMN]].isna().all().all()
+    assert cleaned["Program"].eq("Travel").all()
+
+
+def test_zip_mode_never_geocodes():
+    class Unreachable:
+        def geocode_many(self, addresses):
+            raise AssertionError("geocoder called in zip mode")
+
+    cleaned = clean_uploaded_csv(_upload(), "Travel", geocoder=Unreachable(), geocode_mode="zip")
+    assert set(cleaned[PRECISION_COLUMN].dropna()) == {PRECISION_ZIP}
+
+
+def test_nulls_are_none_in_the_insert_payload():
+    records = clean_uploaded_csv(_upload(), "Travel", geocode_mode="zip").to_dict(orient="records")
+    assert records[3]["Latitude"] is None
+    assert records[1]["Age"] is None
+
+
+def test_chunks_match_one_pass():
+    upload = _upload()
+    source = upload.to_csv(index=False)
+
+    whole = clean_uploaded_csv(pd.read_csv(io.StringIO(source), dtype={"zip": str}), "Travel", geocoder=_geocoder())
+    chunks = list(clean_csv_in_chunks(io.StringIO(source), "Travel", chunksize=3, geocoder=_geocoder()))
+
+    assert [len(c) for c in chunks] == [3, 3, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks), whole)
+    # The numeric-only middle chunk keeps its ZIPs as written
+    assert pd.concat(chunks)["Zip Code"].tolist()[3:6] == ["99999", None, "20010"]
+
+
+def test_missing_columns_and_bad_mode():
+    with pytest.raises(ValueError, match="Race"):
+        clean_uploaded_csv(_upload().drop(columns=["Race"]), "Travel")
+    with pytest.raises(ValueError, match="geocode_mode"):
+        clean_uploaded_csv(_upload(), "Travel", geocode_mode="satellite")
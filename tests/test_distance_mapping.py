@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+import pytest
+from geopy.distance import geodesic
+
+from distance_mapping import (
+    FieldDistanceReducer, calculate_distances, coordinate_array, distance_matrix, find_optimal_field_for_data,
+    optimal_fields_by_group, summarize_field_distances, vincenty_miles,
+)
+
+
+def _players(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Latitude": 38.9 + rng.normal(scale=0.03, size=n),
+        "Longitude": -77.03 + rng.normal(scale=0.03, size=n),
+    })
+
+
+def _fields():
+    return pd.DataFrame({
+        "Name": ["North", "Centre", "South"],
+        "Latitude": [38.96, 38.90, 38.84],
+        "Longitude": [-77.03, -77.03, -77.02],
+    })
+
+
+def _matrix(players, fields):
+    return distance_matrix(
+        coordinate_array(players, "Latitude", "Longitude"), coordinate_array(fields, "Latitude", "Longitude"),
+    )
+
+
+def test_reducer_matches_full_matrix():
+    players, fields = _players(), _fields()
+    matrix = _matrix(players, fields)
+
+    summary = FieldDistanceReducer(fields).update(players).summary()
+
+    assert summary["count"].tolist() == [len(players)] * 3
+    np.testing.assert_allclose(summary["mean"], matrix.mean(axis=0))
+    np.testing.assert_allclose(summary["min"], matrix.min(axis=0))
+    np.testing.assert_allclose(summary["max"], matrix.max(axis=0))
+    # The sketch is accurate to about 1%
+    np.testing.assert_allclose(summary["p50"], np.median(matrix, axis=0), rtol=0.02)
+    np.testing.assert_allclose(summary["p90"], np.percentile(matrix, 90, axis=0), rtol=0.02)
+
+
+def test_reducer_is_independent_of_pages_and_chunks():
+    players, fields = _players(1000), _fields()
+    whole = summarize_field_distances(players, fields)
+    paged = summarize_field_distances([players.iloc[:300], players.iloc[300:]], fields, chunk_size=7)
+    pd.testing.assert_frame_equal(whole, paged)
+
+
+def test_best_field_and_missing_coordinates():
+    players, fields = _players(), _fields()
+    players.loc[::10, "Latitude"] = np.nan
+    fields = pd.concat([fields, pd.DataFrame({"Name": ["Nowhere"], "Latitude": [np.nan], "Longitude": [np.nan]})])
+
+    reducer = FieldDistanceReducer(fields).update(players)
+
+    assert reducer.count == len(players) - len(players.iloc[::10])
+    assert list(reducer.field_names) == ["North", "Centre", "South"]
+    best, average = reducer.best_field()
+    assert best == "Centre"
+    assert average == pytest.approx(reducer.mean_distances()["Centre"])
+
+
+def test_reducer_without_players():
+    reducer = FieldDistanceReducer(_fields())
+    assert reducer.best_field() == (None, None)
+    assert reducer.summary()["mean"].isna().all()
+
+
+def test_calculate_distances_frame():
+    players = _players(5).rename(columns={"Latitude": "latitude", "Longitude": "longitude"})
+    fields = _fields().rename(columns={"Latitude": "latitude", "Longitude": "longitude"})
+    distances = calculate_distances(players, fields)
+    assert list(distances.columns) == ["North", "Centre", "South"]
+    assert distances.shape == (5, 3)
+
+
+def test_vincenty_matches_geopy_geodesic():
+    rng = np.random.default_rng(1)
+    lat1, lat2 = rng.uniform(-80, 80, size=(2, 200))
+    lon1, lon2 = rng.uniform(-180, 180, size=(2, 200))
+
+    miles = vincenty_miles(lat1, lon1, lat2, lon2)
+
+    expected = [geodesic((a, b), (c, d)).miles for a, b, c, d in zip(lat1, lon1, lat2, lon2)]
+    # Under a millimetre
+    np.testing.assert_allclose(miles, expected, rtol=0, atol=1e-6)
+
+
+def test_vincenty_near_antipodal_and_coincident_points():
+    pairs = np.array([
+        [0.0, 0.0, 0.5, 179.7],      # Iteration does not converge; handed to geopy
+        [0.0, 0.0, 0.0, 180.0],
+        [10.0, 20.0, -10.1, -160.2],
+        [89.9, 0.0, -89.9, 180.0],
+        [38.9, -77.0, 38.9, -77.0],  # Coincident
+        [90.0, 0.0, 90.0, 120.0],    # The pole under two longitudes
+    ])
+
+    miles = vincenty_miles(*pairs.T)
+
+    expected = [geodesic((a, b), (c, d)).miles for a, b, c, d in pairs]
+    assert np.isfinite(miles).all()
+    np.testing.assert_allclose(miles, expected, rtol=0, atol=1e-6)
+    assert miles[4] == 0.0
+    assert miles[5] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_exact_matrix_broadcasts_players_against_fields():
+    players, fields = _players(20), _fields()
+    player_coords = coordinate_array(players, "Latitude", "Longitude")
+    field_coords = coordinate_array(fields, "Latitude", "Longitude")
+
+    matrix = distance_matrix(player_coords, field_coords, method="exact", chunk_size=7)
+
+    assert matrix.shape == (20, 3)
+    assert matrix[3, 1] == pytest.approx(geodesic(tuple(player_coords[3]), tuple(field_coords[1])).miles, abs=1e-6)
+
+
+def _grouped_players():
+    players = _players(400)
+    players["Age"] = np.resize([8, 9, 10, 11], len(players))
+    # Every age-11 player lacks coordinates
+    players.loc[players["Age"] == 11, "Latitude"] = np.nan
+    players.loc[::37, "Age"] = np.nan
+    return players
+
+
+@pytest.mark.filterwarnings("error::RuntimeWarning")
+def test_groups_match_a_search_per_subset():
+    players, fields = _grouped_players(), _fields()
+
+    result = optimal_fields_by_group(players, fields, "Age", runner_ups=1, n_jobs=1)
+
+    assert result["Age"].tolist() == [8, 9, 10]
+    for _, row in result.iterrows():
+        subset = players[players["Age"] == row["Age"]]
+        best, average = find_optimal_field_for_data(subset, fields)
+        assert row["Best Field"] == best
+        assert row["Avg Distance"] == pytest.approx(average)
+        assert row["Players"] == subset["Latitude"].notna().sum()
+        assert row["Runner Up 1 Distance"] >= row["Avg Distance"]
+
+
+def test_groups_in_worker_processes_match_one_process():
+    players, fields = _grouped_players(), _fields()
+    single = optimal_fields_by_group(players, fields, "Age", n_jobs=1, chunk_size=64)
+    parallel = optimal_fields_by_group(players, fields, "Age", n_jobs=2, chunk_size=64)
+    pd.testing.assert_frame_equal(single, parallel, check_exact=False)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from field_assignment import assign_greedy, assign_optimal, field_capacities, solve_field_assignment
+
+
+def _players(n, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Latitude": 38.9 + rng.normal(scale=0.03, size=n),
+        "Longitude": -77.0 + rng.normal(scale=0.03, size=n),
+    })
+
+
+def _fields(capacities):
+    rng = np.random.default_rng(len(capacities))
+    return pd.DataFrame({
+        "Name": [f"F{i}" for i in range(len(capacities))],
+        "Latitude": 38.9 + rng.normal(scale=0.04, size=len(capacities)),
+        "Longitude": -77.0 + rng.normal(scale=0.04, size=len(capacities)),
+        "Capacity": capacities,
+    })
+
+
+def _check(plan, n_players, k):
+    assert len(plan.fields) == k
+    assert len(set(plan.fields)) == k
+    assert plan.assignment.notna().sum() == n_players
+    assert (plan.summary["Players"] <= plan.summary["Capacity"]).all()
+
+
+def test_tight_capacities_never_open_a_field_twice():
+    fields = pd.DataFrame({
+        "Name": list("ABCD"),
+        "Latitude": [38.90, 38.91, 38.95, 38.85],
+        "Longitude": [-77.00, -77.01, -77.02, -77.03],
+        "Capacity": [100, 25, 25, 5],
+    })
+    plan = solve_field_assignment(_players(150), fields, 3)
+    _check(plan, 150, 3)
+    assert sorted(plan.fields) == ["A", "B", "C"]
+
+
+def test_fractional_capacities_are_whole_players():
+    fields = _fields([1.5] * 40)
+    plan = solve_field_assignment(_players(300), fields, 30, players_per_capacity=11.2)
+    _check(plan, 300, 30)
+    assert (plan.summary["Capacity"] == 16).all()
+
+    # 18 fields hold 18 * 16.8 = 302.4 players on paper but only 288 whole ones
+    with pytest.raises(ValueError):
+        solve_field_assignment(_players(300), fields, 18, players_per_capacity=11.2)
+
+
+def test_not_enough_capacity_is_a_value_error():
+    with pytest.raises(ValueError):
+        solve_field_assignment(_players(100), _fields([20, 20, 20]), 3)
+
+
+def test_heuristic_matches_exact_on_a_small_case():
+    players, fields = _players(40), _fields([15, 15, 15, 15, 30, np.nan])
+    heuristic = solve_field_assignment(players, fields, 3)
+    exact = solve_field_assignment(players, fields, 3, exact=True)
+    _check(heuristic, 40, 3)
+    _check(exact, 40, 3)
+    assert heuristic.total_distance == pytest.approx(exact.total_distance, rel=0.02)
+
+
+def test_players_without_coordinates_are_left_unassigned():
+    players = _players(30)
+    players.loc[[0, 5], "Latitude"] = np.nan
+    plan = solve_field_assignment(players, _fields([50, 50]), 1)
+    assert plan.assignment.isna().sum() == 2
+    assert np.isnan(plan.distances[[0, 5]]).all()
+
+
+def test_field_capacities_default_to_unlimited():
+    fields = pd.DataFrame({"Capacity": [2.7, None, "x"]})
+    np.testing.assert_array_equal(field_capacities(fields, 10, players_per_capacity=2), [5, 10, 10])
+
+
+def test_assignments_respect_capacity():
+    distances = np.array([[1.0, 2.0], [1.0, 3.0], [1.0, 1.5]])
+    for solve in (assign_greedy, assign_optimal):
+        choice = solve(distances, np.array([2.0, 1.0]))
+        assert np.bincount(choice, minlength=2).tolist() == [2, 1]
+        assert choice[2] == 1
+    assert assign_greedy(distances, np.array([1.0, 1.0])) is None
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from geopy.exc import GeocoderRateLimited, GeocoderServiceError, GeocoderTimedOut
+
+from geocoding import BatchGeocoder, GeocodeCache, normalize_address
+
+
+class StubBackend:
+    """ Answers from 'points'; 'failures' maps an address to the errors it raises first """
+
+    def __init__(self, points, failures=None):
+        self.points = {normalize_address(k): v for k, v in points.items()}
+        self.failures = {normalize_address(k): list(v) for k, v in (failures or {}).items()}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        key = normalize_address(address)
+        with self._lock:
+            self.calls.append(key)
+            pending = self.failures.get(key)
+            if pending:
+                raise pending.pop(0)
+        return self.points.get(key, (None, None))
+
+
+def _geocoder(backend, cache=None, retries=2):
+    return BatchGeocoder(backend=backend, cache=cache or GeocodeCache(":memory:"), rate_limit=None,
+                         retries=retries, backoff=0)
+
+
+def test_duplicates_are_looked_up_once():
+    backend = StubBackend({"1 Main St": (38.9, -77.0)})
+    results = _geocoder(backend).geocode_many(["1 Main St", " 1 main st ", "1 MAIN  ST", None, ""])
+    assert results == [(38.9, -77.0)] * 3 + [(None, None)] * 2
+    assert backend.calls == ["1 main st"]
+
+
+def test_cache_hits_skip_the_backend():
+    cache = GeocodeCache(":memory:")
+    first = StubBackend({"1 Main St": (38.9, -77.0), "Nowhere": (None, None)})
+    _geocoder(first, cache).geocode_many(["1 Main St", "Nowhere"])
+
+    second = StubBackend({})
+    results = _geocoder(second, cache).geocode_many(["1 main st", "nowhere", "2 Oak St"])
+
+    assert results == [(38.9, -77.0), (None, None), (None, None)]
+    # Misses are cached too; only the new address is looked up
+    assert second.calls == ["2 oak st"]
+
+
+def test_timeouts_and_rate_limits_are_retried():
+    backend = StubBackend(
+        {"1 Main St": (38.9, -77.0), "2 Oak St": (38.8, -77.1)},
+        failures={"1 Main St": [GeocoderTimedOut("slow")], "2 Oak St": [GeocoderRateLimited("429", retry_after=0)]},
+    )
+    results = _geocoder(backend).geocode_many(["1 Main St", "2 Oak St"])
+    assert results == [(38.9, -77.0), (38.8, -77.1)]
+    assert sorted(backend.calls) == ["1 main st", "1 main st", "2 oak st", "2 oak st"]
+
+
+def test_rate_limit_waits_for_retry_after():
+    backend = StubBackend({"a": (1.0, 1.0), "b": (2.0, 2.0)},
+                          failures={"a": [GeocoderRateLimited("429", retry_after=0.3)]})
+    geocoder = _geocoder(backend)
+
+    start = time.monotonic()
+    assert geocoder.geocode_many(["a"]) == [(1.0, 1.0)]
+    assert time.monotonic() - start >= 0.25
+    # Every thread is held back until the Retry-After has passed
+    assert geocoder.rate_limiter._next >= start + 0.25
+
+
+def test_one_failed_address_does_not_fail_the_batch():
+    cache = GeocodeCache(":memory:")
+    backend = StubBackend(
+        {"1 Main St": (38.9, -77.0), "2 Oak St": (38.8, -77.1), "3 Elm St": (38.7, -77.2)},
+        failures={
+            "2 Oak St": [GeocoderServiceError("bad request")],
+            "3 Elm St": [GeocoderTimedOut("slow")] * 3,
+        },
+    )
+    results = _geocoder(backend, cache, retries=2).geocode_many(["1 Main St", "2 Oak St", "3 Elm St"])
+
+    assert results == [(38.9, -77.0), (None, None), (None, None)]
+    # Successes are cached, failures are not, so the next upload retries only those
+    assert cache.get_many(["1 main st", "2 oak st", "3 elm st"]) == {"1 main st": (38.9, -77.0)}
+    assert backend.calls.count("2 oak st") == 1
+    assert backend.calls.count("3 elm st") == 3
+
+
+def test_successes_are_cached_when_the_batch_is_interrupted():
+    class Interrupted(StubBackend):
+        def geocode(self, address):
+            if normalize_address(address) == "2 oak st":
+                raise KeyboardInterrupt
+            return super().geocode(address)
+
+    cache = GeocodeCache(":memory:")
+    geocoder = BatchGeocoder(backend=Interrupted({"1 Main St": (38.9, -77.0)}), cache=cache, rate_limit=None,
+                             max_workers=1)
+    try:
+        geocoder.geocode_many(["1 Main St", "2 Oak St"])
+    except KeyboardInterrupt:
+        pass
+    assert cache.get_many(["1 main st"]) == {"1 main st": (38.9, -77.0)}
@@ -0,0 +1,109 @@
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pytest
+
+# The module's file name is not importable by name
+_spec = importlib.util.spec_from_file_location(
+    "heat_mapping", os.path.join(os.path.dirname(__file__), "..", "heat_mapping (1).py"),
+)
+heat_mapping = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(heat_mapping)
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(0)
+    categories = np.array(["travel"] * 40 + ["rec"] * 30 + ["fields"] * 5, dtype=object)
+    latitude = 38.9 + rng.normal(scale=0.03, size=len(categories))
+    longitude = -77.03 + rng.normal(scale=0.03, size=len(categories))
+    latitude[0] = np.nan
+    return heat_mapping.MapDataStore(latitude, longitude, categories)
+
+
+@pytest.fixture
+def client(store):
+    return heat_mapping.create_app(store).test_client()
+
+
+def test_filters_select_categories(client, store):
+    response = client.post("/map", json={"filters": ["rec", "travel", "rec", "unknown"]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["categories"] == ["rec", "travel"]
+    assert sum(weight for _, _, weight in body["points"]) == store.counts["rec"] + store.counts["travel"]
+    assert store.counts["travel"] == 39
+
+    by_args = client.get("/map?category=travel&category=rec").get_json()
+    assert by_args == body
+    assert client.get("/map").get_json()["categories"] == ["fields", "rec", "travel"]
+
+
+def test_unchanged_views_get_304(client):
+    first = client.get("/map?category=fields&zoom=10")
+    etag = first.headers["ETag"]
+
+    again = client.get("/map?category=fields&zoom=10", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+    other = client.get("/map?category=fields&zoom=11", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+
+def test_repeated_views_are_rendered_once(store):
+    calls = []
+    points = store.points
+
+    def counting(categories):
+        calls.append(categories)
+        return points(categories)
+
+    store.points = counting
+    client = heat_mapping.create_app(store).test_client()
+
+    first = client.post("/map", json={"filters": ["travel", "rec"]})
+    second = client.get("/map?category=rec&category=travel")
+    client.get("/map?category=rec&category=travel&format=geojson")
+
+    assert second.data == first.data
+    # The second request normalizes to the same key and is served from the cache
+    assert calls == [("rec", "travel"), ("rec", "travel")]
+
+
+def test_formats(client):
+    geojson = json.loads(client.get("/map?category=rec&format=geojson").data)
+    assert geojson["type"] == "FeatureCollection" and geojson["features"]
+
+    html = client.get("/map?format=html")
+    assert html.mimetype == "text/html"
+    assert b"leaflet" in html.data.lower()
+
+
+@pytest.mark.parametrize("payload", [
+    {"filters": "travel"},
+    {"filters": {"travel": True}},
+    {"filters": ["travel", 3]},
+    {"filters": [["travel"]]},
+    ["travel"],
+])
+def test_bad_filters_are_rejected(client, payload):
+    response = client.post("/map", json=payload)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize("query", ["zoom=99", "zoom=near", "format=xml"])
+def test_bad_zoom_and_format_are_rejected(client, query):
+    assert client.get(f"/map?{query}").status_code == 400
+
+
+def test_categories_are_conditional(client, store):
+    response = client.get("/categories")
+    assert response.get_json() == {"fields": 5, "rec": 30, "travel": 39}
+    assert client.get("/categories", headers={"If-None-Match": store.version}).status_code == 304
@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+from instrumentation import bind, count, span
+
+
+def test_runs_in_different_threads_are_separate():
+    barrier = threading.Barrier(2)
+    recorders = {}
+
+    def session(name):
+        recorder = instrumentation.start_run(log=False)
+        barrier.wait()
+        with span(f"{name}.work"):
+            count("calls")
+        barrier.wait()
+        recorders[name] = instrumentation.finish_run()
+
+    threads = [threading.Thread(target=session, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, recorder in recorders.items():
+        assert [s.name for s in recorder.spans] == [f"{name}.work"]
+        assert recorder.counters == {"calls": 1}
+
+
+def test_bound_workers_record_into_the_callers_run():
+    recorder = instrumentation.start_run(log=False)
+    try:
+        def work(i):
+            with span("worker", i=i):
+                count("items")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(bind(work), range(4)))
+            # Unbound workers have no run to record into
+            list(pool.map(work, range(4)))
+    finally:
+        instrumentation.finish_run()
+
+    assert len(recorder.spans) == 4
+    assert recorder.counters == {"items": 4}
+    assert not instrumentation.enabled()
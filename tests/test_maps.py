@@ -0,0 +1,35 @@
+import json
+
+import pandas as pd
+
+from data_access import PLAYER_DTYPES, compact_frame
+from maps import COORD_DECIMALS, player_marker_data
+
+
+def _players():
+    return pd.DataFrame({
+        "id": [1, 2, 3],
+        "Program": ["Travel", "Travel", "Academy"],
+        "School": ["Oyster", "Oyster", "Bancroft"],
+        "Zip Code": ["20009", "20009", "20010"],
+        "Latitude": [38.9123456, 38.9234567, None],
+        "Longitude": [-77.0412345, -77.0323456, -77.01],
+    })
+
+
+def test_marker_rows_round_coordinates():
+    rows, popups = player_marker_data(_players())
+
+    assert rows == [[38.91235, -77.04123, 0], [38.92346, -77.03235, 0]]
+    assert popups == ["Travel - Oyster, Zip: 20009"]
+
+
+def test_compact_coordinates_do_not_grow_the_payload():
+    players = _players()
+    rows, _ = player_marker_data(players)
+    compact_rows, _ = player_marker_data(compact_frame(players, PLAYER_DTYPES))
+
+    for row in compact_rows:
+        for value in row[:2]:
+            assert len(repr(value).split(".")[1]) <= COORD_DECIMALS
+    assert len(json.dumps(compact_rows)) <= len(json.dumps(rows))
@@ -0,0 +1,136 @@
+import re
+
+import pandas as pd
+
+from fakes import UnusedBackend
+from filters import FilterEngine, RaceIndex
+from repository import (
+    OPTION_COLUMNS, SQLiteRepository, SupabaseRepository, program_counts_from_frame,
+)
+
+PLAYERS = pd.DataFrame({
+    "id": [1, 2, 3, 4, 5],
+    "Program": ["Travel", "Travel", "Academy", "travel", None],
+    "Age": [9, 9.0, 11, None, 12],
+    "Gender": ["Female", " female", "Male", "male", None],
+    "Grade": ["3", "3", "5", "K", "6"],
+    "School": ["Oak", "Oak ", "Elm", None, "Pine"],
+    "Race List": [["black"], ["Black", "white"], "['asian']", None, "['hispanic', 'other']"],
+})
+
+FIELDS = pd.DataFrame({
+    "id": [1, 2, 3],
+    "Name": ["A", "B", "C"],
+    "Capacity": [10, 10.0, 20],
+    "Surface": ["Grass", "turf ", "Turf"],
+    "Size": ["Full", "Half", None],
+    "Game Size": ["11v11", "9v9", "9v9"],
+    "Lights": ["Yes", "No", "yes"],
+    "Permanent Lines": [True, False, True],
+    "Goals": ["Yes", "Yes", "No"],
+})
+
+
+def _repository():
+    repository = SQLiteRepository()
+    repository.load_table("Players", PLAYERS)
+    repository.load_table("Fields", FIELDS)
+    return repository
+
+
+def _engine_options(df, table_name, race_index=None):
+    engine = FilterEngine(df, OPTION_COLUMNS[table_name], race_index=race_index)
+    return {column: engine.options(column) for column in OPTION_COLUMNS[table_name]}
+
+
+def test_sqlite_options_match_the_filter_engine():
+    repository = _repository()
+    players = PLAYERS.copy()
+    expected = _engine_options(players, "Players", RaceIndex(players["Race List"]))
+    assert repository.filter_options("Players") == expected
+    assert repository.filter_options("Players")["Race List"] == ["asian", "black", "hispanic", "other", "white"]
+
+    fields = FIELDS.assign(**{"Permanent Lines": FIELDS["Permanent Lines"].map({True: "true", False: "false"})})
+    assert repository.filter_options("Fields") == _engine_options(fields, "Fields")
+
+
+def test_program_counts_and_local_fallback_agree():
+    counts = _repository().program_counts()
+    assert counts.to_dict() == {"Academy": 1, "Travel": 2, "travel": 1}
+    pd.testing.assert_series_equal(program_counts_from_frame(PLAYERS), counts)
+
+    compact = PLAYERS.astype({"Program": "category"}).iloc[:3]
+    assert program_counts_from_frame(compact).to_dict() == {"Academy": 1, "Travel": 2}
+
+
+def test_delete_program_ignores_case():
+    repository = _repository()
+    repository.delete_program("TRAVEL")
+    assert repository.program_counts().to_dict() == {"Academy": 1}
+
+
+class FakeViews(UnusedBackend):
+    """ fetch_table over canned view rows """
+
+    def __init__(self, views):
+        self.views = views
+
+    def fetch_table(self, table_name, columns=None, page_size=None, order_by=None):
+        return pd.DataFrame(self.views[table_name])
+
+
+def test_supabase_repository_reads_the_views():
+    repository = SupabaseRepository(FakeViews({
+        "player_filter_options": [
+            {"option_key": "Age|9", "column_name": "Age", "value": "9", "value_count": 2},
+            {"option_key": "Age|11", "column_name": "Age", "value": "11", "value_count": 1},
+            {"option_key": "Gender|male", "column_name": "Gender", "value": "male", "value_count": 2},
+            {"option_key": "Unknown|x", "column_name": "Unknown", "value": "x", "value_count": 1},
+        ],
+        "player_program_counts": [
+            {"program": "Travel", "value_count": 2}, {"program": "Academy", "value_count": 1},
+        ],
+    }))
+    options = repository.filter_options("Players")
+    assert options["Age"] == [9, 11]
+    assert options["Gender"] == ["male"]
+    assert options["School"] == []
+    assert repository.program_counts().to_dict() == {"Academy": 1, "Travel": 2}
+
+
+class FakePlayers(UnusedBackend):
+    """ delete_rows over a list of program names, evaluating imatch as Postgres would """
+
+    def __init__(self, programs):
+        self.programs = list(programs)
+        self.filters = []
+
+    def delete_rows(self, table_name, column, operator, value):
+        assert (table_name, column, operator) == ("Players", "Program", "imatch")
+        self.filters.append(value)
+        self.programs = [p for p in self.programs if not re.search(value, p, re.IGNORECASE)]
+
+
+WILDCARD_PROGRAMS = ["U_10", "U110", "u_10", "50% Off", "50 Percent Off", "A*B", "AxxB", "Fall (Rec)", "Fall Rec"]
+
+
+def test_supabase_delete_treats_wildcards_literally():
+    backend = FakePlayers(WILDCARD_PROGRAMS)
+    repository = SupabaseRepository(backend)
+    for program in ["U_10", "50% Off", "A*B", "Fall (Rec)"]:
+        repository.delete_program(program)
+
+    assert backend.programs == ["U110", "50 Percent Off", "AxxB", "Fall Rec"]
+    assert backend.filters[0] == "^U_10$"
+
+
+def test_sqlite_delete_matches_supabase_delete():
+    sqlite = SQLiteRepository()
+    sqlite.load_table("Players", pd.DataFrame({"id": range(len(WILDCARD_PROGRAMS)), "Program": WILDCARD_PROGRAMS}))
+    supabase = FakePlayers(WILDCARD_PROGRAMS)
+
+    for program in ["u_10", "50% off", "a*b"]:
+        sqlite.delete_program(program)
+        SupabaseRepository(supabase).delete_program(program)
+
+    assert sorted(sqlite.program_counts().index) == sorted(supabase.programs)
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+from distance_mapping import coordinate_array, haversine_miles
+from site_finder import grid_points, mean_distances, suggest_field_sites, weiszfeld
+
+
+def _players(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    # Two clusters, so the median is not simply the centroid
+    north = np.column_stack([38.95 + rng.normal(scale=0.01, size=n), -77.05 + rng.normal(scale=0.01, size=n)])
+    south = np.column_stack([38.86 + rng.normal(scale=0.02, size=n // 4), -76.99 + rng.normal(scale=0.02, size=n // 4)])
+    coords = np.vstack([north, south])
+    return pd.DataFrame({"Latitude": coords[:, 0], "Longitude": coords[:, 1]})
+
+
+def test_weiszfeld_reaches_the_numerical_optimum():
+    coords = coordinate_array(_players(), "Latitude", "Longitude")
+    point = weiszfeld(coords, [coords.mean(axis=0)])[0]
+
+    reference = minimize(
+        lambda p: mean_distances(coords, p)[0], coords.mean(axis=0), method="Nelder-Mead",
+        options={"xatol": 1e-8, "fatol": 1e-10, "maxiter": 5000},
+    )
+    assert mean_distances(coords, point)[0] <= reference.fun + 1e-3
+    assert haversine_miles(point[0], point[1], reference.x[0], reference.x[1]) < 0.05
+
+
+def test_weiszfeld_converges_from_every_seed_and_beats_the_centroid():
+    coords = coordinate_array(_players(), "Latitude", "Longitude")
+    seeds = np.array([coords.mean(axis=0), coords.min(axis=0), coords.max(axis=0), coords[0]])
+
+    points = weiszfeld(coords, seeds)
+
+    assert points.shape == (4, 2)
+    spread = haversine_miles(points[:, 0], points[:, 1], points[0, 0], points[0, 1])
+    assert spread.max() < 0.01
+    assert mean_distances(coords, points[:1])[0] < mean_distances(coords, seeds[:1])[0]
+
+
+def test_weiszfeld_matches_symmetric_median():
+    # Corners of a small square: the median is its centre
+    coords = np.array([[38.90, -77.04], [38.90, -77.02], [38.92, -77.04], [38.92, -77.02]])
+    point = weiszfeld(coords, [[38.905, -77.035]])[0]
+    np.testing.assert_allclose(point, [38.91, -77.03], atol=1e-6)
+
+
+def test_weiszfeld_handles_a_seed_on_a_player():
+    coords = coordinate_array(_players(50), "Latitude", "Longitude")
+    points = weiszfeld(coords, coords[:1])
+    assert np.isfinite(points).all()
+
+
+def test_grid_points_are_cell_centres_inside_the_bounding_box():
+    coords = np.array([[38.80, -77.10], [39.00, -76.90]])
+    grid = grid_points(coords, grid_size=4)
+
+    assert grid.shape == (16, 2)
+    np.testing.assert_allclose(np.unique(grid[:, 0]), [38.825, 38.875, 38.925, 38.975])
+    np.testing.assert_allclose(np.unique(grid[:, 1]), [-77.075, -77.025, -76.975, -76.925])
+
+
+def test_suggestions_refine_the_best_grid_cell_and_stay_apart():
+    players = _players()
+    coords = coordinate_array(players, "Latitude", "Longitude")
+    fields = pd.DataFrame({"Name": ["Far"], "Latitude": [38.80], "Longitude": [-77.20]})
+
+    result = suggest_field_sites(players, fields, top_n=4, grid_size=10, seeds=3)
+
+    grid_best = mean_distances(coords, grid_points(coords, 10)).min()
+    assert result.optimum[2] <= grid_best
+    assert result.candidates.loc[0, "Source"] == "weiszfeld"
+    assert result.candidates["Avg Distance"].is_monotonic_increasing
+    assert (result.candidates["Improvement"] > 0).all()
+    lat, lon = result.candidates["Latitude"].to_numpy(), result.candidates["Longitude"].to_numpy()
+    for i in range(len(lat)):
+        gaps = haversine_miles(lat[i], lon[i], np.delete(lat, i), np.delete(lon, i))
+        assert gaps.min() >= 0.5
+
+
+def test_suggestions_restricted_to_parcels():
+    players = _players()
+    parcels = pd.DataFrame({
+        "Name": ["A", "B", "C"],
+        "Latitude": [38.93, 38.70, np.nan],
+        "Longitude": [-77.04, -77.30, -77.00],
+    })
+
+    result = suggest_field_sites(players, parcels_df=parcels, top_n=5)
+
+    assert result.candidates["Name"].tolist() == ["A", "B"]
+    assert (result.candidates["Source"] == "parcel").all()
+    assert result.optimum[2] <= result.candidates.loc[0, "Avg Distance"]
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from distance_mapping import haversine_miles
+from spatial_index import FieldIndex, SphereIndex
+
+
+def _points(n, seed, lat=(-90, 90), lon=(-180, 180)):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Latitude": rng.uniform(*lat, size=n), "Longitude": rng.uniform(*lon, size=n)})
+
+
+def _brute_force(index_df, queries):
+    return haversine_miles(
+        queries[:, 0, np.newaxis], queries[:, 1, np.newaxis],
+        index_df["Latitude"].to_numpy()[np.newaxis, :], index_df["Longitude"].to_numpy()[np.newaxis, :],
+    )
+
+
+def test_nearest_matches_brute_force():
+    points = _points(500, 0)
+    queries = _points(200, 1).to_numpy()
+    index = SphereIndex(points)
+
+    miles, positions = index.query(queries, k=3)
+
+    expected = np.sort(_brute_force(points, queries), axis=1)[:, :3]
+    np.testing.assert_allclose(miles, expected, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(_brute_force(points, queries)[np.arange(200), positions[:, 0]], expected[:, 0],
+                               rtol=1e-9, atol=1e-6)
+
+
+def test_radius_matches_brute_force():
+    points = _points(500, 2)
+    queries = _points(50, 3).to_numpy()
+    index = SphereIndex(points)
+
+    hits = index.query_radius(queries, 800)
+
+    brute = _brute_force(points, queries)
+    for row, found in zip(brute, hits):
+        # Points within a hair of the radius may fall either way
+        certain = np.flatnonzero(row < 800 - 1e-6)
+        possible = np.flatnonzero(row <= 800 + 1e-6)
+        assert set(certain) <= set(found) <= set(possible)
+    np.testing.assert_array_equal(index.count_within(queries, 800), [len(h) for h in hits])
+
+
+def test_antimeridian_neighbours():
+    points = pd.DataFrame({"Latitude": [10.0, 10.0, 10.0], "Longitude": [179.9, -179.9, 170.0]})
+    index = SphereIndex(points)
+
+    miles, positions = index.query([[10.0, -179.95], [10.0, 179.95]], k=2)
+
+    assert set(positions[0]) == {0, 1}
+    assert set(positions[1]) == {0, 1}
+    np.testing.assert_allclose(miles[:, 0], haversine_miles(10.0, 179.95, 10.0, 179.9))
+    assert sorted(index.query_radius([10.0, 180.0], 10)[0]) == [0, 1]
+
+
+def test_points_near_the_poles():
+    # At the pole every longitude is the same place
+    points = pd.DataFrame({"Latitude": [90.0, 89.99, -89.99, 0.0], "Longitude": [0.0, 135.0, -45.0, 0.0]})
+    index = SphereIndex(points)
+
+    miles, positions = index.query([[90.0, -120.0], [-90.0, 10.0]], k=1)
+
+    assert positions[:, 0].tolist() == [0, 2]
+    assert miles[0, 0] == pytest.approx(0.0, abs=1e-6)
+    assert miles[1, 0] == pytest.approx(haversine_miles(-90.0, 10.0, -89.99, -45.0), rel=1e-6)
+    assert sorted(index.query_radius([89.995, 60.0], 5)[0]) == [0, 1]
+
+
+def test_missing_coordinates_and_oversized_k():
+    points = pd.DataFrame({"Latitude": [38.9, np.nan], "Longitude": [-77.0, -77.1]}, index=[10, 11])
+    index = SphereIndex(points)
+
+    miles, positions = index.query([[38.9, -77.0], [np.nan, -77.0]], k=2)
+
+    assert len(index) == 1 and list(index.labels) == [10]
+    assert positions.tolist() == [[0, -1], [-1, -1]]
+    assert miles[0, 0] == 0.0 and np.isnan(miles[0, 1]) and np.isnan(miles[1]).all()
+
+
+def test_field_index_nearest_fields_match_brute_force():
+    fields = _points(30, 4, lat=(38.8, 39.0), lon=(-77.1, -76.9))
+    fields["Name"] = [f"Field {i}" for i in range(30)]
+    players = _points(300, 5, lat=(38.8, 39.0), lon=(-77.1, -76.9))
+
+    nearest = FieldIndex(fields).assign_nearest_field(players)
+
+    expected = fields["Name"].to_numpy()[_brute_force(fields, players.to_numpy()).argmin(axis=1)]
+    assert nearest.tolist() == expected.tolist()
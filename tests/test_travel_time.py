@@ -0,0 +1,140 @@
+import heapq
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from distance_mapping import haversine_miles
+from travel_time import ACCESS_SPEED_MPH, SAMPLE_GRAPH_PATH, load_osm_graph
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return load_osm_graph(SAMPLE_GRAPH_PATH)
+
+
+def _reference_times(graph, source):
+    """ Plain heap Dijkstra over the graph's edges: minutes from 'source' to every node """
+    edges = graph.graph.tocoo()
+    neighbours = {}
+    for s, d, m in zip(edges.row, edges.col, edges.data):
+        neighbours.setdefault(int(s), []).append((int(d), float(m)))
+    best = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        t, node = heapq.heappop(heap)
+        if t > best[node]:
+            continue
+        for nxt, m in neighbours.get(node, []):
+            if t + m < best.get(nxt, np.inf):
+                best[nxt] = t + m
+                heapq.heappush(heap, (t + m, nxt))
+    return np.array([best.get(i, np.inf) for i in range(len(graph))])
+
+
+def test_sample_graph_loads(graph):
+    assert len(graph) == 57
+    assert graph.graph.nnz > 0
+    assert np.isfinite(graph.graph.data).all() and (graph.graph.data > 0).all()
+
+
+def test_shortest_paths_match_a_reference_dijkstra(graph):
+    fields = [0, 20, 40]
+    times = graph._times_to_fields(np.array(fields))
+
+    for row, field in zip(times, fields):
+        # Times *to* the field: run the reference from every node and read the field's entry
+        expected = np.array([_reference_times(graph, source)[field] for source in range(len(graph))])
+        np.testing.assert_allclose(row, expected, rtol=1e-5)
+
+
+def test_snap_picks_the_nearest_node(graph):
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(38.88, 38.92, 50), rng.uniform(-77.095, -77.03, 50)])
+    points[3] = np.nan
+
+    nodes, access = graph.snap(points)
+
+    miles = haversine_miles(points[:, 0, np.newaxis], points[:, 1, np.newaxis],
+                            graph.coords[np.newaxis, :, 0], graph.coords[np.newaxis, :, 1])
+    ok = np.arange(50) != 3
+    np.testing.assert_array_equal(nodes[ok], np.nanargmin(miles[ok], axis=1))
+    np.testing.assert_allclose(access[ok], np.nanmin(miles[ok], axis=1) / ACCESS_SPEED_MPH * 60, rtol=1e-6)
+    assert nodes[3] == -1 and np.isnan(access[3])
+    # Served from the cache the second time
+    again, _ = graph.snap(points)
+    np.testing.assert_array_equal(again, nodes)
+
+
+def test_travel_time_adds_access_hops(graph):
+    player, field = graph.coords[0], graph.coords[20]
+    matrix = graph.travel_time_matrix(player, field)
+    assert matrix.shape == (1, 1)
+    assert matrix[0, 0] == pytest.approx(_reference_times(graph, 0)[20], rel=1e-5)
+
+
+def _write_osm(path, nodes, ways):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    lines += [f'  <node id="{i}" lat="{lat}" lon="{lon}"/>' for i, (lat, lon) in nodes.items()]
+    for i, (refs, tags) in enumerate(ways, start=1):
+        lines.append(f'  <way id="{i}">')
+        lines += [f'    <nd ref="{r}"/>' for r in refs]
+        lines += [f'    <tag k="{k}" v="{v}"/>' for k, v in tags.items()]
+        lines.append("  </way>")
+    lines.append("</osm>")
+    path.write_text("\n".join(lines))
+    return path
+
+
+def test_oneway_streets_are_directed(tmp_path):
+    nodes = {1: (38.90, -77.00), 2: (38.90, -76.99), 3: (38.91, -76.99)}
+    ways = [([1, 2], {"highway": "primary", "oneway": "yes"}), ([1, 3, 2], {"highway": "residential"})]
+    graph = load_osm_graph(_write_osm(tmp_path / "oneway.osm", nodes, ways))
+
+    times = graph.travel_time_matrix(np.array([[38.90, -77.00], [38.90, -76.99]]),
+                                     np.array([[38.90, -76.99], [38.90, -77.00]]))
+
+    # 1 -> 2 takes the one-way primary; 2 -> 1 must go round the residential detour
+    assert times[0, 0] == pytest.approx(haversine_miles(38.90, -77.00, 38.90, -76.99) / 30 * 60, rel=1e-5)
+    assert times[1, 1] > times[0, 0] + 1.0
+
+
+def test_unreachable_fields_are_never_best(tmp_path):
+    # Two road networks with no link between them
+    nodes = {1: (38.90, -77.00), 2: (38.90, -76.99), 3: (38.95, -77.00), 4: (38.95, -76.99)}
+    ways = [([1, 2], {"highway": "residential"}), ([3, 4], {"highway": "residential"})]
+    graph = load_osm_graph(_write_osm(tmp_path / "islands.osm", nodes, ways))
+    fields = pd.DataFrame({"Name": ["South", "North", "Nowhere"],
+                           "Latitude": [38.90, 38.95, np.nan], "Longitude": [-76.99, -76.99, -77.0]})
+    south = pd.DataFrame({"Latitude": [38.90, 38.90, np.nan], "Longitude": [-77.00, -76.995, -77.0]})
+
+    assert graph.find_optimal_field(south, fields)[0] == "South"
+    # A player on the other network makes every field unreachable for someone
+    both = pd.concat([south, pd.DataFrame({"Latitude": [38.95], "Longitude": [-77.00]})])
+    assert graph.find_optimal_field(both, fields) == (None, None)
+
+
+def test_field_cache_is_bounded_and_thread_safe():
+    graph = load_osm_graph(SAMPLE_GRAPH_PATH)
+    one_set = len(graph) * 4
+    graph.field_cache_bytes = 3 * one_set
+    errors = []
+
+    def work(offset):
+        try:
+            for i in range(30):
+                graph._times_to_fields(np.array([(offset + i) % len(graph)]))
+                graph.snap(np.array([[38.9 + i * 1e-4, -77.05 - offset * 1e-4]]))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(graph._field_cache) <= 3
+    assert graph._field_cache_used == sum(t.nbytes for t in graph._field_cache.values())
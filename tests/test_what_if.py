@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from distance_mapping import coordinate_array, distance_matrix
+from what_if import WhatIfEngine, compare_field_loads, compare_scenarios
+
+
+def _players(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Latitude": 38.9 + rng.normal(scale=0.04, size=n),
+        "Longitude": -77.03 + rng.normal(scale=0.04, size=n),
+    })
+
+
+def _fields():
+    # Two fields share a name
+    return pd.DataFrame({
+        "Name": ["North", "Park", "Park", "South", "East"],
+        "Latitude": [38.96, 38.91, 38.88, 38.84, 38.90],
+        "Longitude": [-77.03, -77.05, -77.01, -77.02, -76.96],
+    })
+
+
+def _matrix(players, fields):
+    return distance_matrix(
+        coordinate_array(players, "Latitude", "Longitude"), coordinate_array(fields, "Latitude", "Longitude"),
+    )
+
+
+def test_scenarios_match_the_full_matrix():
+    players, fields = _players(), _fields()
+    # Few ranked fields, so closing fields forces the fallback pass
+    engine = WhatIfEngine(players, fields, ranked=2)
+    open_fields = fields.index[[0, 2, 3]]
+
+    scenario = engine.scenario("Some", fields=open_fields)
+
+    matrix = _matrix(players, fields.loc[open_fields])
+    np.testing.assert_allclose(scenario.nearest_distance, matrix.min(axis=1))
+    assert scenario.nearest_field.tolist() == list(open_fields[matrix.argmin(axis=1)])
+    assert scenario.best_field == fields.loc[open_fields[matrix.mean(axis=0).argmin()], "Name"]
+    assert scenario.loads["Players"].sum() == len(players)
+
+
+def test_field_loads_keep_fields_with_the_same_name_apart():
+    players, fields = _players(), _fields()
+    engine = WhatIfEngine(players, fields)
+    scenarios = [engine.scenario("All fields"), engine.scenario("Without one park", fields=fields.index.drop(2))]
+
+    loads = compare_field_loads(scenarios)
+
+    assert sorted(loads.index) == list(fields.index)
+    assert (loads["Name"] == fields.loc[loads.index, "Name"]).all()
+    assert loads["All fields"].sum() == len(players)
+    assert loads["Without one park"].sum() == len(players)
+    assert loads.loc[2, "Without one park"] == 0
+    assert loads.loc[1, "Without one park"] >= loads.loc[1, "All fields"]
+
+
+def test_reassigned_counts_players_moved_between_same_named_fields():
+    players, fields = _players(), _fields()
+    engine = WhatIfEngine(players, fields)
+    base = engine.scenario("All fields")
+    closed = engine.scenario("Without one park", fields=fields.index.drop(2))
+
+    comparison = compare_scenarios([base, closed])
+
+    moved = int((base.nearest_field == 2).sum())
+    assert moved > 0
+    assert comparison.loc["Without one park", "Players Reassigned"] == moved
+    assert comparison.loc["All fields", "Players Reassigned"] == 0
+
+
+def test_no_open_fields():
+    engine = WhatIfEngine(_players(20), _fields())
+    scenario = engine.evaluate(np.zeros(len(_fields()), dtype=bool), name="None")
+
+    assert scenario.best_field is None
+    assert scenario.mean_nearest_distance is None
+    assert scenario.loads.empty
+    assert compare_field_loads([scenario]).empty
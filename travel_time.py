@@ -0,0 +1,220 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from distance_mapping import coordinate_array, haversine_miles
+from spatial_index import chord_to_miles, to_unit_sphere
+
+# OSM extract of the DC area for the app's travel-time mode. The mode is
+# only offered when ROAD_GRAPH_PATH is set
+ROAD_GRAPH_PATH = os.environ.get("ROAD_GRAPH_PATH") or None
+
+# Tiny hand-built network for tests and offline experiments; not real streets
+SAMPLE_GRAPH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "road_graphs", "dc_sample.osm")
+
+# Typical driving speeds (mph) by OSM highway type, used when a way has no maxspeed
+HIGHWAY_SPEEDS_MPH = {
+    "motorway": 55, "motorway_link": 35, "trunk": 45, "trunk_link": 30,
+    "primary": 30, "primary_link": 25, "secondary": 25, "secondary_link": 20,
+    "tertiary": 25, "tertiary_link": 20, "unclassified": 20, "residential": 20,
+    "living_street": 10, "service": 10,
+}
+
+# Speed assumed for the straight-line hop between a player/field and the
+# nearest road node
+ACCESS_SPEED_MPH = 10
+
+# Snapped coordinates remembered per graph before the cache is reset
+SNAP_CACHE_SIZE = 1_000_000
+
+# Memory for cached per-field-set shortest path times (n_fields x n_nodes
+# float32 each); least recently used sets are dropped past this
+FIELD_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _open(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+
+def _speed_mph(tags):
+    """ maxspeed in mph ("25 mph"; bare numbers are km/h per OSM), else the highway default """
+    maxspeed = tags.get("maxspeed", "").split(";")[0]
+    digits = "".join(ch for ch in maxspeed if ch.isdigit() or ch == ".")
+    if digits:
+        speed = float(digits)
+        return speed if "mph" in maxspeed else speed * 0.621371
+    return HIGHWAY_SPEEDS_MPH[tags["highway"]]
+
+
+def load_osm_graph(path):
+    """
+    Builds a RoadGraph from an OpenStreetMap XML extract (.osm or .osm.gz),
+    keeping drivable highway ways. Edge weights are travel minutes from
+    segment length and the way's maxspeed (or a default per highway type);
+    oneway=yes/-1 is honoured.
+    """
+    node_coords = {}
+    ways = []
+    with _open(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "node":
+                node_coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+                elem.clear()
+            elif elem.tag == "way":
+                tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+                if tags.get("highway") in HIGHWAY_SPEEDS_MPH:
+                    refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                    ways.append((refs, _speed_mph(tags), tags.get("oneway", "no")))
+                elem.clear()
+
+    used = sorted({ref for refs, _, _ in ways for ref in refs if ref in node_coords})
+    position = {node_id: i for i, node_id in enumerate(used)}
+    coords = np.array([node_coords[n] for n in used], dtype=np.float64).reshape(-1, 2)
+
+    src, dst, speed = [], [], []
+    for refs, mph, oneway in ways:
+        refs = [position[r] for r in refs if r in position]
+        if oneway == "-1":
+            refs = refs[::-1]
+        a, b = refs[:-1], refs[1:]
+        src += a
+        dst += b
+        speed += [mph] * len(a)
+        if oneway not in ("yes", "true", "1", "-1"):
+            src += b
+            dst += a
+            speed += [mph] * len(a)
+
+    src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+    miles = haversine_miles(coords[src, 0], coords[src, 1], coords[dst, 0], coords[dst, 1]) if len(src) else np.empty(0)
+    # Zero-length segments would vanish from a sparse matrix
+    minutes = np.maximum(miles / np.asarray(speed, dtype=np.float64) * 60.0, 1e-6)
+    return RoadGraph(np.asarray(used, dtype=np.int64), coords, src, dst, minutes)
+
+
+class RoadGraph:
+    """
+    Directed road network with travel-time (minutes) edge weights.
+
+    Travel time from a player to a field is the access hop to the player's
+    nearest node, the shortest road path, and the hop from the field's
+    nearest node. Shortest paths are computed with one multi-source
+    Dijkstra run over the reversed graph per set of fields (times *to*
+    each field from every node), and cached up to 'field_cache_bytes', so
+    adding players costs only a snap and an array lookup. One graph is
+    shared by every session; its caches are guarded by a lock.
+    """
+
+    def __init__(self, node_ids, coords, src, dst, minutes, field_cache_bytes=FIELD_CACHE_BYTES):
+        self.node_ids = node_ids
+        self.coords = coords
+        n = len(coords)
+        # Where two ways join the same nodes, keep the fastest edge
+        fastest = pd.DataFrame({"s": src, "d": dst, "m": minutes}).groupby(["s", "d"])["m"].min()
+        self.graph = sparse.csr_matrix(
+            (fastest.to_numpy(), (fastest.index.get_level_values(0), fastest.index.get_level_values(1))),
+            shape=(n, n),
+        )
+        self.reverse = self.graph.T.tocsr()
+        self.tree = cKDTree(to_unit_sphere(coords)) if n else None
+        self._snap_cache = {}
+        self._field_cache = OrderedDict()
+        self._field_cache_used = 0
+        self.field_cache_bytes = field_cache_bytes
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.coords)
+
+    def snap(self, coords):
+        """
+        Nearest road node for each (lat, lon): (node positions, access
+        minutes). NaN coordinates give node -1. Results are cached per
+        coordinate (rounded to ~1 m), so repeat players are free.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        nodes = np.full(len(coords), -1, dtype=np.int64)
+        access = np.full(len(coords), np.nan)
+        if self.tree is None:
+            return nodes, access
+
+        keys = [tuple(k) for k in np.round(coords, 5).tolist()]
+        with self._lock:
+            cached = [self._snap_cache.get(k) for k in keys]
+        todo = [i for i, k in enumerate(keys) if cached[i] is None and not np.isnan(k).any()]
+        if todo:
+            chord, pos = self.tree.query(to_unit_sphere(coords[todo]))
+            hop = chord_to_miles(chord) / ACCESS_SPEED_MPH * 60.0
+            fresh = {keys[i]: (int(p), float(m)) for i, p, m in zip(todo, np.atleast_1d(pos), np.atleast_1d(hop))}
+            for i in todo:
+                cached[i] = fresh[keys[i]]
+            with self._lock:
+                if len(self._snap_cache) + len(fresh) > SNAP_CACHE_SIZE:
+                    self._snap_cache.clear()
+                self._snap_cache.update(fresh)
+        for i, hit in enumerate(cached):
+            if hit is not None:
+                nodes[i], access[i] = hit
+        return nodes, access
+
+    def _times_to_fields(self, field_nodes):
+        """ (n_fields, n_nodes) shortest travel minutes from every node to each field node """
+        key = tuple(int(n) for n in field_nodes)
+        with self._lock:
+            times = self._field_cache.get(key)
+            if times is not None:
+                self._field_cache.move_to_end(key)
+                return times
+        # Outside the lock: other sessions keep using the cache meanwhile
+        times = dijkstra(self.reverse, directed=True, indices=list(key)).astype(np.float32).reshape(len(key), -1)
+        if times.nbytes <= self.field_cache_bytes:
+            with self._lock:
+                if key not in self._field_cache:
+                    self._field_cache[key] = times
+                    self._field_cache_used += times.nbytes
+                while self._field_cache_used > self.field_cache_bytes:
+                    _, dropped = self._field_cache.popitem(last=False)
+                    self._field_cache_used -= dropped.nbytes
+        return times
+
+    def travel_time_matrix(self, player_coords, field_coords):
+        """ (n_players, n_fields) door-to-door travel minutes; NaN if unknown or unreachable """
+        player_nodes, player_access = self.snap(player_coords)
+        field_nodes, field_access = self.snap(field_coords)
+        out = np.full((len(player_nodes), len(field_nodes)), np.nan)
+        p_ok, f_ok = player_nodes >= 0, field_nodes >= 0
+        if not p_ok.any() or not f_ok.any():
+            return out
+        times = self._times_to_fields(field_nodes[f_ok])[:, player_nodes[p_ok]].T.astype(np.float64)
+        times = times + player_access[p_ok, np.newaxis] + field_access[np.newaxis, f_ok]
+        out[np.ix_(p_ok, f_ok)] = np.where(np.isinf(times), np.nan, times)
+        return out
+
+    def find_optimal_field(self, players_df, fields_df, lat_col="Latitude", lon_col="Longitude"):
+        """
+        (best_field_name, avg_travel_minutes) by mean travel time over every
+        player with coordinates, the same players the straight-line search
+        averages over. A field some of them cannot reach by road is never
+        best; (None, None) if no field is reachable by all of them.
+        """
+        player_coords = coordinate_array(players_df, lat_col, lon_col)
+        field_coords = coordinate_array(fields_df, lat_col, lon_col)
+        player_ok = ~np.isnan(player_coords).any(axis=1)
+        field_ok = ~np.isnan(field_coords).any(axis=1)
+        if not player_ok.any() or not field_ok.any():
+            return None, None
+        times = self.travel_time_matrix(player_coords[player_ok], field_coords[field_ok])
+        # Unreachable counts as infinitely far for that field only
+        avg = np.where(np.isnan(times), np.inf, times).mean(axis=0)
+        best = int(np.argmin(avg))
+        if not np.isfinite(avg[best]):
+            return None, None
+        return fields_df["Name"].to_numpy()[field_ok][best], float(avg[best])
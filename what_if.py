@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from distance_mapping import DEFAULT_CHUNK_SIZE, coordinate_array, iter_distance_blocks
+from instrumentation import span
+
+# Nearest fields remembered per player. A player only needs a fresh
+# distance pass when all of these are closed in a scenario
+DEFAULT_RANKED_FIELDS = 8
+
+
+class Scenario:
+    """
+    One set of open fields evaluated by WhatIfEngine:
+      - name, and open_fields: names of the open fields
+      - best_field / best_distance: the single field with the lowest
+        average distance over all players, as find_optimal_field_for_data
+        would pick it (None without players or open fields)
+      - nearest: Series (indexed like the engine's players) of each
+        player's nearest open field, nearest_field the same as index labels
+        of the fields DataFrame, and nearest_distance its distance
+      - loads: DataFrame per open field, indexed by its label in the
+        fields DataFrame (Name, Players nearest to it, Avg Distance of
+        those players, Avg Distance All over every player)
+    """
+
+    def __init__(self, name, open_fields, best_field, best_distance, nearest, nearest_field, nearest_distance, loads):
+        self.name = name
+        self.open_fields = open_fields
+        self.best_field = best_field
+        self.best_distance = best_distance
+        self.nearest = nearest
+        self.nearest_field = nearest_field
+        self.nearest_distance = nearest_distance
+        self.loads = loads
+
+    @property
+    def mean_nearest_distance(self):
+        return float(self.nearest_distance.mean()) if self.nearest_distance.notna().any() else None
+
+    def __repr__(self):
+        return f"Scenario({self.name!r}, open={len(self.open_fields)}, best_field={self.best_field!r})"
+
+
+class WhatIfEngine:
+    """
+    Field what-ifs for one set of players ("what if field X closes?").
+
+    Built once per player set against every candidate field: one streamed
+    pass stores each field's distance sum over the players and each
+    player's 'ranked' nearest fields. Evaluating a set of open fields is
+    then an argmin over the open fields' sums for the best field, and a
+    lookup of the first open field in each player's ranking for the
+    nearest-field assignment. Only players whose ranked fields are all
+    closed get their distances recomputed, against the open fields alone.
+
+    Fields are identified by their index label in 'fields_df' (names may
+    repeat), so any subset of it (e.g. the sidebar's filtered fields) can
+    be passed to scenario(); players and fields without coordinates are
+    skipped.
+    """
+
+    def __init__(self, players_df, fields_df, method="haversine", ranked=DEFAULT_RANKED_FIELDS,
+                 chunk_size=DEFAULT_CHUNK_SIZE, lat_col="Latitude", lon_col="Longitude"):
+        player_coords = coordinate_array(players_df, lat_col, lon_col)
+        player_ok = ~np.isnan(player_coords).any(axis=1)
+        field_coords = coordinate_array(fields_df, lat_col, lon_col)
+        field_ok = ~np.isnan(field_coords).any(axis=1)
+
+        self.method = method
+        self.chunk_size = chunk_size
+        self.player_index = players_df.index[player_ok]
+        self.player_coords = player_coords[player_ok]
+        self.field_index = fields_df.index[field_ok]
+        self.field_names = fields_df["Name"].to_numpy()[field_ok]
+        self.field_coords = field_coords[field_ok]
+
+        n, m = len(self.player_coords), len(self.field_coords)
+        k = min(int(ranked), m)
+        self.sums = np.zeros(m)
+        self.ranked = np.empty((n, k), dtype=np.int32)
+        self.ranked_distance = np.empty((n, k))
+        if n == 0 or k == 0:
+            return
+
+        with span("what_if.build", players=n, fields=m):
+            for start, block in iter_distance_blocks(self.player_coords, self.field_coords, method, chunk_size):
+                self.sums += block.sum(axis=0)
+                top = np.argpartition(block, k - 1, axis=1)[:, :k] if k < m else np.tile(np.arange(m), (len(block), 1))
+                top_distance = np.take_along_axis(block, top, axis=1)
+                order = np.argsort(top_distance, axis=1, kind="stable")
+                self.ranked[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+                self.ranked_distance[start:start + len(block)] = np.take_along_axis(top_distance, order, axis=1)
+
+    def __len__(self):
+        return len(self.player_coords)
+
+    def open_mask(self, fields=None, closed=()):
+        """
+        Boolean array over the engine's fields: those in 'fields' (a subset
+        of the fields DataFrame, or index labels; all fields if None) whose
+        Name is not in 'closed'.
+        """
+        if fields is None:
+            mask = np.ones(len(self.field_index), dtype=bool)
+        else:
+            labels = fields.index if isinstance(fields, pd.DataFrame) else fields
+            mask = self.field_index.isin(labels)
+        if len(closed):
+            mask &= ~np.isin(self.field_names, list(closed))
+        return mask
+
+    def evaluate(self, open_mask, name="Scenario"):
+        """ Scenario for the fields where 'open_mask' (see open_mask) is True """
+        open_mask = np.asarray(open_mask, dtype=bool)
+        open_positions = np.flatnonzero(open_mask)
+        n = len(self)
+        with span("what_if.evaluate", players=n, open_fields=len(open_positions)):
+            if n == 0 or len(open_positions) == 0:
+                empty = pd.Series(np.nan, index=self.player_index, dtype=object)
+                loads = pd.DataFrame({"Name": self.field_names[open_positions]},
+                                     columns=["Name", "Players", "Avg Distance", "Avg Distance All"],
+                                     index=self.field_index[open_positions])
+                return Scenario(name, list(self.field_names[open_positions]), None, None,
+                                empty, empty, empty.astype(np.float64), loads)
+
+            best = open_positions[np.argmin(self.sums[open_positions])]
+
+            # First open field in each player's ranking
+            available = open_mask[self.ranked]
+            first = available.argmax(axis=1)
+            rows = np.arange(n)
+            nearest = self.ranked[rows, first].astype(np.int64)
+            distance = self.ranked_distance[rows, first]
+
+            # Everything ranked for these players is closed: rerun them against the open fields only
+            missing = np.flatnonzero(~available[rows, first])
+            for start, block in iter_distance_blocks(
+                self.player_coords[missing], self.field_coords[open_positions], self.method, self.chunk_size,
+            ):
+                picks = block.argmin(axis=1)
+                targets = missing[start:start + len(block)]
+                nearest[targets] = open_positions[picks]
+                distance[targets] = block[np.arange(len(block)), picks]
+
+            counts = np.bincount(nearest, minlength=len(self.field_names))
+            totals = np.bincount(nearest, weights=distance, minlength=len(self.field_names))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                loads = pd.DataFrame({
+                    "Name": self.field_names[open_positions],
+                    "Players": counts[open_positions],
+                    "Avg Distance": totals[open_positions] / counts[open_positions],
+                    "Avg Distance All": self.sums[open_positions] / n,
+                }, index=self.field_index[open_positions])
+
+        return Scenario(
+            name,
+            list(self.field_names[open_positions]),
+            self.field_names[best],
+            float(self.sums[best] / n),
+            pd.Series(self.field_names[nearest], index=self.player_index, dtype=object),
+            pd.Series(self.field_index[nearest], index=self.player_index, dtype=object),
+            pd.Series(distance, index=self.player_index),
+            loads.sort_values("Avg Distance All", kind="stable"),
+        )
+
+    def scenario(self, name, fields=None, closed=()):
+        """ evaluate() for the open_mask(fields, closed) field set """
+        return self.evaluate(self.open_mask(fields, closed), name=name)
+
+
+def compare_scenarios(scenarios):
+    """
+    DataFrame with one row per scenario, for side-by-side comparison:
+    fields open, best field and its average distance, the average and 90th
+    percentile distance to each player's nearest open field, and how many
+    players' nearest field differs from the first scenario's.
+    """
+    if not scenarios:
+        return pd.DataFrame()
+    base = scenarios[0]
+    rows = []
+    for scenario in scenarios:
+        distances = scenario.nearest_distance.dropna()
+        changed = (scenario.nearest_field != base.nearest_field) & scenario.nearest_field.notna()
+        rows.append({
+            "Scenario": scenario.name,
+            "Fields Open": len(scenario.open_fields),
+            "Best Field": scenario.best_field,
+            "Best Field Avg Distance": scenario.best_distance,
+            "Avg Nearest Distance": scenario.mean_nearest_distance,
+            "P90 Nearest Distance": float(distances.quantile(0.9)) if len(distances) else None,
+            "Players Reassigned": int(changed.sum()),
+        })
+    return pd.DataFrame(rows).set_index("Scenario")
+
+
+def compare_field_loads(scenarios):
+    """
+    Players nearest to each field, one column per scenario (0 where a field
+    is closed), indexed by field label with the field's Name alongside.
+    """
+    if not scenarios:
+        return pd.DataFrame()
+    # Keyed by position in the list: scenario names need not be unique either
+    loads = pd.concat([s.loads["Players"] for s in scenarios], axis=1, keys=range(len(scenarios)))
+    loads = loads.fillna(0).astype(int).sort_values(0, ascending=False, kind="stable")
+    loads.columns = [s.name for s in scenarios]
+    names = pd.concat([s.loads["Name"] for s in scenarios])
+    loads.insert(0, "Name", names[~names.index.duplicated()].reindex(loads.index))
+    return loads
@@ -0,0 +1,53 @@
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+# Approximate centroids for the DC-area ZIP codes the club draws from.
+# Any ZIP -> lat/lon table with the same columns can be dropped in instead,
+# including the Census ZCTA gazetteer file (GEOID, INTPTLAT, INTPTLONG).
+ZIP_CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zip_centroids.csv")
+
+# Players column recording how coordinates were found (added by
+# sql/players_geocode_precision.sql), and its values
+PRECISION_COLUMN = "Geocode Precision"
+PRECISION_ADDRESS = "address"
+PRECISION_ZIP = "zip"
+
+
+def normalize_zip(zips):
+    """
+    Vectorized ZIP cleanup to 5-digit strings: handles ints, floats read
+    from CSV (20001.0), ZIP+4 ("20001-1234") and lost leading zeros.
+    Unparseable values become NaN.
+    """
+    text = pd.Series(zips, copy=False).astype("string").str.strip()
+    text = text.str.replace(r"\.0+$", "", regex=True)
+    digits = text.str.extract(r"^(\d{3,5})", expand=False)
+    return digits.str.zfill(5)
+
+
+@lru_cache(maxsize=4)
+def load_zip_centroids(path=ZIP_CENTROIDS_PATH):
+    """ DataFrame indexed by 5-digit ZIP with 'latitude' / 'longitude' """
+    table = pd.read_csv(path, dtype=str, sep=None, engine="python")
+    table.columns = [c.strip() for c in table.columns]
+    table = table.rename(columns={"GEOID": "zip", "INTPTLAT": "latitude", "INTPTLONG": "longitude"})
+    table["zip"] = normalize_zip(table["zip"])
+    table["latitude"] = pd.to_numeric(table["latitude"], errors="coerce")
+    table["longitude"] = pd.to_numeric(table["longitude"], errors="coerce")
+    return table.dropna(subset=["zip"]).drop_duplicates("zip").set_index("zip")[["latitude", "longitude"]]
+
+
+def lookup_zip_centroids(zips, path=ZIP_CENTROIDS_PATH):
+    """
+    (latitudes, longitudes) Series aligned with 'zips'; NaN where the ZIP
+    is missing or not in the table.
+    """
+    zips = pd.Series(zips, copy=False)
+    centroids = load_zip_centroids(path)
+    keys = normalize_zip(zips)
+    lat = keys.map(centroids["latitude"]).astype("float64")
+    lon = keys.map(centroids["longitude"]).astype("float64")
+    lat.index = lon.index = zips.index
+    return lat, lon